@@ -0,0 +1,74 @@
+import argparse
+import random
+import timeit
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.DetectionBatch import DetectionBatch
+from sensor.alerts import AlertEngine
+from sensor.queries import Query
+
+
+def synthetic_payload(stations: int, seed: int = 42) -> dict:
+    rng = random.Random(seed)
+    data = []
+    for i in range(stations):
+        record = {
+            "idstazione": f"-/{1000000 + i},{4400000 + i}/spdsra",
+            "ordinamento": i,
+            "nomestaz": f"Station {i}",
+            "lon": str(1000000 + i),
+            "lat": str(4400000 + i),
+            "value": None if rng.random() < 0.02 else round(rng.uniform(0, 10), 2),
+        }
+        if rng.random() < 0.7:
+            record["soglia1"] = 3
+            record["soglia2"] = 5
+            record["soglia3"] = 8
+        data.append(record)
+    return {"timestamp": "1734688800000", "sensor_type": "idro_level", "unit": "m", "data": data}
+
+
+def synthetic_queries() -> list[Query]:
+    return [Query(">", "low", 2.5), Query(">", "medium", 6), Query(">", "high", 9.5)]
+
+
+def per_object(scraper: GenericScraper, data: dict, queries: list[Query]) -> list:
+    res = []
+    for detection in scraper.detections_from_scraped_data(data):
+        json_data = detection.to_json()
+        scraper_alert = json_data["detection"]["query"] if json_data["isAlert"] else None
+        query = None if detection.value is None else Query.checkQueries(float(detection.value), queries)
+        res.append((scraper_alert and (scraper_alert["name"], scraper_alert["value"]), query and query.name))
+    return res
+
+
+def vectorised(engine: AlertEngine, data: dict) -> list:
+    result = engine.evaluate(DetectionBatch.from_scraped_data(data))
+    res = []
+    for i in range(len(result.batch)):
+        query = result.query_alert(i)
+        res.append((result.scraper_alert(i), query and query.name))
+    return res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-object vs vectorised alert evaluation")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    scraper = GenericScraper("idro_level")
+    data = synthetic_payload(args.stations)
+    queries = synthetic_queries()
+    engine = AlertEngine(queries)
+
+    if per_object(scraper, data, queries) != vectorised(engine, data):
+        raise SystemExit("The alert engine disagrees with the per-object evaluation")
+
+    baseline = timeit.timeit(lambda: per_object(scraper, data, queries), number=args.repeat)
+    batched = timeit.timeit(lambda: vectorised(engine, data), number=args.repeat)
+    evaluation = timeit.timeit(lambda: engine.evaluate(DetectionBatch.from_scraped_data(data)), number=args.repeat)
+    print(f"stations: {args.stations}, repeat: {args.repeat}")
+    print(f"per object:            {baseline / args.repeat * 1000:.3f} ms/payload")
+    print(f"alert engine:          {batched / args.repeat * 1000:.3f} ms/payload")
+    print(f"alert engine (levels): {evaluation / args.repeat * 1000:.3f} ms/payload")
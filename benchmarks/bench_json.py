@@ -0,0 +1,43 @@
+import argparse
+import timeit
+
+from benchmarks.bench_alerts import synthetic_payload
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils import fastjson
+
+
+def upstream_body(stations: int) -> bytes:
+    # Same shape as get-sensor-values-no-time: a header with the slot, then the stations
+    data = synthetic_payload(stations)
+    return fastjson.stdlib_dumps([{"time": data["timestamp"]}, *data["data"]])
+
+
+def pipeline(scraper: GenericScraper, body: bytes, loads, dumps) -> list[bytes]:
+    # decode the upstream payload, build the detections and encode the gateway bodies
+    res = loads(body)
+    data = scraper.scraped_data(res, int(res[0]["time"]))
+    return [dumps(d.to_json_detection()) for d in scraper.detections_from_scraped_data(data)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="stdlib json vs the accelerated JSON backend")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    scraper = GenericScraper("idro_level")
+    body = upstream_body(args.stations)
+    detections = [d.to_json_detection() for d in scraper.detections_from_scraped_data(synthetic_payload(args.stations))]
+    if fastjson.loads(body) != fastjson.stdlib_loads(body):
+        raise SystemExit(f"{fastjson.BACKEND} decodes the payload differently")
+
+    def per_payload(statement) -> float:
+        return timeit.timeit(statement, number=args.repeat) / args.repeat * 1000
+
+    print(f"stations: {args.stations}, repeat: {args.repeat}, payload: {len(body)} bytes, backend: {fastjson.BACKEND}")
+    print(f"decode   json:       {per_payload(lambda: fastjson.stdlib_loads(body)):.3f} ms/payload")
+    print(f"decode   {fastjson.BACKEND + ':':<11} {per_payload(lambda: fastjson.loads(body)):.3f} ms/payload")
+    print(f"encode   json:       {per_payload(lambda: [fastjson.stdlib_dumps(d) for d in detections]):.3f} ms/payload")
+    print(f"encode   {fastjson.BACKEND + ':':<11} {per_payload(lambda: [fastjson.dumps(d) for d in detections]):.3f} ms/payload")
+    print(f"pipeline json:       {per_payload(lambda: pipeline(scraper, body, fastjson.stdlib_loads, fastjson.stdlib_dumps)):.3f} ms/payload")
+    print(f"pipeline {fastjson.BACKEND + ':':<11} {per_payload(lambda: pipeline(scraper, body, fastjson.loads, fastjson.dumps)):.3f} ms/payload")
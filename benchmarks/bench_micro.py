@@ -0,0 +1,74 @@
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+from benchmarks.bench_alerts import synthetic_payload, synthetic_queries
+from scrapers.GenericScraper import GenericScraper
+from sensor.create_template import TEMPLATE_FILE, compile_template, dfs
+from sensor.queries import Query
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "sensor"))
+
+from build_mockup_sensors import generate_sensor_config  # noqa: E402
+
+
+def cases(stations: int) -> dict:
+    # Hot paths of a sensor tick (and of the sensor generation), each one a no-argument callable
+    scraper = GenericScraper("idro_level")
+    data = synthetic_payload(stations)
+    detections = scraper.detections_from_scraped_data(data)
+    values = [float(d.value) for d in detections if d.value is not None]
+    queries = synthetic_queries()
+    _, template = compile_template(str(ROOT / "sensor" / TEMPLATE_FILE))
+    configuration = generate_sensor_config("Sestola", "temp", 12000, "0.0.0.0")
+    config = dfs("", configuration, {})
+    return {
+        "detections_from_scraped_data": lambda: scraper.detections_from_scraped_data(data),
+        "GenericDetection.to_json": lambda: [d.to_json() for d in detections],
+        "Query.checkQueries": lambda: [Query.checkQueries(v, queries) for v in values],
+        "template rendering": lambda: template.render(CONFIGURATION=configuration, **config),
+    }
+
+
+def run(stations: int, repeat: int) -> dict[str, float]:
+    # Best of 5 runs, in ms per call
+    return {
+        name: min(timeit.repeat(case, number=repeat, repeat=5)) / repeat * 1000
+        for name, case in cases(stations).items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the sensor hot paths")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--save", help="write the results to this json file")
+    parser.add_argument("--compare", help="fail when slower than the results saved in this json file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown over --compare (0.5: 50%%)")
+    args = parser.parse_args()
+
+    results = run(args.stations, args.repeat)
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"stations: {args.stations}, repeat: {args.repeat}")
+    regressions = []
+    for name, ms in results.items():
+        line = f"{name + ':':<30} {ms:.4f} ms"
+        if name in baseline:
+            change = ms / baseline[name] - 1
+            line += f" ({change:+.1%} vs {baseline[name]:.4f} ms)"
+            if change > args.tolerance:
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"stations": args.stations, "repeat": args.repeat, "results": results}, f, indent=2)
+    if regressions:
+        raise SystemExit(f"slower than the baseline: {', '.join(regressions)}")
@@ -0,0 +1,95 @@
+import threading
+import time
+import zlib
+from functools import lru_cache
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+from benchmarks.bench_alerts import synthetic_payload
+from scrapers.utils import fastjson
+
+HOUR = 3_600_000
+
+
+def upstream_app(stations: int, names: list[str], stale: bool = False) -> FastAPI:
+    # Stand-in for get-sensor-values-no-time: every variable gets `stations` synthetic records,
+    # the first ones named after the sensors under test. A stale upstream answers with the
+    # previous slot, so the sensors download the payload again at every tick.
+    app = FastAPI()
+    app.state.requests = 0
+
+    @lru_cache(maxsize=64)
+    def body(variable: str, timestamp: int) -> bytes:
+        data = synthetic_payload(max(stations, len(names)), seed=zlib.crc32(variable.encode()))["data"]
+        for record, name in zip(data, names):
+            record["nomestaz"] = name
+            record["value"] = record["value"] if record["value"] is not None else 0.0
+        return fastjson.dumps([{"time": str(timestamp)}, *data])
+
+    @app.get("/")
+    async def values(variabile: str, time: int) -> Response:
+        app.state.requests += 1
+        return Response(body(variabile, time - HOUR if stale else time), media_type=fastjson.CONTENT_TYPE)
+
+    return app
+
+
+class Recorder:
+    # Receipt time of every request the fake gateway answered
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.registered: set[tuple[str, int]] = set()
+        self.detections: list[float] = []
+        self.alerts: list[float] = []
+        self.bytes = 0
+
+    def record(self, path: str, size: int) -> None:
+        with self.lock:
+            (self.alerts if path.startswith("alerts") else self.detections).append(time.time())
+            self.bytes += size
+
+    def requests_between(self, start: float, end: float) -> int:
+        with self.lock:
+            return sum(start <= t < end for t in self.detections + self.alerts)
+
+
+def gateway_app(recorder: Recorder) -> FastAPI:
+    # Registry and API gateway in one app, accepting everything
+    app = FastAPI()
+
+    @app.post("/v0/api/sensor/register", status_code=201)
+    async def register(request: Request) -> dict:
+        body = await request.json()
+        recorder.registered.add((body["sensorIp"], body["sensorPort"]))
+        return {}
+
+    @app.delete("/v0/api/sensor/shutdown")
+    async def shutdown(sensorIp: str, sensorPort: int) -> dict:
+        recorder.registered.discard((sensorIp, sensorPort))
+        return {}
+
+    @app.post("/v0/api/detection/{path:path}")
+    async def detection(path: str, request: Request) -> dict:
+        recorder.record(path, len(await request.body()))
+        return {}
+
+    return app
+
+
+class Served:
+    # Runs an app with uvicorn on a background thread of the benchmark process
+    def __init__(self, app: FastAPI, port: int, host: str = "127.0.0.1"):
+        self.url = f"http://{host}:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "Served":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+import yaml
+from fastapi import FastAPI
+
+from benchmarks.fakes import Recorder, Served, gateway_app, upstream_app
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - psutil is optional, /proc is read otherwise
+    psutil = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT / "sensor"))
+
+from build_mockup_sensors import generate_sensor_config, selected_sensors  # noqa: E402
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def fleet(count: int) -> list[tuple[str, str]]:
+    # The first `count` mockup sensors, cycling through them with a suffix when more are asked for
+    sensors = [(t, n) for t, names in selected_sensors.items() for n in names]
+    return [(t, n if i < len(sensors) else f"{n} {i // len(sensors)}") for i, (t, n) in enumerate(sensors * (count // len(sensors) + 1))][:count]
+
+
+def write_configs(directory: Path, sensors: list[tuple[str, str]], gateway: str, interval: int, flush: float) -> list[tuple[Path, int]]:
+    configs = []
+    for sensor_type, name in sensors:
+        port = free_port()
+        config = generate_sensor_config(name, sensor_type, port, "127.0.0.1", second=f"*/{interval}")
+        sensor = config["sensor"]
+        sensor["registry"]["url"] = f"{gateway}/v0/api/sensor"
+        sensor["apiGateway"]["url"] = gateway
+        sensor["delivery"] = {"flushInterval": flush}
+        sensor["logging"] = {"level": "WARNING"}
+        path = directory / f"sensor_{sensor_type}_{name.replace(' ', '')}.yaml"
+        with open(path, "w") as f:
+            yaml.safe_dump(config, f, default_flow_style=False, sort_keys=False)
+        configs.append((path, port))
+    return configs
+
+
+def usage(pid: int) -> tuple[float, int]:
+    # CPU seconds and RSS bytes of a process
+    if psutil is not None:
+        process = psutil.Process(pid)
+        times = process.cpu_times()
+        return times.user + times.system, process.memory_info().rss
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/statm") as f:
+        rss_pages = int(f.read().split()[1])
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, rss_pages * PAGE_SIZE
+
+
+def histogram_mean(metrics: str, name: str) -> tuple[float, int]:
+    total = sum(float(v) for v in re.findall(rf"^{name}_sum(?:{{[^}}]*}})? (\S+)$", metrics, re.M))
+    count = sum(int(float(v)) for v in re.findall(rf"^{name}_count(?:{{[^}}]*}})? (\S+)$", metrics, re.M))
+    return (total / count if count else 0.0), count
+
+
+def tick_latencies(received: list[float], interval: int) -> list[float]:
+    # Delay between the cron tick (every `interval` seconds of the minute) and the receipt
+    latencies = []
+    for t in received:
+        minute = t - t % 60
+        latencies.append(t - (minute + (int(t - minute) // interval) * interval))
+    return latencies
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def wait_ready(ports: list[int], recorder: Recorder, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if len(recorder.registered) == len(ports):
+            return
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"only {len(recorder.registered)} of {len(ports)} sensors registered in {timeout}s")
+
+
+async def scrape_metrics(client: httpx.AsyncClient, ports: list[int]) -> list[str]:
+    responses = await asyncio.gather(
+        *(client.get(f"http://127.0.0.1:{port}/metrics") for port in ports), return_exceptions=True
+    )
+    return [r.text if isinstance(r, httpx.Response) else "" for r in responses]
+
+
+def main(args: argparse.Namespace) -> None:
+    recorder = Recorder()
+    sensors = fleet(args.sensors)
+    upstream = upstream_app(args.stations, [name for _, name in sensors], stale=args.stale)
+    with Served(upstream, free_port()) as up, Served(gateway_app(recorder), free_port()) as gw, tempfile.TemporaryDirectory() as tmp:
+        configs = write_configs(Path(tmp), sensors, gw.url, args.interval, args.flush_interval)
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            "SCRAPER_URL": f"{up.url}/",
+            # a stale upstream is downloaded at every tick: the cache must not serve it either
+            "SCRAPER_CACHE_TTL": "0.5" if args.stale else os.environ.get("SCRAPER_CACHE_TTL", "60"),
+        }
+        processes = [
+            subprocess.Popen(
+                [sys.executable, "-m", "sensor.runtime", str(path), "--ip", "127.0.0.1", "--port", str(port)],
+                cwd=ROOT,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=None if args.verbose else subprocess.DEVNULL,
+            )
+            for path, port in configs
+        ]
+        ports = [port for _, port in configs]
+        try:
+            asyncio.run(run(args, processes, ports, recorder, upstream))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+
+async def run(args: argparse.Namespace, processes: list[subprocess.Popen], ports: list[int], recorder: Recorder, upstream: FastAPI) -> None:
+    async with httpx.AsyncClient(timeout=10) as client:
+        started = time.monotonic()
+        await wait_ready(ports, recorder, args.startup_timeout)
+        print(f"{len(ports)} sensors registered in {time.monotonic() - started:.2f}s")
+
+        # Measures whole ticks only: starts at the next tick, ends at a tick
+        now = time.time()
+        start = now - now % args.interval + args.interval
+        await asyncio.sleep(start - now)
+        cpu_before = [usage(p.pid)[0] for p in processes]
+        upstream_before = upstream.state.requests
+        end = start + args.duration - args.duration % args.interval
+        await asyncio.sleep(end - time.time())
+        usages = [usage(p.pid) for p in processes]
+        upstream_requests = upstream.state.requests - upstream_before
+        # detections of the last tick in the window are still being delivered
+        await asyncio.sleep(args.flush_interval + 1)
+
+        metrics = await scrape_metrics(client, ports)
+        seconds = end - start
+        received = [t for t in recorder.detections if start <= t < end]
+        latencies = tick_latencies(received, args.interval)
+        scrape = [histogram_mean(m, "scraper_fetch_seconds") for m in metrics]
+        cycle = [histogram_mean(m, "sensor_cycle_seconds") for m in metrics]
+        cpu = [(u[0] - b) / seconds * 100 for u, b in zip(usages, cpu_before)]
+        rss = [u[1] / 2**20 for u in usages]
+
+        print(f"window: {seconds:.0f}s, {seconds / args.interval:.0f} ticks every {args.interval}s, {args.stations} stations per payload")
+        print(f"upstream requests:  {upstream_requests}")
+        print(f"gateway requests/s: {recorder.requests_between(start, end) / seconds:.2f} ({len(received)} detections)")
+        print(f"scrape latency:     {sum(m for m, _ in scrape) / max(1, len(scrape)) * 1000:.2f} ms mean fetch")
+        print(f"cycle latency:      {sum(m for m, _ in cycle) / max(1, len(cycle)) * 1000:.2f} ms mean scrape and send")
+        print(f"end to end:         p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, max {max(latencies, default=0) * 1000:.1f} ms (tick to gateway)")
+        print(f"cpu per sensor:     mean {sum(cpu) / len(cpu):.2f}%, max {max(cpu):.2f}%")
+        print(f"rss per sensor:     mean {sum(rss) / len(rss):.1f} MiB, max {max(rss):.1f} MiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="N sensors against a local upstream and gateway")
+    parser.add_argument("--sensors", type=int, default=10)
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--interval", type=int, default=5, help="seconds between cron ticks")
+    parser.add_argument("--duration", type=int, default=30, help="seconds measured")
+    parser.add_argument("--flush-interval", type=float, default=0.2, help="delivery flush interval of the sensors")
+    parser.add_argument("--stale", action="store_true", help="download the payload again at every tick")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--verbose", action="store_true", help="show the sensors' stderr")
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+import json
+import math
+import sys
+from array import array
+
+THRESHOLD_NAMES = ("soglia1", "soglia2", "soglia3")
+MISSING = math.nan
+
+
+def _number(value) -> float:
+    if value is None or value == "":
+        return MISSING
+    return float(value)
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class DetectionBatch:
+    # Columnar view of a scraped payload: one column per field instead of one object per
+    # station. Fields are kept as the upstream sent them (string or number) and are written
+    # back as such; values and thresholds also get a float array for the alert engine, in
+    # which missing numbers are NaN.
+    __slots__ = (
+        "sensor_type",
+        "unit",
+        "timestamp",
+        "ids",
+        "names",
+        "longitudes",
+        "latitudes",
+        "raw_values",
+        "raw_thresholds",
+        "values",
+        "thresholds",
+        "_encoded",
+    )
+
+    def __init__(self, sensor_type: str, unit: str, timestamp=None):
+        self.sensor_type = sensor_type
+        self.unit = unit
+        # every station of a payload shares its timestamp
+        self.timestamp = timestamp
+        self.ids: list = []
+        self.names: list[str] = []
+        self.longitudes: list = []
+        self.latitudes: list = []
+        self.raw_values: list = []
+        self.raw_thresholds: tuple[list, ...] = tuple([] for _ in THRESHOLD_NAMES)
+        self.values = array("d")
+        self.thresholds = tuple(array("d") for _ in THRESHOLD_NAMES)
+        self._encoded: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def from_scraped_data(data: dict) -> "DetectionBatch":
+        # Built column by column, one pass per field
+        records = data["data"]
+        batch = DetectionBatch(data["sensor_type"], data["unit"], data["timestamp"])
+        batch.ids = [_intern(r["idstazione"]) for r in records]
+        batch.names = [sys.intern(r["nomestaz"]) for r in records]
+        batch.longitudes = [r["lon"] for r in records]
+        batch.latitudes = [r["lat"] for r in records]
+        batch.raw_values = [r["value"] for r in records]
+        batch.raw_thresholds = tuple([r.get(name) for r in records] for name in THRESHOLD_NAMES)
+        batch.values = array("d", map(_number, batch.raw_values))
+        batch.thresholds = tuple(array("d", map(_number, column)) for column in batch.raw_thresholds)
+        return batch
+
+    def index_of(self, sensor_name: str) -> int:
+        try:
+            return self.names.index(sensor_name)
+        except ValueError:
+            return -1
+
+    def value(self, i: int) -> float | None:
+        value = self.values[i]
+        return None if math.isnan(value) else value
+
+    def queries(self, i: int) -> list[tuple]:
+        # The thresholds of the station, as sent by the upstream
+        return [
+            (name, raw[i])
+            for raw, column, name in zip(self.raw_thresholds, self.thresholds, THRESHOLD_NAMES)
+            if not math.isnan(column[i])
+        ]
+
+    def _json(self, value) -> str:
+        # Names, ids and units repeat across payloads. Only strings are memoised: 3 and
+        # 3.0 are the same dict key but not the same JSON
+        if not isinstance(value, str):
+            return json.dumps(value)
+        encoded = self._encoded.get(value)
+        if encoded is None:
+            encoded = self._encoded[value] = json.dumps(value)
+        return encoded
+
+    def detection_json(self, i: int) -> str:
+        # Same text as json.dumps(GenericDetection.to_json_detection())
+        return (
+            f'{{"sensorId": {self._json(self.ids[i])}, "sensorName": {self._json(self.names[i])}, '
+            f'"unit": {self._json(self.unit)}, "timestamp": {self._json(self.timestamp)}, '
+            f'"longitude": {self._json(self.longitudes[i])}, "latitude": {self._json(self.latitudes[i])}, '
+            f'"value": {self._json(self.raw_values[i])}}}'
+        )
+
+    def alert_json(self, i: int, query_name: str, query_value) -> str:
+        # Same text as json.dumps of the "detection" of an alert built by GenericDetection.to_json
+        return (
+            f'{{"sensorName": {self._json(self.names[i])}, "type": {self._json(self.sensor_type)}, '
+            f'"value": {self._json(self.raw_values[i])}, "unit": {self._json(self.unit)}, '
+            f'"timestamp": {self._json(self.timestamp)}, '
+            f'"query": {{"name": {self._json(query_name)}, "value": {self._json(query_value)}}}}}'
+        )
+
+    def detections_json(self, indexes: list[int] | None = None) -> str:
+        rows = range(len(self)) if indexes is None else indexes
+        return "[" + ", ".join(self.detection_json(i) for i in rows) + "]"
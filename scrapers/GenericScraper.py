@@ -2,48 +2,39 @@ import json
 import logging
 from datetime import datetime
 
-import requests
-
-from scrapers.utils.timestamp import TimestampUtils
-
-logging.basicConfig(level=logging.INFO)
-
-SENSOR_DATA_URL = "https://allertameteo.regione.emilia-romagna.it/o/api/allerta/get-sensor-values-no-time"
-
-sensors = [
-    "RAIN",
-    "IDRO_LEVEL",
-    "TEMP",
-    "WIND",
-    "HUMIDITY",
-]
-
-sensor_ids = {
-    "RAIN": "1,0,3600/1,-,-,-/B13011",
-    "IDRO_LEVEL": "254,0,0/1,-,-,-/B13215",
-    "TEMP": "254,0,0/103,2000,-,-/B12101",
-    "WIND": "254,0,0/103,10000,-,-/B11002",
-    "HUMIDITY": "254,0,0/103,2000,-,-/B13003",
-}
-
-sensors_names = {
-    sensor_ids["RAIN"]: "rain",
-    sensor_ids["IDRO_LEVEL"]: "idro_level",
-    sensor_ids["TEMP"]: "temp",
-    sensor_ids["WIND"]: "wind",
-    sensor_ids["HUMIDITY"]: "humidity",
-}
-
-sensors_units = {
-    sensor_ids["RAIN"]: "mm",
-    sensor_ids["IDRO_LEVEL"]: "m",
-    sensor_ids["TEMP"]: "K",
-    sensor_ids["WIND"]: "m/s",
-    sensor_ids["HUMIDITY"]: "%",
-}
+import httpx
+
+from scrapers.DetectionBatch import DetectionBatch
+from scrapers.utils.cache import ScrapeCache, cache_from_env
+from scrapers.utils.history import HistoryStore
+from scrapers.utils.metrics import PARSE_SECONDS, SCRAPE_ERRORS, SCRAPE_SECONDS, STATIONS
+from scrapers.utils.sources import DataSource, source_from_env
+from scrapers.utils.variables import (
+    sensor_ids,
+    sensors,
+    sensors_names,
+    sensors_units,
+)
+
+# Shared by every scraper of this process, so sensors of the same type reuse one download.
+shared_cache: ScrapeCache = cache_from_env()
+# Upstream API by default, recorded payloads when SCRAPER_REPLAY is set.
+shared_source: DataSource = source_from_env()
 
 
 class GenericDetection:
+    __slots__ = (
+        "sensorId",
+        "sensorName",
+        "sensorType",
+        "unit",
+        "timestamp",
+        "longitude",
+        "latitude",
+        "value",
+        "queries",
+    )
+
     def __init__(self):
         self.sensorId: str | None = None
         self.sensorName: str | None = None
@@ -111,8 +102,25 @@ class GenericDetection:
         return query
 
 
+class PayloadIndex:
+    def __init__(self, data: dict):
+        self.data = data
+        self.by_name: dict[str, dict] = {}
+        self.by_id: dict[str, dict] = {}
+        # setdefault keeps the first record, as the previous linear filter did
+        for record in data["data"]:
+            self.by_name.setdefault(record["nomestaz"], record)
+            self.by_id.setdefault(record["idstazione"], record)
+
+
 class GenericScraper:
-    def __init__(self, sensor_name: str):
+    def __init__(
+        self,
+        sensor_name: str,
+        cache: ScrapeCache | None = None,
+        history: HistoryStore | None = None,
+        source: DataSource | None = None,
+    ):
         self.logger = logging.getLogger(str(self.__class__))
 
         if sensor_name.upper() not in sensor_ids:
@@ -120,21 +128,84 @@ class GenericScraper:
 
         self.selected_sensor_name = sensor_name.upper()
         self.selected_sensor_id: str = sensor_ids[self.selected_sensor_name]
+        self.cache = cache if cache is not None else shared_cache
+        self._indexed: tuple[list, PayloadIndex] | None = None
+        self.history = history
+        self.source = source if source is not None else shared_source
 
-    def scrape(self, dump: bool = False) -> dict:
-        now = TimestampUtils().get_compliant_now_timestamp()
-        res = requests.get(
-            SENSOR_DATA_URL,
-            params={
-                "variabile": self.selected_sensor_id,
-                "time": now,
-            },
-        ).json()
+    def fetch(self, timestamp: int) -> list:
+        try:
+            with SCRAPE_SECONDS.time(variable=sensors_names[self.selected_sensor_id]):
+                res = self.source.fetch(self.selected_sensor_id, timestamp)
+        except Exception:
+            SCRAPE_ERRORS.inc(variable=sensors_names[self.selected_sensor_id])
+            raise
+
+        self.logger.info(
+            "Retrieved data for sensor %s for date: %s",
+            self.selected_sensor_name,
+            datetime.fromtimestamp(timestamp / 1000),
+            extra={"variable": self.selected_sensor_name, "timestamp": timestamp},
+        )
+        return res
+
+    async def fetch_async(self, client: httpx.AsyncClient, timestamp: int) -> list:
+        try:
+            with SCRAPE_SECONDS.time(variable=sensors_names[self.selected_sensor_id]):
+                res = await self.source.fetch_async(client, self.selected_sensor_id, timestamp)
+        except Exception:
+            SCRAPE_ERRORS.inc(variable=sensors_names[self.selected_sensor_id])
+            raise
 
         self.logger.info(
-            f"Retrieved data for sensor {self.selected_sensor_name} for date: {datetime.fromtimestamp(now/ 1000)}"
+            "Retrieved data for sensor %s for date: %s",
+            self.selected_sensor_name,
+            datetime.fromtimestamp(timestamp / 1000),
+            extra={"variable": self.selected_sensor_name, "timestamp": timestamp},
+        )
+        return res
+
+    def scrape(self, dump: bool = False) -> dict:
+        now = self.source.now()
+        res = self.cache.get_or_fetch(
+            self.selected_sensor_id, now, lambda: self.fetch(now)
         )
+        return self.scraped_data(res, now, dump)
 
+    async def scrape_async(self, client: httpx.AsyncClient, dump: bool = False) -> dict:
+        now = self.source.now()
+        res = await self.cache.aget_or_fetch(
+            self.selected_sensor_id, now, lambda: self.fetch_async(client, now)
+        )
+        return self.scraped_data(res, now, dump)
+
+    def index(self, res: list, now: int) -> PayloadIndex:
+        # Payloads come from the shared cache, so the same list means the same index.
+        indexed = self._indexed
+        if indexed is not None and indexed[0] is res:
+            return indexed[1]
+        with PARSE_SECONDS.time(variable=sensors_names[self.selected_sensor_id], step="index"):
+            index = PayloadIndex(self.scraped_data(res, now))
+        STATIONS.set(len(res) - 1, variable=sensors_names[self.selected_sensor_id])
+        self._indexed = (res, index)
+        return index
+
+    def scrape_index(self, now: int | None = None) -> PayloadIndex:
+        # `now` lets several scrapers read the same hourly slot (see MultiScraper)
+        now = now if now is not None else self.source.now()
+        res = self.cache.get_or_fetch(
+            self.selected_sensor_id, now, lambda: self.fetch(now)
+        )
+        return self.index(res, now)
+
+    async def scrape_index_async(self, client: httpx.AsyncClient, now: int | None = None) -> PayloadIndex:
+        now = now if now is not None else self.source.now()
+        res = await self.cache.aget_or_fetch(
+            self.selected_sensor_id, now, lambda: self.fetch_async(client, now)
+        )
+        return self.index(res, now)
+
+    def scraped_data(self, res: list, now: int, dump: bool = False) -> dict:
         data = {
             "timestamp": res[0]["time"],
             "sensor_type": sensors_names[self.selected_sensor_id],
@@ -142,6 +213,9 @@ class GenericScraper:
             "data": res[1:],
         }
 
+        if self.history is not None:
+            self.history.append(data["sensor_type"], now, data)
+
         if dump:
             with open(
                 f"{sensors_names[self.selected_sensor_id]}_{now}_data.json", "w"
@@ -150,30 +224,73 @@ class GenericScraper:
 
         return data
 
+    def detection_from_record(self, data: dict, detection: dict) -> GenericDetection:
+        d = GenericDetection()
+        d.sensorId = detection["idstazione"]
+        d.sensorName = detection["nomestaz"]
+        d.sensorType = data["sensor_type"]
+        d.unit = data["unit"]
+        d.timestamp = data["timestamp"]
+        d.longitude = detection["lon"]
+        d.latitude = detection["lat"]
+        d.value = detection["value"]
+        for name in ["soglia1", "soglia2", "soglia3"]:
+            if name in detection:
+                d.queries.append((name, detection[name]))
+        return d
+
     def detections_from_scraped_data(self, data: dict) -> list[GenericDetection]:
-        res = []
-        for detection in data["data"]:
-            d = GenericDetection()
-            d.sensorId = detection["idstazione"]
-            d.sensorName = detection["nomestaz"]
-            d.sensorType = data["sensor_type"]
-            d.unit = data["unit"]
-            d.timestamp = data["timestamp"]
-            d.longitude = detection["lon"]
-            d.latitude = detection["lat"]
-            d.value = detection["value"]
-            for name in ["soglia1", "soglia2", "soglia3"]:
-                if name in detection:
-                    d.queries.append((name, detection[name]))
-            res.append(d)
+        return [self.detection_from_record(data, detection) for detection in data["data"]]
+
+    def batch_from_scraped_data(self, data: dict) -> DetectionBatch:
+        return DetectionBatch.from_scraped_data(data)
+
+    def detection_from_batch(self, batch: DetectionBatch, i: int) -> GenericDetection:
+        d = GenericDetection()
+        d.sensorId = batch.ids[i]
+        d.sensorName = batch.names[i]
+        d.sensorType = batch.sensor_type
+        d.unit = batch.unit
+        d.timestamp = batch.timestamp
+        d.longitude = batch.longitudes[i]
+        d.latitude = batch.latitudes[i]
+        d.value = batch.raw_values[i]
+        d.queries = batch.queries(i)
+        return d
+
+    def detections_from_index(
+        self, index: PayloadIndex, sensor_names: list[str]
+    ) -> dict[str, GenericDetection | None]:
+        res = {}
+        for sensor_name in sensor_names:
+            record = index.by_name.get(sensor_name)
+            res[sensor_name] = None if record is None else self.detection_from_record(index.data, record)
         return res
 
-    def get_detection_for_sensor(self, sensor_name: str) -> GenericDetection | None:
-        detections = self.detections_from_scraped_data(self.scrape(dump=False))
-        filtered = filter(lambda x: x.sensorName == sensor_name, detections)
-        return next(filtered, None)
+    def get_detection_for_sensor(self, sensor_name: str, now: int | None = None) -> GenericDetection | None:
+        return self.get_detections_for_sensors([sensor_name], now)[sensor_name]
+
+    def get_detection_for_station_id(self, station_id: str) -> GenericDetection | None:
+        index = self.scrape_index()
+        record = index.by_id.get(station_id)
+        return None if record is None else self.detection_from_record(index.data, record)
+
+    def get_detections_for_sensors(
+        self, sensor_names: list[str], now: int | None = None
+    ) -> dict[str, GenericDetection | None]:
+        return self.detections_from_index(self.scrape_index(now), sensor_names)
+
+    async def get_detection_for_sensor_async(
+        self, client: httpx.AsyncClient, sensor_name: str, now: int | None = None
+    ) -> GenericDetection | None:
+        return (await self.get_detections_for_sensors_async(client, [sensor_name], now))[sensor_name]
 
+    async def get_detections_for_sensors_async(
+        self, client: httpx.AsyncClient, sensor_names: list[str], now: int | None = None
+    ) -> dict[str, GenericDetection | None]:
+        return self.detections_from_index(await self.scrape_index_async(client, now), sensor_names)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     for name in sensors:
         GenericScraper(name).scrape(dump=True)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from scrapers.GenericScraper import GenericScraper, PayloadIndex, shared_source
+from scrapers.utils.cache import ScrapeCache
+from scrapers.utils.history import HistoryStore
+from scrapers.utils.sources import DataSource
+from scrapers.utils.variables import sensors, sensors_names, sensors_units
+
+
+class MultiScraper:
+    # Fetches several variables for the same hourly slot in one round: concurrently, over
+    # the pooled session of the source (or the given async client), through the shared
+    # cache. The payloads are combined into one view keyed by station name.
+    def __init__(
+        self,
+        sensor_names: list[str] = sensors,
+        cache: ScrapeCache | None = None,
+        history: HistoryStore | None = None,
+        source: DataSource | None = None,
+    ):
+        self.logger = logging.getLogger(str(self.__class__))
+        self.source = source if source is not None else shared_source
+        self.scrapers: dict[str, GenericScraper] = {}
+        for name in sensor_names:
+            key = name.upper()
+            if key not in self.scrapers:
+                self.scrapers[key] = GenericScraper(key, cache, history, self.source)
+
+    def scraper(self, sensor_name: str) -> GenericScraper:
+        return self.scrapers[sensor_name.upper()]
+
+    def _collect(self, names: list[str], results: list) -> dict[str, PayloadIndex]:
+        # A failed variable is left out of the round instead of failing the others
+        indexes = {}
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                self.logger.warning(
+                    "Could not scrape %s: %r", name, result, extra={"variable": name}
+                )
+            else:
+                indexes[name] = result
+        return indexes
+
+    def scrape_indexes(self, now: int | None = None) -> dict[str, PayloadIndex]:
+        now = now if now is not None else self.source.now()
+        names = list(self.scrapers)
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(names)) as executor:
+            futures = [executor.submit(self.scrapers[name].scrape_index, now) for name in names]
+        return self._collect(names, [f.exception() or f.result() for f in futures])
+
+    async def scrape_indexes_async(
+        self, client: httpx.AsyncClient, now: int | None = None
+    ) -> dict[str, PayloadIndex]:
+        now = now if now is not None else self.source.now()
+        names = list(self.scrapers)
+        results = await asyncio.gather(
+            *(self.scrapers[name].scrape_index_async(client, now) for name in names),
+            return_exceptions=True,
+        )
+        return self._collect(names, results)
+
+    def combine(self, indexes: dict[str, PayloadIndex]) -> dict:
+        # station -> {"longitude", "latitude", "values": {variable: value}}
+        stations: dict[str, dict] = {}
+        units = {}
+        for name, index in indexes.items():
+            variable_id = self.scrapers[name].selected_sensor_id
+            variable = sensors_names[variable_id]
+            units[variable] = sensors_units[variable_id]
+            for station, record in index.by_name.items():
+                entry = stations.get(station)
+                if entry is None:
+                    entry = stations[station] = {
+                        "longitude": record["lon"],
+                        "latitude": record["lat"],
+                        "values": {},
+                    }
+                entry["values"][variable] = record["value"]
+        return {"units": units, "stations": stations}
+
+    def scrape(self) -> dict:
+        now = self.source.now()
+        return {"timestamp": now, **self.combine(self.scrape_indexes(now))}
+
+    async def scrape_async(self, client: httpx.AsyncClient) -> dict:
+        now = self.source.now()
+        return {"timestamp": now, **self.combine(await self.scrape_indexes_async(client, now))}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    async def main() -> dict:
+        async with httpx.AsyncClient() as client:
+            return await MultiScraper().scrape_async(client)
+
+    print(json.dumps(asyncio.run(main()), indent=2))
@@ -0,0 +1,265 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non POSIX platforms
+    fcntl = None
+
+from .singleflight import SingleFlight
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 64
+
+CacheKey = tuple[str, int]
+
+
+class MemoryScrapeCache:
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.logger = logging.getLogger(str(self.__class__))
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.misses = 0
+        self._entries: OrderedDict[CacheKey, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Scrapes of the same (variable, timestamp) by threads or tasks share one fetch
+        self.flights = SingleFlight("scrape_cache")
+
+    def get(self, variable: str, timestamp: int) -> Any | None:
+        key = (variable, timestamp)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, data = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def put(self, variable: str, timestamp: int, data: Any) -> None:
+        key = (variable, timestamp)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @property
+    def hits(self) -> int:
+        return self.lookups - self.misses
+
+    def _count(self, counter: str) -> None:
+        # Scrapers of several threads share the cache
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_or_fetch(self, variable: str, timestamp: int, fetch: Callable[[], Any]) -> Any:
+        self._count("lookups")
+        data = self.get(variable, timestamp)
+        if data is not None:
+            return data
+
+        def fill() -> Any:
+            # The previous flight may have landed between the lookup and this call
+            cached = self.get(variable, timestamp)
+            if cached is not None:
+                return cached
+            self._count("misses")
+            fetched = fetch()
+            self.put(variable, timestamp, fetched)
+            return fetched
+
+        return self.flights.do((variable, timestamp), fill)
+
+    async def aget_or_fetch(
+        self, variable: str, timestamp: int, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        self._count("lookups")
+        data = self.get(variable, timestamp)
+        if data is not None:
+            return data
+
+        async def fill() -> Any:
+            cached = self.get(variable, timestamp)
+            if cached is not None:
+                return cached
+            self._count("misses")
+            fetched = await fetch()
+            self.put(variable, timestamp, fetched)
+            return fetched
+
+        return await self.flights.ado((variable, timestamp), fill)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class FileScrapeCache:
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        ttl: float = DEFAULT_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.logger = logging.getLogger(str(self.__class__))
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._memory = MemoryScrapeCache(ttl=ttl, max_entries=max_entries)
+
+    @staticmethod
+    def _digest(variable: str) -> str:
+        return hashlib.sha1(variable.encode()).hexdigest()[:16]
+
+    def _path(self, variable: str, timestamp: int) -> Path:
+        return self.directory / f"{self._digest(variable)}_{timestamp}.json"
+
+    def _lock_path(self, variable: str) -> Path:
+        # One lock file per variable, never removed: a process may hold a lock on it while
+        # another one evicts the payloads, and a new file at the same path would let a
+        # third process fetch the same slot again
+        return self.directory / f"{self._digest(variable)}.lock"
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, variable: str, timestamp: int) -> Any | None:
+        data = self._memory.get(variable, timestamp)
+        if data is not None:
+            return data
+
+        path = self._path(variable, timestamp)
+        try:
+            if time.time() - path.stat().st_mtime > self.ttl:
+                return None
+            with open(path) as r:
+                data = json.load(r)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        self._memory.put(variable, timestamp, data)
+        return data
+
+    def put(self, variable: str, timestamp: int, data: Any) -> None:
+        path = self._path(variable, timestamp)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as w:
+            json.dump(data, w)
+        os.replace(tmp, path)
+        self._memory.put(variable, timestamp, data)
+        self.evict()
+
+    @property
+    def hits(self) -> int:
+        return self.lookups - self.misses
+
+    def get_or_fetch(self, variable: str, timestamp: int, fetch: Callable[[], Any]) -> Any:
+        self._count("lookups")
+        data = self.get(variable, timestamp)
+        if data is not None:
+            return data
+
+        def locked_fetch() -> Any:
+            with open(self._lock_path(variable), "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    cached = self.get(variable, timestamp)
+                    if cached is not None:
+                        return cached
+                    self._count("misses")
+                    fetched = fetch()
+                    self.put(variable, timestamp, fetched)
+                    return fetched
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+        # The in-memory layer coalesces threads and tasks, the lock file serialises processes.
+        return self._memory.get_or_fetch(variable, timestamp, locked_fetch)
+
+    async def aget_or_fetch(
+        self, variable: str, timestamp: int, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        self._count("lookups")
+        data = self.get(variable, timestamp)
+        if data is not None:
+            return data
+
+        async def locked_fetch() -> Any:
+            with open(self._lock_path(variable), "a") as lock:
+                await self._alock(lock)
+                try:
+                    cached = self.get(variable, timestamp)
+                    if cached is not None:
+                        return cached
+                    self._count("misses")
+                    fetched = await fetch()
+                    self.put(variable, timestamp, fetched)
+                    return fetched
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+
+        return await self._memory.aget_or_fetch(variable, timestamp, locked_fetch)
+
+    async def _alock(self, lock) -> None:
+        # Polls the lock instead of blocking, so the event loop keeps running.
+        if fcntl is None:
+            return
+        while True:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                await asyncio.sleep(0.05)
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.ttl:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+
+        entries.sort()
+        for _, path in entries[: max(0, len(entries) - self.max_entries)]:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        self._memory.clear()
+        for path in self.directory.glob("*.json"):
+            path.unlink(missing_ok=True)
+
+
+ScrapeCache = MemoryScrapeCache | FileScrapeCache
+
+
+def cache_from_env() -> ScrapeCache:
+    ttl = float(os.getenv("SCRAPER_CACHE_TTL") or DEFAULT_TTL)
+    directory = os.getenv("SCRAPER_CACHE_DIR")
+    if directory:
+        return FileScrapeCache(directory, ttl=ttl)
+    return MemoryScrapeCache(ttl=ttl)
@@ -0,0 +1,61 @@
+import json
+from typing import Any, Callable
+
+# Accelerated JSON when one of the optional libraries is installed, stdlib otherwise.
+# Payloads are decoded from and bodies encoded to bytes, skipping the str round trip.
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - msgspec is optional
+    msgspec = None
+
+CONTENT_TYPE = "application/json"
+
+
+def stdlib_loads(data: bytes | str) -> Any:
+    return json.loads(data)
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def orjson_loads(data: bytes | str) -> Any:
+    # orjson.JSONDecodeError is a json.JSONDecodeError
+    return orjson.loads(data)
+
+
+def orjson_dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj)
+
+
+if msgspec is not None:
+    _decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+
+def msgspec_loads(data: bytes | str) -> Any:
+    try:
+        return _decoder.decode(data)
+    except msgspec.DecodeError as error:
+        raise ValueError(str(error)) from error
+
+
+def msgspec_dumps(obj: Any) -> bytes:
+    return _encoder.encode(obj)
+
+
+# (loads, dumps) of every installed backend, the preferred one first
+BACKENDS: dict[str, tuple[Callable[[bytes | str], Any], Callable[[Any], bytes]]] = {}
+if orjson is not None:
+    BACKENDS["orjson"] = (orjson_loads, orjson_dumps)
+if msgspec is not None:
+    BACKENDS["msgspec"] = (msgspec_loads, msgspec_dumps)
+BACKENDS["json"] = (stdlib_loads, stdlib_dumps)
+
+BACKEND = next(iter(BACKENDS))
+loads, dumps = BACKENDS[BACKEND]
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+MANIFEST = "fetched.txt"
+
+
+class HistoryStore:
+    # Append-only store of scraped payloads, one newline-delimited JSON file per
+    # variable and day: <root>/<variable>/<YYYY-MM-DD>.ndjson. A per-variable manifest
+    # lists the timestamps already stored, so re-runs only fetch what is missing.
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fetched: dict[str, set[int]] = {}
+
+    @staticmethod
+    def partition(timestamp: int) -> str:
+        return datetime.fromtimestamp(timestamp / 1000).strftime("%Y-%m-%d")
+
+    def _variable_dir(self, variable: str) -> Path:
+        path = self.root / variable
+        path.mkdir(exist_ok=True)
+        return path
+
+    def fetched(self, variable: str) -> set[int]:
+        with self._lock:
+            return set(self._load_manifest(variable))
+
+    def _load_manifest(self, variable: str) -> set[int]:
+        if variable not in self._fetched:
+            manifest = self._variable_dir(variable) / MANIFEST
+            timestamps = set()
+            if manifest.exists():
+                with open(manifest) as r:
+                    timestamps = {int(line) for line in r if line.strip()}
+            self._fetched[variable] = timestamps
+        return self._fetched[variable]
+
+    def has(self, variable: str, timestamp: int) -> bool:
+        with self._lock:
+            return timestamp in self._load_manifest(variable)
+
+    def missing(self, variable: str, timestamps: list[int]) -> list[int]:
+        with self._lock:
+            fetched = self._load_manifest(variable)
+            return [t for t in timestamps if t not in fetched]
+
+    def append(self, variable: str, timestamp: int, record: dict) -> bool:
+        with self._lock:
+            fetched = self._load_manifest(variable)
+            if timestamp in fetched:
+                return False
+            directory = self._variable_dir(variable)
+            line = json.dumps({"requested": timestamp, **record}, separators=(",", ":"))
+            with open(directory / f"{self.partition(timestamp)}.ndjson", "a") as w:
+                w.write(line + "\n")
+            # The manifest is written after the data, a crash in between only causes a re-fetch
+            with open(directory / MANIFEST, "a") as w:
+                w.write(f"{timestamp}\n")
+            fetched.add(timestamp)
+            return True
+
+    def get(self, variable: str, timestamp: int) -> dict | None:
+        for record in self._read_partition(self.root / variable / f"{self.partition(timestamp)}.ndjson"):
+            if record["requested"] == timestamp:
+                return record
+        return None
+
+    def read(self, variable: str, start: int | None = None, end: int | None = None) -> Iterator[dict]:
+        # Lazily yields the records of a variable, opening only the days inside [start, end]
+        directory = self.root / variable
+        if not directory.exists():
+            return
+        first = self.partition(start) if start is not None else None
+        last = self.partition(end) if end is not None else None
+        for path in sorted(directory.glob("*.ndjson")):
+            day = path.stem
+            if (first is not None and day < first) or (last is not None and day > last):
+                continue
+            for record in self._read_partition(path):
+                if start is not None and record["requested"] < start:
+                    continue
+                if end is not None and record["requested"] > end:
+                    continue
+                yield record
+
+    def variables(self) -> list[str]:
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def _read_partition(self, path: Path) -> Iterator[dict]:
+        if not path.exists():
+            return
+        with open(path) as r:
+            for line in r:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # a line truncated by an interrupted run, its timestamp is not in the manifest
+                    continue
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+from .metrics import COALESCED_CALLS, SINGLE_FLIGHT_CALLS
+
+
+class LeaderCancelled(Exception):
+    # The caller running the shared call was cancelled: the waiters start a new one
+    pass
+
+
+class SingleFlight:
+    # Concurrent calls for the same key share one execution: the first caller runs the
+    # function, the others wait for its result (or exception). In-flight calls are
+    # thread-safe futures, so threads and asyncio tasks coalesce with each other.
+    # A blocking do() must not wait, from an event loop thread, on a call running on that loop.
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self._lock:
+            self.calls += 1
+            SINGLE_FLIGHT_CALLS.inc(group=self.name)
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                COALESCED_CALLS.inc(group=self.name)
+                return flight, False
+            flight = self._flights[key] = Future()
+            # running futures cannot be cancelled by one of the waiters
+            flight.set_running_or_notify_cancel()
+            return flight, True
+
+    def _land(self, key: Hashable, flight: Future, result: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._flights.pop(key, None)
+        if isinstance(error, asyncio.CancelledError):
+            flight.set_exception(LeaderCancelled())
+        elif error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        flight, leader = self._join(key)
+        while not leader:
+            try:
+                return flight.result()
+            except LeaderCancelled:
+                flight, leader = self._join(key)
+        try:
+            result = fn()
+        except BaseException as error:
+            self._land(key, flight, error=error)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight, leader = self._join(key)
+        while not leader:
+            try:
+                return await asyncio.wrap_future(flight)
+            except LeaderCancelled:
+                flight, leader = self._join(key)
+        try:
+            result = await fn()
+        except BaseException as error:
+            self._land(key, flight, error=error)
+            raise
+        self._land(key, flight, result)
+        return result
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inFlight": self.in_flight()}
@@ -0,0 +1,273 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import httpx
+
+try:
+    import brotli  # noqa: F401
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+if TYPE_CHECKING:
+    import requests
+
+from . import fastjson
+from .history import MANIFEST, HistoryStore
+from .metrics import AVOIDED_BYTES, AVOIDED_REQUESTS, PARSE_SECONDS, PAYLOAD_BYTES
+from .timestamp import TimestampUtils
+from .variables import SENSOR_DATA_URL, sensor_ids, sensors_names
+
+DEFAULT_TIMEOUT = 30
+HOUR = 3_600_000
+# httpx and urllib3 only decode brotli when the package is installed
+ACCEPT_ENCODING = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+
+def variable_id(name: str) -> str:
+    # Accepts variable ids as well as the names used by the scrapers (rain, rain_sensor, ...)
+    if name in sensor_ids.values():
+        return name
+    key = name.removesuffix("_sensor").upper()
+    if key not in sensor_ids:
+        raise KeyError(f"Unrecognized sensor '{name}'")
+    return sensor_ids[key]
+
+
+class Fetched:
+    # Last payload downloaded for a variable, with the validators the server sent for it
+    __slots__ = ("timestamp", "payload", "size", "etag", "last_modified")
+
+    def __init__(self, timestamp: int, payload: list, size: int, etag: str | None, last_modified: str | None):
+        self.timestamp = timestamp
+        self.payload = payload
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def complete(self) -> bool:
+        # The upstream answered with the slot that was asked for: it will not change
+        # until the next hourly slot is requested
+        return bool(self.payload) and str(self.payload[0].get("time")) == str(self.timestamp)
+
+
+class HttpSource:
+    def __init__(
+        self,
+        url: str = SENSOR_DATA_URL,
+        session: "requests.Session | None" = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        self.url = url
+        self._session = session
+        self.timeout = timeout
+        # fetch runs on worker threads (WeeklyScraper, the scrape cache) while stats() is read
+        self._lock = threading.Lock()
+        self.fetched: dict[str, Fetched] = {}
+        self.requests = 0
+        self.avoided_requests = 0
+        self.avoided_bytes = 0
+
+    @property
+    def session(self) -> "requests.Session":
+        # Only the blocking fetch needs requests: async sensors never import it
+        if self._session is None:
+            import requests
+
+            self._session = requests.Session()
+        return self._session
+
+    def now(self) -> int:
+        return TimestampUtils().get_compliant_now_timestamp()
+
+    def params(self, variable: str, timestamp: int) -> dict:
+        return {
+            "variabile": variable,
+            "time": timestamp,
+        }
+
+    def headers(self, variable: str, timestamp: int) -> dict:
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        previous = self.previous(variable, timestamp)
+        if previous is not None:
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        return headers
+
+    def previous(self, variable: str, timestamp: int) -> Fetched | None:
+        with self._lock:
+            previous = self.fetched.get(variable)
+        return previous if previous is not None and previous.timestamp == timestamp else None
+
+    def avoided(self, variable: str, size: int, request: bool) -> None:
+        name = sensors_names.get(variable, variable)
+        with self._lock:
+            self.avoided_bytes += size
+            if request:
+                self.avoided_requests += 1
+        AVOIDED_BYTES.inc(size, variable=name)
+        if request:
+            AVOIDED_REQUESTS.inc(variable=name)
+
+    def skip(self, variable: str, timestamp: int) -> list | None:
+        # No request at all when the slot was already downloaded complete
+        previous = self.previous(variable, timestamp)
+        if previous is None or not previous.complete:
+            return None
+        self.avoided(variable, previous.size, request=True)
+        return previous.payload
+
+    def decode(self, variable: str, timestamp: int, response: "requests.Response | httpx.Response") -> list:
+        previous = self.previous(variable, timestamp)
+        if response.status_code == 304 and previous is not None:
+            self.avoided(variable, previous.size, request=False)
+            return previous.payload
+        response.raise_for_status()
+        name = sensors_names.get(variable, variable)
+        size = len(response.content)
+        PAYLOAD_BYTES.observe(size, variable=name)
+        with PARSE_SECONDS.time(variable=name, step="decode"):
+            payload = fastjson.loads(response.content)
+        fetched = Fetched(timestamp, payload, size, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        with self._lock:
+            self.fetched[variable] = fetched
+        return payload
+
+    def _count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def fetch(self, variable: str, timestamp: int) -> list:
+        payload = self.skip(variable, timestamp)
+        if payload is not None:
+            return payload
+        self._count_request()
+        response = self.session.get(
+            self.url,
+            params=self.params(variable, timestamp),
+            headers=self.headers(variable, timestamp),
+            timeout=self.timeout,
+        )
+        return self.decode(variable, timestamp, response)
+
+    async def fetch_async(self, client: httpx.AsyncClient, variable: str, timestamp: int) -> list:
+        payload = self.skip(variable, timestamp)
+        if payload is not None:
+            return payload
+        self._count_request()
+        response = await client.get(
+            self.url,
+            params=self.params(variable, timestamp),
+            headers=self.headers(variable, timestamp),
+            timeout=self.timeout,
+        )
+        return self.decode(variable, timestamp, response)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "avoidedRequests": self.avoided_requests,
+                "avoidedBytes": self.avoided_bytes,
+            }
+
+
+class ReplayClock:
+    # Starts at a recorded instant and runs `speed` times faster than the wall clock
+    def __init__(self, start: int, speed: float = 1.0):
+        self.start = start
+        self.speed = speed
+        self.started_at = time.monotonic()
+
+    def now(self) -> int:
+        return int(self.start + (time.monotonic() - self.started_at) * self.speed * 1000)
+
+
+class ReplaySource:
+    # Serves recorded payloads instead of calling the upstream API: a request for a
+    # timestamp gets the latest recording at or before it.
+    def __init__(self, frames: dict[str, list[tuple[int, list]]], speed: float = 1.0, loop: bool = True):
+        if not any(frames.values()):
+            raise ValueError("No recorded payloads to replay")
+        self.frames = {v: sorted(f, key=lambda frame: frame[0]) for v, f in frames.items() if f}
+        self.times = {v: [t for t, _ in f] for v, f in self.frames.items()}
+        self.first = min(t[0] for t in self.times.values())
+        self.last = max(t[-1] for t in self.times.values())
+        self.clock = ReplayClock(self.first, speed)
+        self.loop = loop
+        self.requests = 0
+
+    def now(self) -> int:
+        now = self.clock.now()
+        if self.loop:
+            now = self.first + (now - self.first) % (self.last - self.first + HOUR)
+        return TimestampUtils().get_compliant_timestamp(datetime.fromtimestamp(now / 1000))
+
+    def fetch(self, variable: str, timestamp: int) -> list:
+        if variable not in self.frames:
+            raise KeyError(f"No recorded data for variable '{variable}'")
+        self.requests += 1
+        i = bisect_right(self.times[variable], timestamp) - 1
+        return self.frames[variable][max(i, 0)][1]
+
+    async def fetch_async(self, client: httpx.AsyncClient, variable: str, timestamp: int) -> list:
+        return self.fetch(variable, timestamp)
+
+    @staticmethod
+    def from_paths(paths: list[str], speed: float = 1.0, loop: bool = True) -> "ReplaySource":
+        frames: dict[str, list[tuple[int, list]]] = {}
+        for path in map(Path, paths):
+            if path.is_dir() and any(p.is_dir() and (p / MANIFEST).exists() for p in path.iterdir()):
+                load_history(path, frames)
+            elif path.is_dir():
+                for file in sorted(path.glob("*.json")):
+                    load_recording(file, frames)
+            else:
+                load_recording(path, frames)
+        return ReplaySource(frames, speed=speed, loop=loop)
+
+
+def frame(timestamp, data: list) -> tuple[int, list]:
+    return (int(timestamp), [{"time": timestamp}, *data])
+
+
+def load_recording(path: Path, frames: dict[str, list[tuple[int, list]]]) -> None:
+    with open(path) as r:
+        content = json.load(r)
+
+    if "weekly_data" in content:
+        # <sensor>_weekly_data.json written by WeeklyScraper
+        variable = variable_id(content["sensor_id"] or content["sensor_name"])
+        for entry in content["weekly_data"]:
+            frames.setdefault(variable, []).append(frame(entry["timestamp"], entry["data"]))
+    elif "sensor_type" in content:
+        # <sensor>_<time>_data.json written by GenericScraper.scrape(dump=True)
+        variable = variable_id(content["sensor_type"])
+        frames.setdefault(variable, []).append(frame(content["timestamp"], content["data"]))
+
+
+def load_history(root: Path, frames: dict[str, list[tuple[int, list]]]) -> None:
+    store = HistoryStore(root)
+    for name in store.variables():
+        variable = variable_id(name)
+        for record in store.read(name):
+            frames.setdefault(variable, []).append(frame(record["timestamp"], record["data"]))
+
+
+DataSource = HttpSource | ReplaySource
+
+
+def source_from_env() -> DataSource:
+    paths = os.getenv("SCRAPER_REPLAY")
+    if paths:
+        speed = float(os.getenv("SCRAPER_REPLAY_SPEED") or 1)
+        return ReplaySource.from_paths(paths.split(os.pathsep), speed=speed)
+    return HttpSource(os.getenv("SCRAPER_URL") or SENSOR_DATA_URL)
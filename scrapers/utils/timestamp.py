@@ -20,3 +20,13 @@ class TimestampUtils:
             dates.append(aligned_date)
         return dates
 
+    def get_range_timestamps(self, start: datetime, end: datetime, step_hours: int = 24) -> list[int]:
+        # Newest first, like get_week_timestamps
+        if step_hours <= 0:
+            raise ValueError("step_hours must be positive")
+        dates = []
+        current = end
+        while current >= start:
+            dates.append(self.get_compliant_timestamp(current))
+            current -= timedelta(hours=step_hours)
+        return dates
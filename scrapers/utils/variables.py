@@ -0,0 +1,33 @@
+SENSOR_DATA_URL = "https://allertameteo.regione.emilia-romagna.it/o/api/allerta/get-sensor-values-no-time"
+
+sensors = [
+    "RAIN",
+    "IDRO_LEVEL",
+    "TEMP",
+    "WIND",
+    "HUMIDITY",
+]
+
+sensor_ids = {
+    "RAIN": "1,0,3600/1,-,-,-/B13011",
+    "IDRO_LEVEL": "254,0,0/1,-,-,-/B13215",
+    "TEMP": "254,0,0/103,2000,-,-/B12101",
+    "WIND": "254,0,0/103,10000,-,-/B11002",
+    "HUMIDITY": "254,0,0/103,2000,-,-/B13003",
+}
+
+sensors_names = {
+    sensor_ids["RAIN"]: "rain",
+    sensor_ids["IDRO_LEVEL"]: "idro_level",
+    sensor_ids["TEMP"]: "temp",
+    sensor_ids["WIND"]: "wind",
+    sensor_ids["HUMIDITY"]: "humidity",
+}
+
+sensors_units = {
+    sensor_ids["RAIN"]: "mm",
+    sensor_ids["IDRO_LEVEL"]: "m",
+    sensor_ids["TEMP"]: "K",
+    sensor_ids["WIND"]: "m/s",
+    sensor_ids["HUMIDITY"]: "%",
+}
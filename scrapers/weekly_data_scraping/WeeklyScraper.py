@@ -1,20 +1,33 @@
 import os
+import argparse
 import requests
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.history import HistoryStore
+from utils.sources import DataSource, HttpSource, ReplaySource
 from utils.timestamp import TimestampUtils
 from dotenv import load_dotenv
 
 logging.basicConfig(level=logging.INFO)
 
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_TIMEOUT = 30
+
 class WeeklyScraper:
-    def __init__(self):
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, retries: int = DEFAULT_RETRIES, source: DataSource | None = None):
         load_dotenv()
         self.logger = logging.getLogger(str(self.__class__))
         self.timeutils = TimestampUtils()
         self.dataset_dir = "./weekly_data/"
+        self.concurrency = max(1, concurrency)
+        self.session = self.__create_session(retries)
 
         self.SENSOR_DATA_URL = os.getenv("SENSOR_DATA_URL") or ""
         self.RAIN_VARIABLE_ID = os.getenv("RAIN_VARIABLE_ID") or ""
@@ -22,6 +35,7 @@ class WeeklyScraper:
         self.TEMP_VARIABLE_ID = os.getenv("TEMP_VARIABLE_ID") or ""
         self.WIND_VARIABLE_ID = os.getenv("WIND_VARIABLE_ID") or ""
         self.HUMIDITY_VARIABLE_ID = os.getenv("HUMIDITY_VARIABLE_ID") or ""
+        self.source = source if source is not None else HttpSource(self.SENSOR_DATA_URL, self.session, DEFAULT_TIMEOUT)
 
         self.sensors_names = {
             self.RAIN_VARIABLE_ID: "rain_sensor",
@@ -52,23 +66,54 @@ class WeeklyScraper:
     def __create_output_folder(self):
         Path(self.dataset_dir).mkdir(exist_ok=True)
 
-    def scrape_all(self, dump: bool = False):
+    def __create_session(self, retries: int) -> requests.Session:
+        # Pooled session, transient upstream errors are retried with exponential backoff
+        retry = Retry(
+            total=retries,
+            backoff_factor=DEFAULT_BACKOFF,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def fetch(self, sensor: str, timestamp: int) -> dict:
+        res = self.source.fetch(sensor, timestamp)
+        self.logger.info("Retrieved data for sensor %s for date: %s", self.sensors_names[sensor], datetime.fromtimestamp(timestamp / 1000))
+        return {
+            "date": str(datetime.fromtimestamp(timestamp / 1000)),
+            "timestamp": res[0]["time"],
+            "data": res[1:],
+        }
+
+    def fetch_or_load(self, sensor: str, timestamp: int, store: HistoryStore) -> dict:
+        # Already fetched pairs are read back from the store, new ones are written as they arrive
+        variable = self.sensors_names[sensor]
+        record = store.get(variable, timestamp) if store.has(variable, timestamp) else None
+        if record is not None:
+            record.pop("requested")
+            return record
+        record = self.fetch(sensor, timestamp)
+        store.append(variable, timestamp, record)
+        return record
+
+    def scrape_all(self, dump: bool = False, timestamps: list[int] | None = None, store: HistoryStore | None = None):
         data: list[dict] = []
-        timestamps = self.timeutils.get_week_timestamps()
-
-        for sensor in self.sensors_ids:
-            sensor_weekly_data = []
-            for timestamp in timestamps:
-                res = requests.get(self.SENSOR_DATA_URL, params={
-                    "variabile": sensor,
-                    "time": timestamp,
-                }).json()
-                self.logger.info(f"Retrieved data for sensor {self.sensors_names[sensor]} for date: {datetime.fromtimestamp(timestamp / 1000)}")
-                sensor_weekly_data.append({
-                    "date": str(datetime.fromtimestamp(timestamp / 1000)),
-                    "timestamp": res[0]["time"],
-                    "data": res[1:],
-                })
+        if timestamps is None:
+            timestamps = self.timeutils.get_week_timestamps()
+        fetch = self.fetch if store is None else lambda sensor, timestamp: self.fetch_or_load(sensor, timestamp, store)
+
+        # executor.map keeps the submission order, so results come back sensor by sensor
+        # and, for every sensor, in the same order as the timestamps.
+        jobs = [(sensor, timestamp) for sensor in self.sensors_ids for timestamp in timestamps]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(lambda job: fetch(*job), jobs))
+
+        for i, sensor in enumerate(self.sensors_ids):
+            sensor_weekly_data = results[i * len(timestamps):(i + 1) * len(timestamps)]
 
             data.append({
                 "sensor_id": sensor,
@@ -90,9 +135,26 @@ class WeeklyScraper:
 
         return data
 
+    def scrape_range(self, start: datetime, end: datetime, step_hours: int = 24, dump: bool = False, store: HistoryStore | None = None):
+        return self.scrape_all(dump=dump, timestamps=self.timeutils.get_range_timestamps(start, end, step_hours), store=store)
+
 if __name__ == "__main__":
-    scraper = WeeklyScraper()
-    data = scraper.scrape_all(dump=True)
+    parser = argparse.ArgumentParser(description="Scrape historical sensor data")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="maximum number of parallel requests")
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help="first date to scrape (ISO format), defaults to the last week")
+    parser.add_argument("--end", type=datetime.fromisoformat, default=None, help="last date to scrape (ISO format), defaults to now")
+    parser.add_argument("--hours", type=int, default=24, help="hours between two samples")
+    parser.add_argument("--history", default=None, help="history store directory, already stored samples are not fetched again")
+    parser.add_argument("--replay", nargs="+", default=None, help="recorded dumps, weekly files or history stores to read instead of the upstream API")
+    args = parser.parse_args()
+
+    source = ReplaySource.from_paths(args.replay) if args.replay else None
+    scraper = WeeklyScraper(concurrency=args.concurrency, source=source)
+    store = HistoryStore(args.history) if args.history else None
+    if args.start is None:
+        data = scraper.scrape_all(dump=True, store=store)
+    else:
+        data = scraper.scrape_range(args.start, args.end or datetime.now(), args.hours, dump=True, store=store)
 
     with open("./agg.json", 'w') as w:
         json.dump(data, w, indent=2)
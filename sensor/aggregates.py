@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import math
+from array import array
+from collections import deque
+
+HOUR = 3_600_000
+DEFAULT_WINDOWS = {"1h": HOUR, "3h": 3 * HOUR, "24h": 24 * HOUR}
+# samples kept per window: enough for a day of hourly slots with room to spare
+DEFAULT_CAPACITY = 64
+STATISTICS = ("sum", "mean", "min", "max", "delta", "rate")
+
+
+class RollingWindow:
+    # Samples of the last `window` milliseconds of one station, in two fixed-size arrays
+    # used as a ring. The sum is kept incrementally and min/max through monotonic deques
+    # of sample sequence numbers, so every push and eviction is O(1) (amortized for min/max).
+    __slots__ = ("window", "capacity", "times", "values", "size", "pushed", "total", "_min", "_max")
+
+    def __init__(self, window: int, capacity: int = DEFAULT_CAPACITY):
+        self.window = window
+        self.capacity = max(1, capacity)
+        self.times = array("q", bytes(8 * self.capacity))
+        self.values = array("d", bytes(8 * self.capacity))
+        self.size = 0
+        # sequence number of the next sample, the oldest one is pushed - size
+        self.pushed = 0
+        self.total = 0.0
+        self._min: deque[int] = deque()
+        self._max: deque[int] = deque()
+
+    def _slot(self, seq: int) -> int:
+        return seq % self.capacity
+
+    def _evict(self) -> None:
+        oldest = self.pushed - self.size
+        self.total -= self.values[self._slot(oldest)]
+        self.size -= 1
+        for extreme in (self._min, self._max):
+            if extreme and extreme[0] == oldest:
+                extreme.popleft()
+
+    def push(self, timestamp: int, value: float) -> bool:
+        # Samples must be newer than the last one: repeated reads of a slot are ignored
+        if self.size and timestamp <= self.times[self._slot(self.pushed - 1)]:
+            return False
+        while self.size and (
+            self.size == self.capacity or timestamp - self.times[self._slot(self.pushed - self.size)] >= self.window
+        ):
+            self._evict()
+
+        seq = self.pushed
+        slot = self._slot(seq)
+        self.times[slot] = timestamp
+        self.values[slot] = value
+        self.total += value
+        self.size += 1
+        self.pushed += 1
+        while self._min and self.values[self._slot(self._min[-1])] >= value:
+            self._min.pop()
+        self._min.append(seq)
+        while self._max and self.values[self._slot(self._max[-1])] <= value:
+            self._max.pop()
+        self._max.append(seq)
+        return True
+
+    def first(self) -> tuple[int, float]:
+        slot = self._slot(self.pushed - self.size)
+        return self.times[slot], self.values[slot]
+
+    def last(self) -> tuple[int, float]:
+        slot = self._slot(self.pushed - 1)
+        return self.times[slot], self.values[slot]
+
+    def statistic(self, name: str) -> float | None:
+        if not self.size:
+            return None
+        if name == "sum":
+            return self.total
+        if name == "mean":
+            return self.total / self.size
+        if name == "min":
+            return self.values[self._slot(self._min[0])]
+        if name == "max":
+            return self.values[self._slot(self._max[0])]
+        (t0, v0), (t1, v1) = self.first(), self.last()
+        if name == "delta":
+            return v1 - v0
+        if name == "rate":
+            # change per hour between the oldest and the newest sample
+            return (v1 - v0) / (t1 - t0) * HOUR if t1 > t0 else None
+        raise KeyError(f"Unknown statistic '{name}'")
+
+    def summary(self) -> dict:
+        return {"count": self.size, **{name: self.statistic(name) for name in STATISTICS}}
+
+
+class Aggregator:
+    # Rolling windows of every station a sensor observes. Derived metrics are named
+    # <statistic>_<window>, e.g. sum_3h for the rain accumulated over the last 3 hours.
+    def __init__(self, windows: dict[str, int] | None = None, capacity: int = DEFAULT_CAPACITY):
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.capacity = capacity
+        self.stations: dict[str, dict[str, RollingWindow]] = {}
+
+    def update(self, station: str, timestamp: int | str, value: float | None) -> bool:
+        if value is None or math.isnan(value):
+            return False
+        windows = self.stations.get(station)
+        if windows is None:
+            windows = self.stations[station] = {
+                name: RollingWindow(window, self.capacity) for name, window in self.windows.items()
+            }
+        return all([w.push(int(timestamp), float(value)) for w in windows.values()])
+
+    def parse(self, metric: str) -> tuple[str, str]:
+        statistic, _, window = metric.partition("_")
+        if statistic not in STATISTICS or window not in self.windows:
+            raise KeyError(f"Unknown metric '{metric}', expected <{'|'.join(STATISTICS)}>_<{'|'.join(self.windows)}>")
+        return statistic, window
+
+    def metric(self, station: str, metric: str) -> float | None:
+        statistic, window = self.parse(metric)
+        windows = self.stations.get(station)
+        return None if windows is None else windows[window].statistic(statistic)
+
+    def summary(self, station: str) -> dict:
+        windows = self.stations.get(station, {})
+        return {name: window.summary() for name, window in windows.items()}
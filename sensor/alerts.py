@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+
+from scrapers.DetectionBatch import THRESHOLD_NAMES, DetectionBatch
+from sensor.queries import Query
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is optional
+    np = None
+
+NO_ALERT = -1
+SUPPORTED_OPERATORS = (">", "<")
+
+
+class AlertResult:
+    def __init__(self, engine: AlertEngine, batch: DetectionBatch, scraper_levels: list[int], query_levels: list[int]):
+        self.engine = engine
+        self.batch = batch
+        # index into THRESHOLD_NAMES of the scraper alert of every station, or NO_ALERT
+        self.scraper_levels = scraper_levels
+        # index into engine.ordered of the custom query triggered by every station, or NO_ALERT
+        self.query_levels = query_levels
+
+    def scraper_alert(self, i: int) -> tuple[str, float] | None:
+        level = self.scraper_levels[i]
+        if level == NO_ALERT:
+            return None
+        return (THRESHOLD_NAMES[level], self.batch.raw_thresholds[level][i])
+
+    def query_alert(self, i: int) -> Query | None:
+        level = self.query_levels[i]
+        return None if level == NO_ALERT else self.engine.ordered[level]
+
+
+class AlertEngine:
+    # Compiles the configured queries once and evaluates every station of a payload at
+    # once, giving the same answers as GenericDetection.to_json and Query.checkQueries.
+    def __init__(self, queries: list[Query]):
+        for q in queries:
+            if q.operator.symbol not in SUPPORTED_OPERATORS:
+                raise RuntimeError("operator symbol not recognized: " + q.operator.symbol)
+
+        # checkQueries sorts by descending threshold on every call, here it is done once
+        self.ordered: list[Query] = sorted(queries, key=lambda q: q.threshold, reverse=True)
+        self.thresholds = [float(q.threshold) for q in self.ordered]
+        self.greater_only = all(q.operator.symbol == ">" for q in self.ordered)
+
+        # With only ">" queries the winner is the highest threshold below the value: keep
+        # the ascending distinct thresholds and, for ties, the query checkQueries meets first.
+        winners: dict[float, int] = {}
+        for i, threshold in enumerate(self.thresholds):
+            winners.setdefault(threshold, i)
+        self.ascending = sorted(winners)
+        self.ascending_winners = [winners[t] for t in self.ascending]
+
+    def level(self, value: float) -> int:
+        # Index into ordered of the query a single value triggers, or NO_ALERT
+        if not self.ordered or math.isnan(value):
+            return NO_ALERT
+        if self.greater_only:
+            position = bisect_left(self.ascending, value)
+            return NO_ALERT if position == 0 else self.ascending_winners[position - 1]
+        return self._first_match(value)
+
+    def check(self, value: float) -> Query | None:
+        # Same answer as Query.checkQueries(value, queries), for the value of one station
+        level = self.level(value)
+        return None if level == NO_ALERT else self.ordered[level]
+
+    def evaluate(self, batch: DetectionBatch) -> AlertResult:
+        return AlertResult(self, batch, self.scraper_levels(batch), self.query_levels(batch))
+
+    def evaluate_scraped(self, data: dict) -> AlertResult:
+        return self.evaluate(DetectionBatch.from_scraped_data(data))
+
+    def scraper_levels(self, batch: DetectionBatch) -> list[int]:
+        if np is not None:
+            values = np.frombuffer(batch.values, dtype=np.float64)
+            levels = np.full(len(batch), NO_ALERT, dtype=np.int64)
+            # Later thresholds (by name) override earlier ones, NaN never compares true
+            for level, column in enumerate(batch.thresholds):
+                levels[values >= np.frombuffer(column, dtype=np.float64)] = level
+            return levels.tolist()
+
+        levels = []
+        for i, value in enumerate(batch.values):
+            level = NO_ALERT
+            for k, column in enumerate(batch.thresholds):
+                if value >= column[i]:
+                    level = k
+            levels.append(level)
+        return levels
+
+    def query_levels(self, batch: DetectionBatch) -> list[int]:
+        if not self.ordered:
+            return [NO_ALERT] * len(batch)
+        if np is not None:
+            return self._query_levels_numpy(batch)
+        return [self.level(value) for value in batch.values]
+
+    def _query_levels_numpy(self, batch: DetectionBatch) -> list[int]:
+        values = np.frombuffer(batch.values, dtype=np.float64)
+        if self.greater_only:
+            positions = np.searchsorted(np.asarray(self.ascending), values, side="left")
+            winners = np.asarray([NO_ALERT] + self.ascending_winners, dtype=np.int64)
+            levels = winners[positions]
+            levels[np.isnan(values)] = NO_ALERT
+            return levels.tolist()
+
+        levels = np.full(len(batch), NO_ALERT, dtype=np.int64)
+        # Walk the queries from the last to the first so the first match wins
+        for i in range(len(self.ordered) - 1, -1, -1):
+            if self.ordered[i].operator.symbol == ">":
+                mask = values > self.thresholds[i]
+            else:
+                mask = values < self.thresholds[i]
+            levels[mask] = i
+        return levels.tolist()
+
+    def _first_match(self, value: float) -> int:
+        for i, q in enumerate(self.ordered):
+            if q.check(value):
+                return i
+        return NO_ALERT
@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
 
+import asyncio
+import json
 import yaml
 import random
 import os
 import sys
-import subprocess
 import logging
+from create_template import MANIFEST_FILE, STUB_TEMPLATE, TEMPLATE_FILE, generate
+from schedule import name_offset, peak_load, plan_offsets
+from supervisor import STATUS_FILE, Supervised, Supervisor, format_status
 
 logger = logging.getLogger('TempalteCreator')
 
+# Each run of a standalone sensor fetches the upstream payload once and posts its detection
+# to the gateway (alerts come on top of it)
+REQUESTS_PER_TICK = 2
+
 selected_sensors = {
     "idro_level": [
         "Diga di Ridracoli",
@@ -59,7 +67,7 @@ selected_sensors = {
     ]
 }
 
-def generate_sensor_config(name: str, sensor_type: str, port: int, ip: str) -> dict:
+def generate_sensor_config(name: str, sensor_type: str, port: int, ip: str, second: int | str = 'auto') -> dict:
     queries = ["soglia1", "soglia2", "soglia3"] if sensor_type != 'rain' else []
     return {
         "sensor": {
@@ -86,7 +94,8 @@ def generate_sensor_config(name: str, sensor_type: str, port: int, ip: str) -> d
             "cronjob": {
                 "day_of_week": "0-6",
                 "hour": "*",
-                "minute": "*"
+                "minute": "*",
+                "second": second
             }
         }
     }
@@ -98,10 +107,15 @@ def create_config_files(directory: str):
     # ips = [ f'122.178.101.{n}' for n in random.sample(range(1, 255), num_sensors) ]
     ports = random.sample(range(12000, 20000), num_sensors)
 
+    # Sensors share the same cron expression: spread their runs evenly over the minute
+    offsets = plan_offsets([job_name(t, n) for t, names in selected_sensors.items() for n in names])
+    log_plan(list(offsets.values()))
+
     i = 0
     for sensor_type, sensor_names in selected_sensors.items():
         for sensor_name in sensor_names:
-            config = generate_sensor_config(sensor_name, sensor_type, ports[i], '0.0.0.0')
+            second = offsets[job_name(sensor_type, sensor_name)]
+            config = generate_sensor_config(sensor_name, sensor_type, ports[i], '0.0.0.0', second)
             formatted_name = sensor_name.replace(' ', '')
             output_file = os.path.join(directory, f'sensor_{sensor_type}_{formatted_name}.yaml')
             with open(output_file, 'w') as f:
@@ -109,6 +123,47 @@ def create_config_files(directory: str):
             logger.info(f"Config for sensor '{sensor_name}' of type {sensor_type} has been created succesfully at: {output_file}")
             i += 1
 
+def job_name(sensor_type: str, sensor_name: str) -> str:
+    return f"{sensor_type}_{sensor_name.replace(' ', '')}"
+
+def log_plan(offsets: list[int], jitter: int = 0):
+    report = peak_load(offsets, REQUESTS_PER_TICK, jitter)
+    logger.info(
+        f"{report['sensors']} sensors: peak {report['peakRequestsPerSecond']} req/s at second {report['busiestSecond']}, "
+        f"mean {report['meanRequestsPerSecond']} req/s, {report['unspreadPeakRequestsPerSecond']} req/s if all fire at once"
+    )
+
+def plan_fleet(yaml_files: list[str], apply: bool = False):
+    # Reports the projected load of the configured offsets and, with apply, rewrites them
+    # so that the runs are evenly spread over the minute
+    configs = {}
+    for yaml_file in yaml_files:
+        with open(yaml_file) as f:
+            configs[yaml_file] = yaml.safe_load(f)
+
+    def current_second(config) -> int | None:
+        sensor = config['sensor']
+        second = str(sensor['cronjob'].get('second', 'auto'))
+        if second == 'auto':
+            return name_offset(job_name(sensor['information']['type'], sensor['information']['name']))
+        return int(second) if second.isdigit() else None
+
+    jitter = max((int(c['sensor']['cronjob'].get('jitter', 0)) for c in configs.values()), default=0)
+    seconds = [current_second(c) for c in configs.values()]
+    logger.info(f'Current schedule ({seconds.count(None)} sensors with a custom second are not counted)')
+    log_plan([s for s in seconds if s is not None], jitter)
+    if not apply:
+        return
+
+    jobs = {f: job_name(c['sensor']['information']['type'], c['sensor']['information']['name']) for f, c in configs.items()}
+    offsets = plan_offsets(list(jobs.values()))
+    for yaml_file, config in configs.items():
+        config['sensor']['cronjob']['second'] = offsets[jobs[yaml_file]]
+        with open(yaml_file, 'w') as f:
+            yaml.safe_dump(config, f, default_flow_style=False, sort_keys=False)
+    logger.info('Planned schedule')
+    log_plan(list(offsets.values()), jitter)
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     directory = 'sensors_config'
@@ -122,16 +177,44 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         if sys.argv[1] == 'create':
             logger.info('Creating sensors from yaml specifications')
-            yaml_files = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.yaml')]
-            for yaml_file in yaml_files:
-                logger.info(f'Procesing {yaml_file}')
-                subprocess.run(['python3', 'create_template.py', yaml_file], stdout=subprocess.DEVNULL)
+            yaml_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.yaml'))
+            # usage: create [--force] [--stub] [--workers N]
+            force = '--force' in sys.argv
+            template_file = STUB_TEMPLATE if '--stub' in sys.argv else TEMPLATE_FILE
+            workers = int(sys.argv[sys.argv.index('--workers') + 1]) if '--workers' in sys.argv else 0
+            report = generate(yaml_files, template_file, force=force, workers=workers)
+            logger.info(
+                f"Generated {len(report['generated'])} sensors, {len(report['skipped'])} unchanged, in {report['seconds']:.3f}s"
+            )
+        elif sys.argv[1] == 'plan':
+            # usage: plan [--apply]
+            yaml_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.yaml'))
+            plan_fleet(yaml_files, apply='--apply' in sys.argv)
+        elif sys.argv[1] == 'supervise':
+            # usage: supervise [--scripts] [--stagger S] [--poll S]
+            yaml_files = sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith('.yaml'))
+            options = {
+                key: float(sys.argv[sys.argv.index(flag) + 1])
+                for flag, key in (('--stagger', 'stagger'), ('--poll', 'poll_interval'))
+                if flag in sys.argv
+            }
+            sensors = [Supervised(f, scripts='--scripts' in sys.argv) for f in yaml_files]
+            # one line per health check otherwise
+            logging.getLogger('httpx').setLevel(logging.WARNING)
+            logger.info(f'Supervising {len(sensors)} sensors, status in {STATUS_FILE}')
+            asyncio.run(Supervisor(sensors, **options).run())
+        elif sys.argv[1] == 'status':
+            with open(STATUS_FILE) as f:
+                status = json.load(f)
+            print(format_status(status['sensors']))
         elif sys.argv[1] == 'clear':
             logger.info('clearing all generated sensors')
             all_sensors = [sensor.replace(' ', '') for sensors in selected_sensors.values() for sensor in sensors]
-            files_to_delete = [file for file in os.listdir() if any(sensor in file for sensor in all_sensors) and file != 'sensor_template.py']
+            files_to_delete = [file for file in os.listdir() if any(sensor in file for sensor in all_sensors) and file not in ('sensor_template.py', 'sensor_stub.py')]
             for file in files_to_delete:
                 os.remove(file)
+            if os.path.exists(MANIFEST_FILE):
+                os.remove(MANIFEST_FILE)
             logger.info('Cleanup complete!')
     else:
         logger.info("No <create> option has been provided, doing nothing...")
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+
+import yaml
+
+from sensor.aggregates import DEFAULT_CAPACITY, DEFAULT_WINDOWS
+from sensor.create_template import dfs
+from sensor.logs import DEFAULT_FORMAT, DEFAULT_LEVEL, DEFAULT_SAMPLE
+from sensor.queries import Query
+from sensor.schedule import (
+    AUTO,
+    DEFAULT_COALESCE,
+    DEFAULT_JITTER,
+    DEFAULT_MAX_INSTANCES,
+    DEFAULT_MISFIRE_GRACE_TIME,
+    parse_flag,
+)
+
+# Defaults of the delivery queue and the registry state. They live here rather than in
+# sensor.delivery and sensor.registry so that reading a configuration does not import
+# httpx or fastapi.
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_QUEUE = 10_000
+DEFAULT_STATE_TTL = 3600.0
+
+
+def parse_query(node) -> str | Query:
+    # Plain names refer to the thresholds published by the scraper (e.g. soglia1),
+    # mappings describe a custom query checked by the sensor itself.
+    if type(node) == dict:
+        return Query(node["operator"], node["name"], node["threshold"], node.get("metric"))
+    return node
+
+
+class SensorConfig:
+    def __init__(self, values: dict):
+        self.values = values
+        self.name: str = values["SENSOR_INFORMATION_NAME"]
+        self.type: str = values["SENSOR_INFORMATION_TYPE"]
+        self.description: str = values.get("SENSOR_INFORMATION_DESCRIPTION", "")
+        raw_queries = values.get("SENSOR_INFORMATION_QUERIES") or []
+        self.queries: list[str | Query] = [parse_query(q) for q in raw_queries]
+
+        self.ip: str = values["SENSOR_ETHERNET_IP"]
+        self.port: int = int(values["SENSOR_ETHERNET_PORT"])
+
+        self.registry: str = values["SENSOR_REGISTRY_URL"]
+        self.apikey: str = values["SENSOR_REGISTRY_KEY"]
+        self.registerPath: str = values["SENSOR_REGISTRY_REGISTERPATH"]
+        self.shutdownPath: str = values["SENSOR_REGISTRY_SHUTDOWNPATH"]
+        # Optional: bulk endpoint suffix and directory remembering past registrations
+        self.registry_bulk_suffix: str | None = values.get("SENSOR_REGISTRY_BULKSUFFIX")
+        self.registry_state_dir: str | None = values.get("SENSOR_REGISTRY_STATEDIR")
+        self.registry_state_ttl = float(values.get("SENSOR_REGISTRY_STATETTL", DEFAULT_STATE_TTL))
+
+        self.api_gateway_info = {
+            "url": values["SENSOR_APIGATEWAY_URL"],
+            "port": int(values["SENSOR_APIGATEWAY_PORT"]),
+        }
+        self.delivery = {
+            "batch_size": int(values.get("SENSOR_DELIVERY_BATCHSIZE", DEFAULT_BATCH_SIZE)),
+            "flush_interval": float(values.get("SENSOR_DELIVERY_FLUSHINTERVAL", DEFAULT_FLUSH_INTERVAL)),
+            "max_queue": int(values.get("SENSOR_DELIVERY_MAXQUEUE", DEFAULT_MAX_QUEUE)),
+            "batch_suffix": values.get("SENSOR_DELIVERY_BATCHSUFFIX"),
+            "drain_rate": values.get("SENSOR_DELIVERY_DRAINRATE"),
+        }
+        self.spool_dir: str | None = values.get("SENSOR_DELIVERY_SPOOLDIR")
+        sample_prefix = "SENSOR_LOGGING_SAMPLE_"
+        self.logging = {
+            "level": values.get("SENSOR_LOGGING_LEVEL", DEFAULT_LEVEL),
+            "format": values.get("SENSOR_LOGGING_FORMAT", DEFAULT_FORMAT),
+            "sample": {
+                **DEFAULT_SAMPLE,
+                **{k.removeprefix(sample_prefix).lower(): int(v) for k, v in values.items() if k.startswith(sample_prefix)},
+            },
+        }
+        window_prefix = "SENSOR_AGGREGATION_WINDOWS_"
+        windows = {k.removeprefix(window_prefix).lower(): int(float(v) * 1000) for k, v in values.items() if k.startswith(window_prefix)}
+        self.aggregation = {
+            "windows": windows or DEFAULT_WINDOWS,
+            "capacity": int(values.get("SENSOR_AGGREGATION_CAPACITY", DEFAULT_CAPACITY)),
+        }
+        self.cron_info = {
+            "day_of_the_week": str(values["SENSOR_CRONJOB_DAY_OF_WEEK"]),
+            "hour": str(values["SENSOR_CRONJOB_HOUR"]),
+            "minute": str(values["SENSOR_CRONJOB_MINUTE"]),
+            # "auto" derives the second from the sensor name, jitter delays each run by up to N seconds
+            "second": str(values.get("SENSOR_CRONJOB_SECOND", AUTO)),
+            "jitter": int(values.get("SENSOR_CRONJOB_JITTER", DEFAULT_JITTER)),
+            "misfire_grace_time": int(values.get("SENSOR_CRONJOB_MISFIRE_GRACE_TIME", DEFAULT_MISFIRE_GRACE_TIME)),
+            "coalesce": parse_flag(values.get("SENSOR_CRONJOB_COALESCE", DEFAULT_COALESCE)),
+            "max_instances": int(values.get("SENSOR_CRONJOB_MAX_INSTANCES", DEFAULT_MAX_INSTANCES)),
+        }
+
+    @property
+    def formatted_name(self) -> str:
+        return self.name.replace(" ", "")
+
+    @property
+    def custom_queries(self) -> list[Query]:
+        return [q for q in self.queries if isinstance(q, Query) and q.metric is None]
+
+    @property
+    def derived_queries(self) -> list[Query]:
+        return [q for q in self.queries if isinstance(q, Query) and q.metric is not None]
+
+    @property
+    def query_names(self) -> list[str]:
+        return [q.name if isinstance(q, Query) else q for q in self.queries]
+
+    @staticmethod
+    def from_dict(content: dict) -> SensorConfig:
+        return SensorConfig(dfs("", content, {}))
+
+    @staticmethod
+    def from_yaml(path: str | os.PathLike) -> SensorConfig:
+        with open(path) as file:
+            return SensorConfig.from_dict(yaml.safe_load(file))
+
+
+def load_configs(paths: list[str]) -> list[SensorConfig]:
+    configs = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".yaml"))
+        else:
+            files = [path]
+        configs.extend(SensorConfig.from_yaml(f) for f in files)
+    return configs
@@ -1,21 +1,24 @@
-import yaml
-from jinja2 import Template
-from collections import defaultdict
+import hashlib
+import json
+import os
 import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+import yaml
 
-if len(sys.argv) != 2:
-    print("Usage: python create_template.py <config_file.yaml>")
-    sys.exit(1)
+if TYPE_CHECKING:
+    from jinja2 import Template
 
-config_file = sys.argv[1]
+TEMPLATE_FILE = "sensor_template.py"
+# Thin launcher for sensor/runtime.py: every sensor shares the same compiled module
+STUB_TEMPLATE = "sensor_stub.py"
+MANIFEST_FILE = ".generated.json"
+
+_compiled: dict[str, tuple[str, "Template"]] = {}
 
-print(f"Reading the configuration File: '{config_file}'")
-configuration_content = ""
-with open(config_file) as file:
-    configuration_content = file.read()
-yaml_file = yaml.safe_load(configuration_content)
-values = defaultdict(str)
-print("Now We have to create the map key-value, used for the template replacing.")
 
 def check_for_node(key_name: str, node):
     if type(node) == int and node < 0:
@@ -24,23 +27,114 @@ def check_for_node(key_name: str, node):
         raise ValueError(f"String type information at: {key_name} can not be null and It should contain at least one char")
     return node
 
-def dfs(key, node):
+def dfs(key, node, values: dict, verbose: bool = False):
     if type(node) != dict or len(node) == 0:
         values[key] = check_for_node(key, node)
-        print(f"Key: {key}, Value: {node}")
-        return
+        if verbose:
+            print(f"Key: {key}, Value: {node}")
+        return values
     for name in node.keys():
-        dfs(key + ("_" if len(key) > 0 else "") + name.upper(), node[name])
-    
-dfs("", yaml_file)
-with open("sensor_template.py") as file:
-    configuration_content = file.read()
-print("Replace all the information inside the template file.")
-template = Template(configuration_content)
-new_content = template.render(**values)
-
-sensor_name = values["SENSOR_INFORMATION_NAME"].replace(" ", "")
-sensor_type = values["SENSOR_INFORMATION_TYPE"]
-with open(f"sensor_{sensor_type}_{sensor_name}.py", "w") as file:
-    file.write(new_content)
+        dfs(key + ("_" if len(key) > 0 else "") + name.upper(), node[name], values, verbose)
+    return values
+
+def load_values(config_content: str, verbose: bool = False) -> defaultdict:
+    return dfs("", yaml.safe_load(config_content), defaultdict(str), verbose)
+
+def compile_template(template_file: str = TEMPLATE_FILE) -> tuple[str, "Template"]:
+    # The template is read and compiled once per process, then reused for every sensor.
+    # jinja2 is imported here: sensors only need dfs from this module.
+    from jinja2 import Template
+
+    if template_file not in _compiled:
+        with open(template_file) as file:
+            source = file.read()
+        _compiled[template_file] = (source, Template(source))
+    return _compiled[template_file]
+
+def output_name(values: dict) -> str:
+    sensor_name = values["SENSOR_INFORMATION_NAME"].replace(" ", "")
+    sensor_type = values["SENSOR_INFORMATION_TYPE"]
+    return f"sensor_{sensor_type}_{sensor_name}.py"
+
+def render_sensor(config_file: str, template_file: str = TEMPLATE_FILE, output_dir: str = ".", verbose: bool = False) -> str:
+    with open(config_file) as file:
+        content = file.read()
+    values = load_values(content, verbose)
+    # The template embeds the whole configuration, the stub refers to the yaml file
+    values["CONFIGURATION"] = yaml.safe_load(content)
+    values["CONFIG_FILE"] = os.path.relpath(config_file, output_dir)
+    _, template = compile_template(template_file)
+    output_file = os.path.join(output_dir, output_name(values))
+    with open(output_file, "w") as file:
+        file.write(template.render(**values))
+    return output_file
+
+def _digest(template_source: str, config_content: str) -> str:
+    return hashlib.sha256((template_source + "\0" + config_content).encode()).hexdigest()
+
+def _generate_one(job: tuple[str, str, str]) -> str:
+    config_file, template_file, output_dir = job
+    return render_sensor(config_file, template_file, output_dir)
+
+def generate(
+    config_files: list[str],
+    template_file: str = TEMPLATE_FILE,
+    output_dir: str = ".",
+    workers: int = 0,
+    force: bool = False,
+) -> dict:
+    # Renders every configuration, skipping the ones whose yaml and template did not
+    # change since the last run (tracked by content hash in MANIFEST_FILE).
+    start = time.perf_counter()
+    template_source, _ = compile_template(template_file)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    jobs, digests, skipped = [], {}, []
+    for config_file in config_files:
+        with open(config_file) as file:
+            digest = _digest(template_source, file.read())
+        previous = manifest.get(config_file)
+        if not force and previous and previous["digest"] == digest and os.path.exists(previous["output"]):
+            skipped.append(previous["output"])
+            continue
+        digests[config_file] = digest
+        jobs.append((config_file, template_file, output_dir))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outputs = list(executor.map(_generate_one, jobs))
+    else:
+        outputs = [_generate_one(job) for job in jobs]
+
+    for (config_file, _, _), output in zip(jobs, outputs):
+        manifest[config_file] = {"digest": digests[config_file], "output": output}
+    with open(manifest_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+
+    return {
+        "generated": outputs,
+        "skipped": skipped,
+        "seconds": time.perf_counter() - start,
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python create_template.py [--stub] <config_file.yaml> [<config_file.yaml> ...]")
+        sys.exit(1)
 
+    template_file = STUB_TEMPLATE if "--stub" in sys.argv else TEMPLATE_FILE
+    config_files = [arg for arg in sys.argv[1:] if arg != "--stub"]
+    if len(config_files) == 1:
+        config_file = config_files[0]
+        print(f"Reading the configuration File: '{config_file}'")
+        print("Now We have to create the map key-value, used for the template replacing.")
+        output_file = render_sensor(config_file, template_file, verbose=True)
+        print(f"Replace all the information inside the template file: {output_file}")
+    else:
+        report = generate(config_files, template_file, force=True)
+        print(f"Generated {len(report['generated'])} sensors in {report['seconds']:.3f}s")
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict, deque
+
+import httpx
+
+from sensor.config import DEFAULT_BATCH_SIZE, DEFAULT_FLUSH_INTERVAL, DEFAULT_MAX_QUEUE
+from sensor.gateway import GatewayClient
+from sensor.metrics import DELIVERY_DROPPED, DELIVERY_FLUSH_SECONDS, DELIVERY_ITEMS, DELIVERY_QUEUE_DEPTH
+from sensor.spool import Spool
+
+LATENCY_SAMPLES = 100
+
+
+class DeliveryQueue:
+    # Buffers the alerts and detections of one or more sensors and sends them to the
+    # gateway in flushes bounded by size and time. Items that fail with a transient
+    # error stay queued for the next flush; when the queue is full the oldest are dropped.
+    def __init__(
+        self,
+        client: GatewayClient,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        batch_suffix: str | None = None,
+        spool: Spool | None = None,
+        drain_rate: float | None = None,
+        name: str = "delivery",
+    ):
+        self.client = client
+        # "queue" label of the delivery metrics: the sensor, or the host sharing the queue
+        self.name = name
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        # When set, each group is posted as one JSON array to <endpoint><batch_suffix>,
+        # otherwise the items of a flush are posted concurrently on the pooled client.
+        self.batch_suffix = batch_suffix
+        # With a spool every item is written to disk first and survives restarts and
+        # gateway outages; drain_rate (items/s) limits how fast a backlog is replayed.
+        self.spool = spool
+        self.drain_rate = drain_rate
+        self.items: deque[tuple[str, dict]] = deque()
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_latencies: deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return self.spool.pending if self.spool is not None else len(self.items)
+
+    def _observe_depth(self) -> None:
+        DELIVERY_QUEUE_DEPTH.set(self.depth, queue=self.name)
+
+    def _observe_flush(self, seconds: float, delivered: int) -> None:
+        self.flush_latencies.append(seconds)
+        self.flushes += 1
+        DELIVERY_FLUSH_SECONDS.observe(seconds, queue=self.name)
+        DELIVERY_ITEMS.inc(delivered, queue=self.name, result="sent")
+
+    def _refused(self, count: int) -> None:
+        self.failed += count
+        DELIVERY_ITEMS.inc(count, queue=self.name, result="failed")
+
+    def put(self, url: str, body: dict) -> None:
+        if self.spool is not None:
+            self.spool.append(url, body)
+            self._observe_depth()
+            if self.spool.pending >= self.batch_size:
+                self._wakeup.set()
+            return
+        if len(self.items) >= self.max_queue:
+            self.items.popleft()
+            self.dropped += 1
+            DELIVERY_DROPPED.inc(queue=self.name)
+        self.items.append((url, body))
+        self._observe_depth()
+        if len(self.items) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> int:
+        if self.spool is not None:
+            return await self._drain()
+        sent = 0
+        async with self._flush_lock:
+            while self.items:
+                batch = [self.items.popleft() for _ in range(min(self.batch_size, len(self.items)))]
+                start, failed = time.perf_counter(), self.failed
+                try:
+                    retry = await self._send(batch)
+                except BaseException:
+                    # cancelled while sending (e.g. on shutdown): nothing is lost
+                    self.items.extendleft(reversed(batch))
+                    raise
+                delivered = len(batch) - len(retry) - (self.failed - failed)
+                self._observe_flush(time.perf_counter() - start, delivered)
+                sent += delivered
+                if retry:
+                    # The gateway is failing: keep the order and wait for the next flush
+                    self.items.extendleft(reversed(retry))
+                    break
+        self.sent += sent
+        self._observe_depth()
+        return sent
+
+    async def _drain(self) -> int:
+        sent = 0
+        async with self._flush_lock:
+            self.spool.sync()
+            while True:
+                batch, position = self.spool.read(self.batch_size)
+                if not batch:
+                    break
+                start, failed = time.perf_counter(), self.failed
+                retry = await self._send(batch)
+                delivered = len(batch) - len(retry) - (self.failed - failed)
+                self._observe_flush(time.perf_counter() - start, delivered)
+                sent += delivered
+                if len(retry) == len(batch):
+                    # Gateway unreachable: leave the batch in place for the next flush
+                    break
+                # Partially delivered: acknowledge the batch, failed items go back at the end of the log
+                for url, body in retry:
+                    self.spool.append(url, body)
+                self.spool.ack(position, len(batch))
+                if retry:
+                    self.spool.sync()
+                    break
+                if self.drain_rate:
+                    await asyncio.sleep(len(batch) / self.drain_rate)
+        self.sent += sent
+        self._observe_depth()
+        return sent
+
+    async def _send(self, batch: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        groups: dict[str, list[dict]] = defaultdict(list)
+        for url, body in batch:
+            groups[url].append(body)
+
+        if self.batch_suffix is not None:
+            urls = list(groups)
+            responses = await asyncio.gather(
+                *(self.client.post(url + self.batch_suffix, json=groups[url]) for url in urls),
+                return_exceptions=True,
+            )
+            retry = []
+            for url, response in zip(urls, responses):
+                if self._transient(response):
+                    retry.extend((url, body) for body in groups[url])
+                elif not response.is_success:
+                    self._refused(len(groups[url]))
+            return retry
+
+        responses = await asyncio.gather(
+            *(self.client.post(url, json=body) for url, body in batch),
+            return_exceptions=True,
+        )
+        retry = []
+        for item, response in zip(batch, responses):
+            if self._transient(response):
+                retry.append(item)
+            elif not response.is_success:
+                self._refused(1)
+        return retry
+
+    @staticmethod
+    def _transient(response: httpx.Response | BaseException) -> bool:
+        # Connection errors, timeouts, 5xx and 429 are retried, other errors are not
+        if isinstance(response, BaseException):
+            return True
+        return response.status_code >= 500 or response.status_code == 429
+
+    async def run(self) -> None:
+        while self._task is not None:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            # run() also checks _task, in case wait_for swallows the cancellation
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self.spool is not None:
+            self.spool.close()
+
+    def stats(self) -> dict:
+        latencies = list(self.flush_latencies)
+        return {
+            "queueDepth": self.depth,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "lastFlushLatency": latencies[-1] if latencies else None,
+            "avgFlushLatency": sum(latencies) / len(latencies) if latencies else None,
+            "maxFlushLatency": max(latencies) if latencies else None,
+        }
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import time
+
+import httpx
+
+from scrapers.utils import fastjson
+from sensor.metrics import GATEWAY_RESPONSES, GATEWAY_SECONDS
+
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 20
+
+
+def detection_url(gateway_url: str) -> str:
+    # Plain hosts are reached over https, a url with a scheme (e.g. a local gateway) is used as is
+    base = gateway_url if "://" in gateway_url else f"https://{gateway_url}"
+    return f"{base}/v0/api/detection"
+
+
+class GatewayClient:
+    # A single pooled, keep-alive client shared by scraping, alerts, detections and
+    # registry calls, with a timeout on every request so a slow peer cannot stall a tick.
+    def __init__(
+        self,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ):
+        self.timeout = timeout
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def post(self, url: str, json: dict | list, headers: dict | None = None) -> httpx.Response:
+        # Bodies are encoded straight to bytes (orjson when available) instead of httpx's json=
+        headers = {"Content-Type": fastjson.CONTENT_TYPE, **(headers or {})}
+        return await self._observe("POST", self.client.post(url, content=fastjson.dumps(json), headers=headers))
+
+    async def delete(self, url: str, params: dict, headers: dict | None = None) -> httpx.Response:
+        return await self._observe("DELETE", self.client.delete(url, params=params, headers=headers))
+
+    @staticmethod
+    async def _observe(method: str, request) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            GATEWAY_RESPONSES.inc(method=method, status="error")
+            raise
+        finally:
+            GATEWAY_SECONDS.observe(time.perf_counter() - start, method=method)
+        GATEWAY_RESPONSES.inc(method=method, status=response.status_code)
+        return response
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+# First, so that the startup timer also covers the imports below
+from sensor.startup import StartupTimer
+
+import argparse
+import asyncio
+import logging
+import socket
+from collections import Counter
+from contextlib import asynccontextmanager
+
+import uvicorn
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from fastapi import FastAPI, Response
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.MultiScraper import MultiScraper
+from sensor.config import SensorConfig, load_configs
+from sensor.delivery import DeliveryQueue
+from sensor.gateway import GatewayClient
+from sensor.logs import configure_logging
+from sensor.metrics import instrument_scheduler, metrics_response
+from sensor.registry import CACHED, REGISTERED, RegistryClient
+from sensor.runtime import SensorRuntime
+from sensor.spool import Spool
+
+logger = logging.getLogger("sensor.host")
+
+
+class PortDispatcher:
+    # Serves every sensor on its own configured port from a single ASGI app: the
+    # request path is rewritten with the prefix of the sensor owning the local port.
+    # Paths of the host itself (e.g. /metrics, /delivery) are answered on every port.
+    def __init__(self, app: FastAPI, prefixes: dict[int, str]):
+        self.app = app
+        self.prefixes = prefixes
+        sensor_prefixes = tuple(prefix + "/" for prefix in prefixes.values())
+        paths = (getattr(route, "path", "") for route in app.routes)
+        self.host_paths = {path for path in paths if path and not path.startswith(sensor_prefixes)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and scope.get("server") and scope["path"] not in self.host_paths:
+            prefix = self.prefixes.get(scope["server"][1])
+            if prefix is not None:
+                scope = dict(scope)
+                scope["path"] = prefix + scope["path"]
+                scope["raw_path"] = prefix.encode() + scope.get("raw_path", b"")
+        await self.app(scope, receive, send)
+
+
+class SensorHost:
+    def __init__(self, configs: list[SensorConfig], spool_dir: str | None = None, timer: StartupTimer | None = None):
+        self.timer = timer if timer is not None else StartupTimer()
+        self.scheduler = AsyncIOScheduler()
+        instrument_scheduler(self.scheduler)
+        self.client = GatewayClient()
+        # Detections and alerts of every hosted sensor are coalesced in one queue
+        spool_dir = spool_dir or (configs[0].spool_dir if configs else None)
+        self.delivery = DeliveryQueue(
+            self.client,
+            spool=Spool(spool_dir) if spool_dir else None,
+            name="host",
+            **(configs[0].delivery if configs else {}),
+        )
+        # One scraper per variable: memory scales with the sensor types, not the sensors.
+        # All the variables are fetched together, in one concurrent round per slot.
+        self.multi = MultiScraper([config.type for config in configs])
+        self.sensors: list[SensorRuntime] = []
+        self.registration: asyncio.Task | None = None
+        # One registry client per registry: its sensors are registered in bulk
+        self.registries: dict[tuple, RegistryClient] = {}
+        for config in configs:
+            sensor = SensorRuntime(
+                config, self.scraper_for(config.type), self.client, self.delivery, self.registry_for(config)
+            )
+            sensor.on_shutdown = self.remove_sensor
+            sensor.fetch_round = self.multi.scrape_indexes_async
+            self.sensors.append(sensor)
+        self.app = self.build_app()
+
+    def scraper_for(self, sensor_type: str) -> GenericScraper:
+        return self.multi.scraper(sensor_type)
+
+    def registry_for(self, config: SensorConfig) -> RegistryClient:
+        key = RegistryClient.key(config)
+        if key not in self.registries:
+            self.registries[key] = RegistryClient.from_config(config, self.client)
+        return self.registries[key]
+
+    def by_registry(self) -> list[tuple[RegistryClient, dict[str, dict]]]:
+        groups: dict[int, tuple[RegistryClient, dict[str, dict]]] = {}
+        for sensor in self.sensors:
+            registry, sensors = groups.setdefault(id(sensor.registry), (sensor.registry, {}))
+            sensors[sensor.job_id] = sensor.registration()
+        return list(groups.values())
+
+    async def remove_sensor(self, sensor: SensorRuntime) -> None:
+        await sensor.deregister()
+        if sensor in self.sensors:
+            self.sensors.remove(sensor)
+
+    async def register(self) -> None:
+        with self.timer.phase("register"):
+            results = await asyncio.gather(*(r.register_many(sensors) for r, sensors in self.by_registry()))
+        outcomes = {sensor_id: result for group in results for sensor_id, result in group.items()}
+        failed = [sensor_id for sensor_id, result in outcomes.items() if result not in (REGISTERED, CACHED)]
+        if failed:
+            logger.warning("Sensors not registered: %s", ", ".join(failed), extra={"failed": failed})
+        counts = Counter(outcomes.values())
+        logger.info(
+            "Registration outcomes: %s",
+            ", ".join(f"{count} {result}" for result, count in counts.items()),
+            extra={"outcomes": dict(counts)},
+        )
+        logger.info("Startup timing: %s", self.timer.summary(), extra={"startup": self.timer.report()})
+
+    async def startup(self) -> None:
+        logger.info("Starting %d sensors using %d scrapers", len(self.sensors), len(self.multi.scrapers))
+        with self.timer.phase("scheduler"):
+            for sensor in self.sensors:
+                sensor.schedule(self.scheduler)
+            self.scheduler.start()
+        self.delivery.start()
+        # The sensors are served while they register in the background
+        self.registration = asyncio.create_task(self.register())
+        self.timer.since_start("serve")
+
+    async def shutdown(self) -> None:
+        logger.info("Graceful shutdown triggered...")
+        if self.registration is not None:
+            self.registration.cancel()
+        self.scheduler.shutdown(wait=False)
+        await self.delivery.stop()
+        await asyncio.gather(*(r.deregister_many(sensors) for r, sensors in self.by_registry()))
+        await self.client.aclose()
+
+    def build_app(self) -> FastAPI:
+        @asynccontextmanager
+        async def lifespan(app: FastAPI):
+            await self.startup()
+            yield
+            await self.shutdown()
+
+        app = FastAPI(lifespan=lifespan)
+        for sensor in self.sensors:
+            app.include_router(sensor.router, prefix=sensor.prefix)
+
+        @app.get("/sensors")
+        def sensors() -> list[dict]:
+            return [
+                {
+                    "sensorName": s.name,
+                    "sensorType": s.type,
+                    "sensorPort": s.config.port,
+                    "prefix": s.prefix,
+                }
+                for s in self.sensors
+            ]
+
+        @app.get("/delivery")
+        def delivery() -> dict:
+            return self.delivery.stats()
+
+        @app.get("/registry")
+        def registry() -> dict:
+            return {sensor_id: result for r in self.registries.values() for sensor_id, result in r.stats().items()}
+
+        @app.get("/startup")
+        def startup() -> dict:
+            return self.timer.report()
+
+        @app.get("/metrics")
+        def metrics() -> Response:
+            return metrics_response()
+
+        return app
+
+    def run(self, ip: str | None = None, port: int | None = None) -> None:
+        if port is not None:
+            # Single port mode: every sensor lives under its /<type>/<name> prefix.
+            uvicorn.run(self.app, host=ip or "0.0.0.0", port=port)
+            return
+
+        sockets = []
+        for sensor in self.sensors:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((ip or sensor.config.ip, sensor.config.port))
+            sockets.append(sock)
+
+        dispatcher = PortDispatcher(self.app, {s.config.port: s.prefix for s in self.sensors})
+        server = uvicorn.Server(uvicorn.Config(dispatcher))
+        asyncio.run(server.serve(sockets=sockets))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run many sensors inside a single process")
+    parser.add_argument("configs", nargs="+", help="sensor yaml files or directories containing them")
+    parser.add_argument("--ip", default=None, help="override the ip every sensor binds to")
+    parser.add_argument("--port", type=int, default=None, help="serve all sensors on one port, under /<type>/<name>")
+    parser.add_argument("--spool", default=None, help="directory of the on-disk delivery spool")
+    args = parser.parse_args()
+
+    timer = StartupTimer()
+    timer.mark("import")
+    with timer.phase("config"):
+        configs = load_configs(args.configs)
+        # the first configuration decides the logging of the whole process
+        configure_logging(**(configs[0].logging if configs else {}))
+        host = SensorHost(configs, spool_dir=args.spool, timer=timer)
+    host.run(ip=args.ip, port=args.port)
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import itertools
+import json
+import logging
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_LEVEL = "INFO"
+DEFAULT_FORMAT = "json"
+# One record out of N is kept for these events, the others are dropped before being queued
+DEFAULT_SAMPLE = {"health": 100}
+
+# Attributes every LogRecord has: anything else was passed as context through `extra`
+RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+
+
+def context(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **context(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("[%(asctime)s] %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in context(record).items())
+        return f"{super().format(record)} {fields}" if fields else super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    # Records logged with extra={"event": <name>} are sampled at the configured rate
+    def __init__(self, rates: dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self.counters: dict[str, itertools.count] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = getattr(record, "event", None)
+        rate = self.rates.get(event) if event is not None else None
+        if not rate or rate <= 1:
+            return True
+        counter = self.counters.setdefault(event, itertools.count())
+        return next(counter) % rate == 0
+
+
+class DeferredQueueHandler(QueueHandler):
+    # QueueHandler.prepare formats the message in the caller's thread and drops exc_info:
+    # the record is only copied here, the listener formats it and its traceback
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+class ContextAdapter(logging.LoggerAdapter):
+    # Adds the per-sensor fields to every record, merged with the call's own `extra`
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**self.extra, **kwargs.get("extra", {})}
+        return msg, kwargs
+
+
+def sensor_logger(name: str, sensor_type: str) -> ContextAdapter:
+    return ContextAdapter(logging.getLogger("sensor"), {"sensor": name, "type": sensor_type})
+
+
+def configure_logging(
+    level: str = DEFAULT_LEVEL,
+    format: str = DEFAULT_FORMAT,
+    sample: dict[str, int] | None = None,
+    stream=None,
+) -> QueueListener:
+    # Records are put on a queue by the caller and formatted and written by a
+    # background thread, so logging never blocks the event loop on formatting or I/O.
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    output.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(SamplingFilter(DEFAULT_SAMPLE if sample is None else sample))
+
+    root = logging.getLogger()
+    for previous in root.handlers[:]:
+        root.removeHandler(previous)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+    return _listener
+
+
+@atexit.register
+def stop_logging() -> None:
+    # Flushes the queued records
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+
+from fastapi import Response
+
+from scrapers.utils.metrics import CONTENT_TYPE, registry
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.base import BaseScheduler
+
+GATEWAY_SECONDS = registry.histogram(
+    "gateway_request_seconds", "Latency of the requests to the gateway and registry", ("method",)
+)
+GATEWAY_RESPONSES = registry.counter(
+    "gateway_responses_total", "Responses of the gateway and registry by status code", ("method", "status")
+)
+CYCLE_SECONDS = registry.histogram("sensor_cycle_seconds", "Duration of a scrape and send cycle", ("sensor",))
+CYCLES = registry.counter("sensor_cycles_total", "Scrape and send cycles by outcome", ("sensor", "result"))
+ALERT_EVALUATIONS = registry.counter(
+    "sensor_alert_evaluations_total",
+    "Alert checks by source (scraper or query) and outcome",
+    ("sensor", "source", "result"),
+)
+REGISTRATIONS = registry.counter(
+    "sensor_registration_attempts_total", "Registration attempts by outcome", ("sensor", "result")
+)
+DEREGISTRATIONS = registry.counter(
+    "sensor_deregistrations_total", "Deregistrations by outcome", ("sensor", "result")
+)
+DELIVERY_QUEUE_DEPTH = registry.gauge(
+    "delivery_queue_depth", "Detections and alerts waiting to be sent to the gateway", ("queue",)
+)
+DELIVERY_ITEMS = registry.counter(
+    "delivery_items_total", "Detections and alerts delivered or refused by the gateway", ("queue", "result")
+)
+DELIVERY_DROPPED = registry.counter(
+    "delivery_dropped_total", "Detections and alerts dropped because the queue was full", ("queue",)
+)
+DELIVERY_FLUSH_SECONDS = registry.histogram(
+    "delivery_flush_seconds", "Time spent sending one batch to the gateway", ("queue",)
+)
+CRON_LAG = registry.histogram(
+    "sensor_cron_lag_seconds", "Delay between the scheduled and the actual start of a job", ("job",)
+)
+CRON_MISSED = registry.counter("sensor_cron_missed_total", "Runs skipped because they started too late", ("job",))
+CRON_OVERLAPPING = registry.counter(
+    "sensor_cron_overlapping_total", "Runs skipped because the previous one was still running", ("job",)
+)
+
+
+def instrument_scheduler(scheduler: BaseScheduler) -> None:
+    from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED
+
+    def on_job_event(event) -> None:
+        if event.code == EVENT_JOB_SUBMITTED:
+            # coroutine jobs start running as soon as they are submitted
+            now = datetime.now(timezone.utc)
+            for scheduled in event.scheduled_run_times:
+                CRON_LAG.observe(max(0.0, (now - scheduled).total_seconds()), job=event.job_id)
+        elif event.code == EVENT_JOB_MISSED:
+            CRON_MISSED.inc(job=event.job_id)
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            CRON_OVERLAPPING.inc(job=event.job_id)
+
+    scheduler.add_listener(on_job_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
+
+
+def metrics_response() -> Response:
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+
+class Operator:
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+
+    def test(self, a: int | float, b: int | float) -> bool:
+        if self.symbol == '>':
+            return a > b
+        elif self.symbol == '<':
+            return a < b
+        else:
+            raise RuntimeError("operator symbol not recognized: " + self.symbol)
+
+class Query:
+    def __init__(self, operator_symbol: str, name: str, threshold: int | float, metric: str | None = None):
+        self.operator: Operator = Operator(operator_symbol)
+        self.name = name
+        self.threshold = threshold
+        # Checked against a derived metric (e.g. sum_3h, see sensor/aggregates.py) instead of the value
+        self.metric = metric
+
+    def check(self, value: int | float) -> bool:
+        return self.operator.test(value, self.threshold)
+
+
+    @staticmethod
+    def checkQueries(value: int | float, queries: list[Query])-> Query | None:
+        queries = sorted(queries, key=lambda q: q.threshold, reverse=True)
+        for q in queries:
+            if q.check(value):
+                return q
+        return None
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+import httpx
+
+from sensor.config import DEFAULT_STATE_TTL, SensorConfig
+from sensor.gateway import GatewayClient
+from sensor.metrics import DEREGISTRATIONS, REGISTRATIONS
+from sensor.startup import DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY, backoff_delays
+
+DEFAULT_ATTEMPTS = 10
+DEFAULT_CONCURRENCY = 10
+
+# Final outcome of a registration: "registered", "cached" (skipped, see RegistrationState),
+# "rejected" (the registry refused it, not retried) or "error" (attempts exhausted)
+REGISTERED, CACHED, REJECTED, ERROR = "registered", "cached", "rejected", "error"
+DEREGISTERED = "deregistered"
+
+logger = logging.getLogger("sensor.registry")
+
+
+def outcome(response: httpx.Response | BaseException) -> str:
+    if isinstance(response, BaseException):
+        return ERROR
+    if response.status_code in (200, 201):
+        return REGISTERED
+    # Timeouts, throttling and server errors are retried, other client errors are final
+    if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+        return REJECTED
+    return ERROR
+
+
+class RegistrationState:
+    # Sensors registered by a previous run, one file per sensor so that standalone sensors
+    # can share the directory. A sensor deregisters (and forgets its entry) when it shuts
+    # down cleanly: an entry left behind means the process died and the registry still
+    # knows the sensor, so a restart within `ttl` seconds does not register it again.
+    def __init__(self, directory: str | os.PathLike, ttl: float = DEFAULT_STATE_TTL):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+
+    def _path(self, sensor_id: str) -> Path:
+        return self.directory / f"{sensor_id}.json"
+
+    @staticmethod
+    def digest(url: str, body: dict) -> str:
+        return hashlib.sha256((url + json.dumps(body, sort_keys=True)).encode()).hexdigest()
+
+    def fresh(self, sensor_id: str, url: str, body: dict) -> bool:
+        try:
+            with open(self._path(sensor_id)) as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return False
+        return entry.get("digest") == self.digest(url, body) and time.time() - entry.get("registeredAt", 0) < self.ttl
+
+    def put(self, sensor_id: str, url: str, body: dict) -> None:
+        path = self._path(sensor_id)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w") as file:
+            json.dump({"digest": self.digest(url, body), "registeredAt": time.time()}, file)
+        os.replace(tmp, path)
+
+    def discard(self, sensor_id: str) -> None:
+        try:
+            self._path(sensor_id).unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RegistryClient:
+    # Registers and deregisters many sensors of the same registry at once. With a bulk
+    # suffix the bodies are posted as one JSON array to <path><bulk_suffix> (falling back
+    # to single requests if the registry does not know the endpoint); otherwise the
+    # requests are pipelined, `concurrency` at a time, over the pooled gateway client.
+    def __init__(
+        self,
+        client: GatewayClient,
+        url: str,
+        apikey: str,
+        register_path: str,
+        shutdown_path: str,
+        bulk_suffix: str | None = None,
+        state: RegistrationState | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ):
+        self.client = client
+        self.url = url
+        self.apikey = apikey
+        self.register_path = register_path
+        self.shutdown_path = shutdown_path
+        self.bulk_suffix = bulk_suffix
+        self.state = state
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.outcomes: dict[str, str] = {}
+
+    @property
+    def headers(self) -> dict:
+        return {"x-api-key": self.apikey}
+
+    async def _bulk(self, path: str, bodies: list[dict]) -> httpx.Response | BaseException | None:
+        # None when the registry has no bulk endpoint: the caller sends single requests
+        if not self.bulk_suffix:
+            return None
+        try:
+            response = await self.client.post(self.url + path + self.bulk_suffix, json=bodies, headers=self.headers)
+        except httpx.HTTPError as error:
+            return error
+        if response.status_code in (404, 405):
+            logger.warning("No bulk endpoint at %s%s, sending single requests", path, self.bulk_suffix)
+            self.bulk_suffix = None
+            return None
+        return response
+
+    async def _post(self, body: dict) -> httpx.Response | BaseException:
+        async with self.semaphore:
+            try:
+                return await self.client.post(self.url + self.register_path, json=body, headers=self.headers)
+            except httpx.HTTPError as error:
+                return error
+
+    async def _delete(self, body: dict) -> httpx.Response | BaseException:
+        async with self.semaphore:
+            try:
+                return await self.client.delete(
+                    self.url + self.shutdown_path,
+                    params={"sensorIp": body["sensorIp"], "sensorPort": body["sensorPort"]},
+                    headers=self.headers,
+                )
+            except httpx.HTTPError as error:
+                return error
+
+    async def _register_round(self, pending: dict[str, dict]) -> dict[str, str]:
+        response = await self._bulk(self.register_path, list(pending.values()))
+        if response is not None:
+            return dict.fromkeys(pending, outcome(response))
+        responses = await asyncio.gather(*(self._post(body) for body in pending.values()))
+        return {sensor_id: outcome(r) for sensor_id, r in zip(pending, responses)}
+
+    async def register_many(
+        self,
+        sensors: dict[str, dict],
+        attempts: int = DEFAULT_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ) -> dict[str, str]:
+        # sensor id -> registration body; returns sensor id -> outcome
+        outcomes: dict[str, str] = {}
+        pending: dict[str, dict] = {}
+        for sensor_id, body in sensors.items():
+            if self.state is not None and self.state.fresh(sensor_id, self.url, body):
+                outcomes[sensor_id] = CACHED
+                REGISTRATIONS.inc(sensor=sensor_id, result=CACHED)
+            else:
+                pending[sensor_id] = body
+
+        # Only the sensors that failed are retried, all together after one jittered delay
+        delays = list(backoff_delays(attempts, base_delay, max_delay))
+        for attempt, delay in enumerate(delays, 1):
+            if not pending:
+                break
+            for sensor_id, result in (await self._register_round(pending)).items():
+                REGISTRATIONS.inc(sensor=sensor_id, result=result)
+                if result == ERROR:
+                    continue
+                outcomes[sensor_id] = result
+                body = pending.pop(sensor_id)
+                if result == REGISTERED and self.state is not None:
+                    self.state.put(sensor_id, self.url, body)
+            if pending and attempt < len(delays):
+                logger.warning(
+                    "%d sensors not registered, retrying in %.1f seconds",
+                    len(pending),
+                    delay,
+                    extra={"pending": list(pending)},
+                )
+                await asyncio.sleep(delay)
+
+        outcomes.update(dict.fromkeys(pending, ERROR))
+        self.outcomes.update(outcomes)
+        return outcomes
+
+    async def deregister_many(self, sensors: dict[str, dict]) -> dict[str, str]:
+        # A single attempt per sensor: this runs while shutting down
+        response = await self._bulk(
+            self.shutdown_path, [{"sensorIp": b["sensorIp"], "sensorPort": b["sensorPort"]} for b in sensors.values()]
+        )
+        if response is not None:
+            responses = [response] * len(sensors)
+        else:
+            responses = await asyncio.gather(*(self._delete(body) for body in sensors.values()))
+
+        outcomes = {}
+        for sensor_id, r in zip(sensors, responses):
+            result = DEREGISTERED if isinstance(r, httpx.Response) and r.is_success else ERROR
+            if result == ERROR:
+                logger.warning("Error while deregistering %s -> %r", sensor_id, r, extra={"sensor": sensor_id})
+            DEREGISTRATIONS.inc(sensor=sensor_id, result=result)
+            if self.state is not None:
+                self.state.discard(sensor_id)
+            outcomes[sensor_id] = result
+            self.outcomes.pop(sensor_id, None)
+        return outcomes
+
+    def stats(self) -> dict:
+        return dict(self.outcomes)
+
+    @staticmethod
+    def key(config: SensorConfig) -> tuple:
+        # Sensors with the same key can share one client (and its bulk requests)
+        return (
+            config.registry,
+            config.apikey,
+            config.registerPath,
+            config.shutdownPath,
+            config.registry_bulk_suffix,
+            config.registry_state_dir,
+        )
+
+    @staticmethod
+    def from_config(config: SensorConfig, client: GatewayClient) -> RegistryClient:
+        state = (
+            RegistrationState(config.registry_state_dir, config.registry_state_ttl)
+            if config.registry_state_dir
+            else None
+        )
+        return RegistryClient(
+            client,
+            config.registry,
+            config.apikey,
+            config.registerPath,
+            config.shutdownPath,
+            bulk_suffix=config.registry_bulk_suffix,
+            state=state,
+        )
@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+# First, so that the startup timer also covers the imports below
+from sensor.startup import DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY, StartupTimer
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import signal
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+import httpx
+from fastapi import APIRouter, FastAPI, Request, Response, status
+
+from sensor.aggregates import Aggregator
+from sensor.alerts import AlertEngine
+from sensor.config import SensorConfig
+from sensor.delivery import DeliveryQueue
+from sensor.gateway import GatewayClient, detection_url
+from sensor.logs import configure_logging, sensor_logger
+from sensor.metrics import (
+    ALERT_EVALUATIONS,
+    CYCLE_SECONDS,
+    CYCLES,
+    instrument_scheduler,
+    metrics_response,
+)
+from sensor.queries import Query
+from sensor.registry import CACHED, DEFAULT_ATTEMPTS, REGISTERED, RegistryClient
+from sensor.schedule import cron_job_options
+from sensor.spool import Spool
+
+# The scheduler, the server and the scrapers are imported once the configuration has been
+# read, when they are first needed
+if TYPE_CHECKING:
+    from apscheduler.schedulers.base import BaseScheduler
+
+    from scrapers.GenericScraper import GenericDetection, GenericScraper
+
+cronjob_days_pattern = r"^([0-6])-([0-6])$"
+
+MONDAY, SUNDAY = 0, 6
+MIN_HOUR, MAX_HOUR, MIN_MINUTE, MAX_MINUTE = 0, 23, 0, 59
+MAX_PORT = 65_535
+
+
+class SensorRuntime:
+    def __init__(
+        self,
+        config: SensorConfig,
+        scraper: GenericScraper | None = None,
+        client: GatewayClient | None = None,
+        delivery: DeliveryQueue | None = None,
+        registry: RegistryClient | None = None,
+    ):
+        self.config = config
+        self.client = client if client is not None else GatewayClient()
+        self.registry = registry if registry is not None else RegistryClient.from_config(config, self.client)
+        self.delivery = delivery
+        self.name = config.formatted_name
+        self.type = config.type
+        self.logger = sensor_logger(self.job_id, self.type)
+        self.queries: list[Query] = config.custom_queries
+        # Compiled once, evaluated on every tick
+        self.engine = AlertEngine(self.queries)
+        # Rolling windows of the observed values, and the queries on them grouped by metric
+        self.aggregator = Aggregator(**config.aggregation)
+        derived_queries: dict[str, list[Query]] = defaultdict(list)
+        for query in config.derived_queries:
+            self.aggregator.parse(query.metric)
+            derived_queries[query.metric].append(query)
+        self.derived_engines = {metric: AlertEngine(queries) for metric, queries in derived_queries.items()}
+        self.api_gateway_info = dict(config.api_gateway_info)
+        self.cron_info = dict(config.cron_info)
+        if scraper is None:
+            from scrapers.GenericScraper import GenericScraper
+
+            scraper = GenericScraper(config.type)
+        self.scraper = scraper
+        self.scheduler: BaseScheduler | None = None
+        # Set by a host: fetches the payloads of all its variables for the given hourly slot
+        # before this sensor reads its own
+        self.fetch_round: Callable[[httpx.AsyncClient, int], Awaitable[object]] | None = None
+        self.on_shutdown: Callable[[SensorRuntime], Awaitable[None]] | None = None
+        self.router = self.build_router()
+
+    @property
+    def job_id(self) -> str:
+        return f"{self.type}_{self.config.formatted_name}"
+
+    @property
+    def prefix(self) -> str:
+        return f"/{self.type}/{self.config.formatted_name}"
+
+    def log(self, message, *args, level: int = logging.INFO, **fields):
+        # Formatting is deferred to the logging thread: pass values as args, not f-strings
+        self.logger.log(level, message, *args, extra=fields)
+
+    def registration(self) -> dict:
+        return {
+            "sensorIp": self.config.ip,
+            "sensorName": self.name,
+            "sensorPort": self.config.port,
+            "sensorType": self.type,
+            "sensorQueries": self.config.query_names,
+        }
+
+    async def register(
+        self, attempts: int = DEFAULT_ATTEMPTS, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY
+    ) -> bool:
+        self.log("Register the Sensor")
+        outcomes = await self.registry.register_many({self.job_id: self.registration()}, attempts, base_delay, max_delay)
+        result = outcomes[self.job_id]
+        if result in (REGISTERED, CACHED):
+            self.log("Registered (%s).", result, registration=result)
+            return True
+        self.log("Failed to connect (%s)", result, level=logging.ERROR, registration=result)
+        return False
+
+    async def deregister(self) -> None:
+        await self.registry.deregister_many({self.job_id: self.registration()})
+
+    async def sense_data(self) -> GenericDetection | None:
+        self.log("Sensing the data")
+        if self.fetch_round is None:
+            return await self.scraper.get_detection_for_sensor_async(self.client.client, self.config.name)
+        # The sensor reads the slot of the round, also when the hour changes in between
+        now = self.scraper.source.now()
+        await self.fetch_round(self.client.client, now)
+        return await self.scraper.get_detection_for_sensor_async(self.client.client, self.config.name, now)
+
+    async def send_data_to_endpoint(self):
+        with CYCLE_SECONDS.time(sensor=self.job_id):
+            result = await self.send_detection()
+        CYCLES.inc(sensor=self.job_id, result=result)
+
+    async def send_detection(self) -> str:
+        try:
+            self.log("Prepare to send the send the data to the API gateway")
+            raw_data = await self.sense_data()
+            if raw_data is None:
+                self.log("Cannot retrieve data, scraper scraped nothing!")
+                return "empty"
+
+            if raw_data.value is None:
+                self.log("The station reported no value")
+                return "empty"
+
+            data = raw_data.to_json()
+            url = detection_url(self.api_gateway_info["url"])
+            posts = []
+
+            # Scraper alert check
+            scraper_alert = bool(data["isAlert"])
+            ALERT_EVALUATIONS.inc(sensor=self.job_id, source="scraper", result="alert" if scraper_alert else "none")
+            if scraper_alert:
+                posts.append((url + "/alerts", data["detection"]))
+
+            # Custom alert check
+            value = float(data["detection"]["value"])
+            res = self.engine.check(value)
+            ALERT_EVALUATIONS.inc(sensor=self.job_id, source="query", result="none" if res is None else "alert")
+            if res is not None:
+                posts.append((url + "/alerts", self.query_alert(data["detection"], value, res)))
+
+            # Derived metric alert check, one per metric
+            self.aggregator.update(raw_data.sensorName, raw_data.timestamp, value)
+            for metric, engine in self.derived_engines.items():
+                derived = self.aggregator.metric(raw_data.sensorName, metric)
+                res = None if derived is None else engine.check(derived)
+                ALERT_EVALUATIONS.inc(sensor=self.job_id, source="derived", result="none" if res is None else "alert")
+                if res is not None:
+                    posts.append((url + "/alerts", self.query_alert(data["detection"], derived, res)))
+
+            data = raw_data.to_json_detection()
+            posts.append((f"{url}/{self.type}/{data['sensorName']}/detections", data))
+
+            await self.deliver(posts)
+            return "sent"
+        except (ValueError, httpx.HTTPError) as error:
+            self.log("An error occurred -> %r", error, level=logging.ERROR)
+            return "error"
+
+    def query_alert(self, detection: dict, value: float, query: Query) -> dict:
+        alert = {
+            "sensorName": detection["sensorName"],
+            "type": self.type,
+            "value": value,
+            "unit": detection["unit"],
+            "timestamp": detection["timestamp"],
+            "query": {
+                "name": query.name,
+                "value": query.threshold,
+            },
+        }
+        if query.metric is not None:
+            alert["query"]["metric"] = query.metric
+        return alert
+
+    async def deliver(self, posts: list[tuple[str, dict]]) -> None:
+        if self.delivery is not None:
+            for url, body in posts:
+                self.delivery.put(url, body)
+            self.log("Data queued for the API gateway (%d alerts)", len(posts) - 1, alerts=len(posts) - 1)
+            return
+        await asyncio.gather(*(self.client.post(url, json=body) for url, body in posts))
+        self.log("Data sent to the API gateway (%d alerts)", len(posts) - 1, alerts=len(posts) - 1)
+
+    def schedule(self, scheduler: BaseScheduler) -> None:
+        self.scheduler = scheduler
+        options = cron_job_options(self.cron_info, self.job_id)
+        self.log(
+            "Configuring the scheduler with the following infomrations: Day: %s, Hour: %s, Minute: %s, Second: %s",
+            options["day_of_week"],
+            options["hour"],
+            options["minute"],
+            options["second"],
+        )
+        scheduler.add_job(
+            self.send_data_to_endpoint,
+            "cron",
+            id=self.job_id,
+            replace_existing=True,
+            **options,
+        )
+        self.log("New Cron task configured")
+
+    def unschedule(self) -> None:
+        if self.scheduler is not None and self.scheduler.get_job(self.job_id) is not None:
+            self.scheduler.remove_job(self.job_id)
+
+    def build_router(self) -> APIRouter:
+        router = APIRouter()
+
+        @router.put("/sensor/update/name")
+        async def update_sensor_name(request: Request) -> Response:
+            self.log("Received a request to update the Sensor's name")
+            new_name: str = (await request.json())["sensorName"]
+            if new_name and len(new_name.replace(" ", "")) > 0:
+                self.name = new_name.replace(" ", "")
+                return Response()
+            return Response(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                content="Error: The input name can not be None",
+            )
+
+        @router.put("/sensor/configuration/cron/days")
+        async def update_sensor_date(request: Request) -> Response:
+            days: str = (await request.json())["sensorCronJobDays"]
+            match = re.match(cronjob_days_pattern, days)
+            if match and int(match.group(1)) <= int(match.group(2)):
+                self.log("Received a request to update the Sensor's days of work with: %s", days)
+                self.cron_info["day_of_the_week"] = f"{days}"
+                if self.scheduler is not None:
+                    self.schedule(self.scheduler)
+                return Response()
+            return Response(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                content="Error: The input days must be in [0, 6]",
+            )
+
+        @router.put("/sensor/configuration/cron/time")
+        async def update_sensor_time(request: Request) -> Response:
+            data = await request.json()
+            hour: int = int(data["sensorCronJobTimeHour"])
+            minute: int = int(data["sensorCronJobTimeMinute"])
+            if MIN_HOUR <= hour <= MAX_HOUR and MIN_MINUTE <= minute <= MAX_MINUTE:
+                self.log("Received a new request to update the Sensor's time of work")
+                self.cron_info["hour"] = f"{hour}"
+                self.cron_info["minute"] = f"{minute}"
+                if self.scheduler is not None:
+                    self.schedule(self.scheduler)
+                return Response()
+            return Response(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                content="Error: The input hours must be in [0, 23] and minutes in [0, 59]",
+            )
+
+        @router.put("/sensor/configuration/gateway/url")
+        def update_sensor_gateway_url(new_url: str = self.api_gateway_info["url"]) -> Response:
+            if len(new_url) > 0 and len(new_url.replace(" ", "")) > 0:
+                self.log("Received a new request to update the Sensor's gateway url")
+                self.api_gateway_info["url"] = new_url
+                return Response()
+            return Response(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                content="Error: the gateway url should be non empty and should not contains only withe spaces",
+            )
+
+        @router.put("/sensor/configuration/gateway/port")
+        def update_sensor_gateway_port(port: int = self.api_gateway_info["port"]) -> Response:
+            if 0 <= port <= MAX_PORT:
+                self.log("Received a new request to update the Sensor's gateway port")
+                self.api_gateway_info["port"] = port
+                return Response()
+            return Response(
+                status_code=status.HTTP_406_NOT_ACCEPTABLE,
+                content="Error: the gateway port should be in [0, 65535]",
+            )
+
+        @router.get("/health")
+        def health() -> Response:
+            # Sampled: fleets are pinged far more often than anything else happens
+            self.log("Server pinged", event="health")
+            return Response(content="Everything is OK.")
+
+        @router.get("/aggregates")
+        def aggregates() -> dict:
+            # Rolling statistics of the sensor's station, per window
+            return self.aggregator.summary(self.config.name)
+
+        @router.get("/info")
+        def info() -> Response:
+            key = "General Sensor Information"
+            message: dict[str, list] = defaultdict(list)
+            message[key].append({"Sensor Name": self.name})
+            message[key].append({"Description": self.config.description})
+            message[key].append({"Endpoint Information": self.api_gateway_info})
+            message[key].append({"Cronjob Information": self.cron_info})
+
+            response = Response(content=json.dumps(message))
+            response.headers["Content-Type"] = "application/json"
+            return response
+
+        @router.delete("/shutdown")
+        async def shutoff() -> Response:
+            self.log("Shutting down the sensor")
+            self.unschedule()
+            if self.on_shutdown is not None:
+                await self.on_shutdown(self)
+            return Response(status_code=200, content="Server shutting down...")
+
+        return router
+
+
+def build_app(sensor: SensorRuntime, timer: StartupTimer | None = None) -> FastAPI:
+    # Standalone app for a single sensor, as run by the scripts generated from the templates
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    timer = timer if timer is not None else StartupTimer()
+    scheduler = AsyncIOScheduler()
+    instrument_scheduler(scheduler)
+
+    async def register() -> None:
+        with timer.phase("register"):
+            registered = await sensor.register()
+        sensor.log("Startup timing: %s", timer.summary(), startup=timer.report())
+        if not registered:
+            sensor.log("Failed to register, exiting...", level=logging.ERROR)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        with timer.phase("scheduler"):
+            sensor.schedule(scheduler)
+            scheduler.start()
+        if sensor.delivery is not None:
+            sensor.delivery.start()
+        # /health is served right away, the registry is contacted in the background
+        registration = asyncio.create_task(register())
+        timer.since_start("serve")
+        yield
+        sensor.log("Graceful shutdown triggered...")
+        registration.cancel()
+        scheduler.shutdown(wait=False)
+        if sensor.delivery is not None:
+            await sensor.delivery.stop()
+        await sensor.deregister()
+        await sensor.client.aclose()
+
+    async def stop_process(_: SensorRuntime) -> None:
+        # uvicorn handles SIGTERM gracefully: the response is sent before the lifespan ends
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    sensor.on_shutdown = stop_process
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(sensor.router)
+
+    @app.get("/delivery")
+    def delivery() -> dict:
+        return sensor.delivery.stats() if sensor.delivery is not None else {}
+
+    @app.get("/registry")
+    def registry() -> dict:
+        return sensor.registry.stats()
+
+    @app.get("/startup")
+    def startup() -> dict:
+        return timer.report()
+
+    @app.get("/metrics")
+    def metrics() -> Response:
+        return metrics_response()
+
+    return app
+
+
+def from_config(config: SensorConfig) -> SensorRuntime:
+    client = GatewayClient()
+    spool = Spool(config.spool_dir) if config.spool_dir else None
+    delivery = DeliveryQueue(client, spool=spool, name=f"{config.type}_{config.formatted_name}", **config.delivery)
+    return SensorRuntime(config, client=client, delivery=delivery)
+
+
+def setup(config: SensorConfig) -> SensorRuntime:
+    configure_logging(**config.logging)
+    return from_config(config)
+
+
+def serve(sensor: SensorRuntime, timer: StartupTimer, ip: str | None = None, port: int | None = None) -> None:
+    import uvicorn
+
+    uvicorn.run(build_app(sensor, timer), host=ip or sensor.config.ip, port=port or sensor.config.port)
+
+
+def main(config_file: str, ip: str | None = None, port: int | None = None) -> None:
+    # "import" covers the modules above (fastapi, httpx), a broken configuration fails
+    # before the scrapers and the server are imported
+    timer = StartupTimer()
+    timer.mark("import")
+    with timer.phase("config"):
+        config = SensorConfig.from_yaml(config_file)
+        sensor = setup(config)
+    serve(sensor, timer, ip, port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one sensor from its yaml configuration")
+    parser.add_argument("config", help="sensor yaml file")
+    parser.add_argument("--ip", default=None, help="override the ip from the configuration")
+    parser.add_argument("--port", type=int, default=None, help="override the port from the configuration")
+    args = parser.parse_args()
+
+    main(args.config, ip=args.ip, port=args.port)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import hashlib
+
+# Second of the minute derived from the sensor name, so that sensors sharing a cron
+# expression do not all fire at second 0
+AUTO = "auto"
+WINDOW = 60
+
+DEFAULT_JITTER = 0
+DEFAULT_MISFIRE_GRACE_TIME = 30
+DEFAULT_COALESCE = True
+DEFAULT_MAX_INSTANCES = 1
+
+
+def name_offset(name: str, window: int = WINDOW) -> int:
+    digest = hashlib.sha1(name.encode()).digest()
+    return int.from_bytes(digest[:4], "big") % window
+
+
+def parse_flag(value) -> bool:
+    # yaml booleans, or strings such as "false" and "0" (quoted values, environment)
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "on")
+
+
+def resolve_second(second, name: str) -> str:
+    return str(name_offset(name)) if second in (None, "", AUTO) else str(second)
+
+
+def option(cron_info: dict, key: str, default):
+    # Only a missing or empty value takes the default: an explicit 0 is kept
+    value = cron_info.get(key)
+    return default if value in (None, "") else value
+
+
+def cron_job_options(cron_info: dict, name: str) -> dict:
+    # Keyword arguments of scheduler.add_job(..., "cron", **options)
+    jitter = int(option(cron_info, "jitter", DEFAULT_JITTER))
+    return {
+        "day_of_week": cron_info["day_of_the_week"],
+        "hour": cron_info["hour"],
+        "minute": cron_info["minute"],
+        "second": resolve_second(cron_info.get("second"), name),
+        "jitter": jitter if jitter > 0 else None,
+        "misfire_grace_time": int(option(cron_info, "misfire_grace_time", DEFAULT_MISFIRE_GRACE_TIME)),
+        "coalesce": parse_flag(cron_info.get("coalesce", DEFAULT_COALESCE)),
+        "max_instances": int(option(cron_info, "max_instances", DEFAULT_MAX_INSTANCES)),
+        "timezone": "UTC",
+    }
+
+
+def plan_offsets(names: list[str], window: int = WINDOW) -> dict[str, int]:
+    # Spreads the sensors evenly over the window, in a stable order
+    ordered = sorted(names, key=lambda n: (name_offset(n, window), n))
+    return {name: i * window // max(1, len(ordered)) for i, name in enumerate(ordered)}
+
+
+def peak_load(offsets: list[int], requests_per_tick: int, jitter: int = 0) -> dict:
+    # Projected requests per second for sensors firing once a minute at the given seconds.
+    # With a jitter window the requests of each sensor are spread over jitter + 1 seconds.
+    per_second = [0.0] * WINDOW
+    spread = max(1, jitter + 1)
+    for offset in offsets:
+        for s in range(spread):
+            per_second[(offset + s) % WINDOW] += requests_per_tick / spread
+    peak = max(per_second)
+    return {
+        "sensors": len(offsets),
+        "peakRequestsPerSecond": round(peak, 2),
+        "busiestSecond": per_second.index(peak),
+        "meanRequestsPerSecond": round(sum(per_second) / WINDOW, 2),
+        "unspreadPeakRequestsPerSecond": len(offsets) * requests_per_tick,
+    }
@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sensor.runtime import main
+
+# The sensor logic lives in sensor/runtime.py and is shared by every sensor:
+# this file only points it at its configuration, relative to this file.
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "{{ CONFIG_FILE }}")
+
+if __name__ == "__main__":
+    main(CONFIG_FILE)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+from scrapers.utils import fastjson
+
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+DEFAULT_FSYNC_BATCH = 100
+DEFAULT_FSYNC_INTERVAL = 1.0
+CURSOR = "cursor.json"
+
+# (segment number, byte offset) of the next record to deliver
+Position = tuple[int, int]
+
+
+class Spool:
+    # Append-only write-ahead log of outgoing gateway requests, split into numbered
+    # segment files. Records are fsynced in batches, read back from a persisted cursor
+    # and whole segments are removed once every record in them is acknowledged.
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        fsync_batch: int = DEFAULT_FSYNC_BATCH,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        self.cursor: Position = self._load_cursor()
+        segments = self.segments()
+        self.segment = segments[-1] if segments else self.cursor[0]
+        self._repair(self._path(self.segment))
+        self._writer = open(self._path(self.segment), "ab")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.pending = self._count_pending()
+
+    def _path(self, segment: int) -> Path:
+        return self.directory / f"{segment:08d}.log"
+
+    @staticmethod
+    def _repair(path: Path, chunk: int = 4096) -> None:
+        # A crash can leave the active segment ending in a half-written record: cut it
+        # back to its last complete line so the next append starts on a line of its own
+        try:
+            file = open(path, "r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            size = end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - chunk)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b"\n")
+                if newline != -1:
+                    break
+                end = start
+            complete = start + newline + 1 if end > 0 else 0
+            if complete < size:
+                file.truncate(complete)
+
+    def segments(self) -> list[int]:
+        return sorted(int(p.stem) for p in self.directory.glob("*.log"))
+
+    def _load_cursor(self) -> Position:
+        try:
+            with open(self.directory / CURSOR) as r:
+                cursor = json.load(r)
+            return (cursor["segment"], cursor["offset"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            segments = self.segments()
+            return (segments[0] if segments else 0, 0)
+
+    def _count_pending(self) -> int:
+        count = 0
+        for segment in self.segments():
+            if segment < self.cursor[0]:
+                continue
+            with open(self._path(segment), "rb") as r:
+                if segment == self.cursor[0]:
+                    r.seek(self.cursor[1])
+                count += sum(1 for line in r if line.endswith(b"\n"))
+        return count
+
+    def append(self, url: str, body: dict) -> None:
+        line = fastjson.dumps({"url": url, "body": body}) + b"\n"
+        if self._writer.tell() + len(line) > self.segment_bytes and self._writer.tell() > 0:
+            self._rotate()
+        self._writer.write(line)
+        self.pending += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_batch or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._unsynced == 0:
+            return
+        self._writer.flush()
+        os.fsync(self._writer.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _rotate(self) -> None:
+        self.sync()
+        self._writer.close()
+        self.segment += 1
+        self._writer = open(self._path(self.segment), "ab")
+
+    def read(self, limit: int) -> tuple[list[tuple[str, dict]], Position]:
+        # Returns up to `limit` records after the cursor and the position following them
+        self._writer.flush()
+        records: list[tuple[str, dict]] = []
+        segment, offset = self.cursor
+        while len(records) < limit and segment <= self.segment:
+            path = self._path(segment)
+            if not path.exists():
+                segment, offset = segment + 1, 0
+                continue
+            with open(path, "rb") as r:
+                r.seek(offset)
+                while len(records) < limit:
+                    line = r.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = fastjson.loads(line)
+                    except ValueError:
+                        if records:
+                            # Stop in front of it: it is dropped once the records before it are acknowledged
+                            return records, (segment, offset)
+                        # An unreadable record at the head of the log would stay pending forever
+                        offset += len(line)
+                        self._commit((segment, offset))
+                        self.pending = max(0, self.pending - 1)
+                        continue
+                    offset += len(line)
+                    records.append((record["url"], record["body"]))
+            if len(records) < limit and segment < self.segment:
+                segment, offset = segment + 1, 0
+            else:
+                break
+        return records, (segment, offset)
+
+    def ack(self, position: Position, count: int) -> None:
+        self.pending = max(0, self.pending - count)
+        self._commit(position)
+
+    def _commit(self, position: Position) -> None:
+        self.cursor = position
+        tmp = self.directory / f"{CURSOR}.tmp"
+        with open(tmp, "w") as w:
+            json.dump({"segment": position[0], "offset": position[1]}, w)
+        os.replace(tmp, self.directory / CURSOR)
+        self.compact()
+
+    def compact(self) -> None:
+        for segment in self.segments():
+            if segment < self.cursor[0]:
+                self._path(segment).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        self.sync()
+        self._writer.close()
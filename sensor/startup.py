@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import random
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+# Taken when the first sensor module is imported: the "import" phase is measured from here
+STARTED_AT = time.perf_counter()
+
+PHASES = ("import", "config", "scheduler", "register", "serve")
+
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 30.0
+
+
+def backoff_delays(
+    attempts: int,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+) -> Iterator[float]:
+    # Exponential backoff with full jitter, so a fleet restarted together does not
+    # hit the registry in lockstep
+    for attempt in range(attempts):
+        yield random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+class StartupTimer:
+    # Seconds spent in each startup phase. "serve" is the time from STARTED_AT until
+    # the server accepts requests, "register" runs in the background alongside it.
+    def __init__(self, started_at: float = STARTED_AT):
+        self.started_at = started_at
+        self.last = started_at
+        self.phases: dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        # Time elapsed since the previous mark (or since STARTED_AT)
+        now = time.perf_counter()
+        self.phases[name] = now - self.last
+        self.last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def since_start(self, name: str) -> None:
+        self.phases[name] = time.perf_counter() - self.started_at
+
+    def report(self) -> dict[str, float | None]:
+        return {name: self.phases.get(name) for name in PHASES}
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}: {seconds * 1000:.1f}ms" for name, seconds in self.report().items() if seconds is not None
+        )
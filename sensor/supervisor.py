@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import signal
+import sys
+import time
+
+import httpx
+import yaml
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+STATUS_FILE = ".supervisor.json"
+
+DEFAULT_STAGGER = 0.5
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_HEALTH_TIMEOUT = 2.0
+# consecutive failed health checks before a running sensor is restarted
+DEFAULT_MAX_FAILURES = 3
+# seconds a sensor gets to start serving before failed checks count
+DEFAULT_GRACE = 30.0
+DEFAULT_BASE_DELAY = 1.0
+DEFAULT_MAX_DELAY = 60.0
+# a sensor up for this long is considered stable: its restart backoff starts over
+DEFAULT_STABLE_AFTER = 120.0
+
+logger = logging.getLogger("sensor.supervisor")
+
+
+def restart_delay(restarts: int, base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY) -> float:
+    # Exponential backoff with equal jitter: crash loops slow down, restarts of a whole
+    # fleet do not line up
+    delay = min(max_delay, base_delay * 2**restarts)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def histogram_mean(metrics: str, name: str) -> float | None:
+    # Mean of a Prometheus histogram over all its label sets
+    total = sum(float(v) for v in re.findall(rf"^{name}_sum(?:{{[^}}]*}})? (\S+)$", metrics, re.M))
+    count = sum(float(v) for v in re.findall(rf"^{name}_count(?:{{[^}}]*}})? (\S+)$", metrics, re.M))
+    return total / count if count else None
+
+
+def gauge_total(metrics: str, name: str) -> float | None:
+    # Sum of a Prometheus gauge over all its label sets
+    values = re.findall(rf"^{name}(?:{{[^}}]*}})? (\S+)$", metrics, re.M)
+    return sum(float(v) for v in values) if values else None
+
+
+class Supervised:
+    def __init__(self, config_file: str, scripts: bool = False):
+        with open(config_file) as file:
+            sensor = yaml.safe_load(file)["sensor"]
+        self.config_file = os.path.abspath(config_file)
+        self.type: str = sensor["information"]["type"]
+        self.name: str = sensor["information"]["name"].replace(" ", "")
+        self.port = int(sensor["ethernet"]["port"])
+        # generated scripts (sensor_<type>_<name>.py) or the shared runtime on the yaml
+        self.command = (
+            [sys.executable, "-m", f"sensor.sensor_{self.type}_{self.name}"]
+            if scripts
+            else [sys.executable, "-m", "sensor.runtime", self.config_file]
+        )
+        self.process: asyncio.subprocess.Process | None = None
+        self.state = "stopped"
+        self.started_at: float | None = None
+        self.restart_at: float | None = None
+        self.restarts = 0
+        # restarts since the sensor was last stable, for the backoff
+        self.attempt = 0
+        self.failures = 0
+        self.exit_code: int | None = None
+        self.cron_lag: float | None = None
+        self.cycle: float | None = None
+        self.queue_depth: float | None = None
+
+    @property
+    def job_id(self) -> str:
+        return f"{self.type}_{self.name}"
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def uptime(self, now: float) -> float:
+        return now - self.started_at if self.running and self.started_at is not None else 0.0
+
+    def status(self, now: float) -> dict:
+        return {
+            "sensor": self.job_id,
+            "port": self.port,
+            "pid": self.process.pid if self.running else None,
+            "state": self.state,
+            "uptime": round(self.uptime(now), 1),
+            "restarts": self.restarts,
+            "exitCode": self.exit_code,
+            "cronLagSeconds": self.cron_lag,
+            "cycleSeconds": self.cycle,
+            "queueDepth": self.queue_depth,
+        }
+
+
+class Supervisor:
+    def __init__(
+        self,
+        sensors: list[Supervised],
+        stagger: float = DEFAULT_STAGGER,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        health_timeout: float = DEFAULT_HEALTH_TIMEOUT,
+        max_failures: int = DEFAULT_MAX_FAILURES,
+        grace: float = DEFAULT_GRACE,
+        status_file: str | None = STATUS_FILE,
+    ):
+        self.sensors = sensors
+        self.stagger = stagger
+        self.poll_interval = poll_interval
+        self.max_failures = max_failures
+        self.grace = grace
+        self.status_file = status_file
+        self.client = httpx.AsyncClient(timeout=health_timeout)
+        self.stopping = asyncio.Event()
+
+    async def start(self, sensor: Supervised) -> None:
+        sensor.process = await asyncio.create_subprocess_exec(*sensor.command, cwd=ROOT)
+        sensor.state = "starting"
+        sensor.started_at = time.monotonic()
+        sensor.restart_at = None
+        sensor.failures = 0
+        logger.info("Started %s (pid %d)", sensor.job_id, sensor.process.pid)
+
+    async def stop(self, sensor: Supervised, timeout: float = 10.0) -> None:
+        if not sensor.running:
+            return
+        sensor.process.terminate()
+        try:
+            await asyncio.wait_for(sensor.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            sensor.process.kill()
+            await sensor.process.wait()
+
+    def schedule_restart(self, sensor: Supervised, reason: str) -> None:
+        now = time.monotonic()
+        if sensor.started_at is not None and now - sensor.started_at >= DEFAULT_STABLE_AFTER:
+            sensor.attempt = 0
+        delay = restart_delay(sensor.attempt)
+        sensor.attempt += 1
+        sensor.restarts += 1
+        sensor.state = "backoff"
+        sensor.restart_at = now + delay
+        logger.warning("%s %s, restarting in %.1fs (restart %d)", sensor.job_id, reason, delay, sensor.restarts)
+
+    async def check(self, sensor: Supervised) -> None:
+        now = time.monotonic()
+        if sensor.state == "backoff":
+            if now >= sensor.restart_at:
+                await self.start(sensor)
+            return
+        if not sensor.running:
+            sensor.exit_code = sensor.process.returncode if sensor.process is not None else None
+            self.schedule_restart(sensor, f"exited with code {sensor.exit_code}")
+            return
+
+        url = f"http://127.0.0.1:{sensor.port}"
+        try:
+            response = await self.client.get(f"{url}/health")
+            response.raise_for_status()
+        except httpx.HTTPError:
+            if sensor.state == "starting" and sensor.uptime(now) < self.grace:
+                return
+            sensor.failures += 1
+            sensor.state = "unhealthy"
+            if sensor.failures >= self.max_failures:
+                await self.stop(sensor)
+                self.schedule_restart(sensor, f"failed {sensor.failures} health checks")
+            return
+
+        sensor.state = "healthy"
+        sensor.failures = 0
+        try:
+            metrics = (await self.client.get(f"{url}/metrics")).text
+        except httpx.HTTPError:
+            return
+        sensor.cron_lag = histogram_mean(metrics, "sensor_cron_lag_seconds")
+        sensor.cycle = histogram_mean(metrics, "sensor_cycle_seconds")
+        sensor.queue_depth = gauge_total(metrics, "delivery_queue_depth")
+
+    def status(self) -> list[dict]:
+        now = time.monotonic()
+        return [sensor.status(now) for sensor in self.sensors]
+
+    def write_status(self) -> None:
+        if self.status_file is None:
+            return
+        tmp = f"{self.status_file}.tmp"
+        with open(tmp, "w") as file:
+            json.dump({"updatedAt": time.time(), "sensors": self.status()}, file, indent=2)
+        os.replace(tmp, self.status_file)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        # Staggered launch, so the registry is not hit by the whole fleet at once
+        for sensor in self.sensors:
+            if self.stopping.is_set():
+                break
+            await self.start(sensor)
+            await asyncio.sleep(self.stagger)
+
+        try:
+            while not self.stopping.is_set():
+                await asyncio.gather(*(self.check(sensor) for sensor in self.sensors))
+                self.write_status()
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            logger.info("Stopping %d sensors", sum(sensor.running for sensor in self.sensors))
+            await asyncio.gather(*(self.stop(sensor) for sensor in self.sensors))
+            for sensor in self.sensors:
+                sensor.state = "stopped"
+            self.write_status()
+            await self.client.aclose()
+
+
+def format_status(sensors: list[dict]) -> str:
+    def ms(seconds: float | None) -> str:
+        return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+    def count(value: float | None) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    lines = [
+        f"{'SENSOR':<40} {'STATE':<10} {'PID':>7} {'UPTIME':>9} {'RESTARTS':>8} {'LAG MS':>8} {'CYCLE MS':>9} {'QUEUE':>6}"
+    ]
+    for s in sensors:
+        lines.append(
+            f"{s['sensor']:<40} {s['state']:<10} {s['pid'] or '-':>7} {s['uptime']:>8.0f}s {s['restarts']:>8} "
+            f"{ms(s['cronLagSeconds']):>8} {ms(s['cycleSeconds']):>9} {count(s.get('queueDepth')):>6}"
+        )
+    healthy = sum(s["state"] == "healthy" for s in sensors)
+    lines.append(f"{healthy}/{len(sensors)} healthy")
+    return "\n".join(lines)
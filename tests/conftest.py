@@ -0,0 +1,98 @@
+import json
+from pathlib import Path
+from typing import Callable
+
+import httpx
+import pytest
+import yaml
+
+from scrapers.utils.variables import sensor_ids
+from sensor.config import SensorConfig
+from sensor.gateway import GatewayClient
+
+HOUR = 3_600_000
+CONFIGURATION = Path(__file__).resolve().parents[1] / "sensor" / "configuration.yaml"
+
+
+class FakeSource:
+    # Hourly payloads whose values are the hour of the slot, with an adjustable clock
+    def __init__(
+        self,
+        now: int = 10 * HOUR,
+        stations: tuple[str, ...] = ("Sestola", "Carpineta"),
+        missing: tuple[str, ...] = ("Carpineta",),
+        thresholds: dict[str, dict[str, float]] | None = None,
+        failing: tuple[str, ...] = (),
+    ):
+        self.clock = now
+        self.stations = stations
+        self.missing = set(missing)
+        self.thresholds = thresholds or {}
+        self.failing = {sensor_ids[name] for name in failing}
+        self.requests: list[tuple[str, int]] = []
+
+    def now(self) -> int:
+        return self.clock - self.clock % HOUR
+
+    def fetch(self, variable: str, timestamp: int) -> list:
+        self.requests.append((variable, timestamp))
+        if variable in self.failing:
+            raise RuntimeError("upstream down")
+        records = [
+            {
+                "idstazione": f"id-{name}",
+                "nomestaz": name,
+                "lon": "1100000",
+                "lat": "4400000",
+                "value": None if name in self.missing else timestamp // HOUR,
+                **self.thresholds.get(name, {}),
+            }
+            for name in self.stations
+        ]
+        return [{"time": str(timestamp)}, *records]
+
+    async def fetch_async(self, client, variable: str, timestamp: int) -> list:
+        return self.fetch(variable, timestamp)
+
+
+@pytest.fixture
+def fake_source():
+    return FakeSource
+
+
+@pytest.fixture
+def make_config():
+    # SensorConfig from sensor/configuration.yaml, with the given sections updated
+    def make(name: str = "Sestola", sensor_type: str = "temp", port: int = 11989, **sections) -> SensorConfig:
+        with open(CONFIGURATION) as file:
+            content = yaml.safe_load(file)
+        sensor = content["sensor"]
+        sensor["information"].update({"name": name, "type": sensor_type})
+        sensor["ethernet"]["port"] = port
+        for section, values in sections.items():
+            sensor.setdefault(section, {}).update(values)
+        return SensorConfig.from_dict(content)
+
+    return make
+
+
+class FakeGateway:
+    # GatewayClient answering from `respond` (status code or exception per request)
+    # instead of the network, recording the requests it got
+    def __init__(self, respond: Callable[[httpx.Request], int] = lambda request: 201):
+        self.respond = respond
+        self.requests: list[httpx.Request] = []
+        self.client = GatewayClient()
+        self.client.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(self.respond(request))
+
+    def bodies(self, suffix: str = "") -> list:
+        return [json.loads(r.content) for r in self.requests if r.url.path.endswith(suffix) and r.content]
+
+
+@pytest.fixture
+def fake_gateway():
+    return FakeGateway
@@ -0,0 +1,85 @@
+import asyncio
+import random
+
+import pytest
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from sensor.aggregates import HOUR, Aggregator, RollingWindow
+from sensor.runtime import SensorRuntime
+
+
+def reference(samples: list[tuple[int, float]], window: int, capacity: int) -> dict:
+    # What RollingWindow keeps: the newest `capacity` samples younger than `window` than the last one
+    last = samples[-1][0]
+    kept = [(t, v) for t, v in samples if last - t < window][-capacity:]
+    values = [v for _, v in kept]
+    (t0, v0), (t1, v1) = kept[0], kept[-1]
+    return {
+        "count": len(kept),
+        "sum": sum(values),
+        "mean": sum(values) / len(values),
+        "min": min(values),
+        "max": max(values),
+        "delta": v1 - v0,
+        "rate": (v1 - v0) / (t1 - t0) * HOUR if t1 > t0 else None,
+    }
+
+
+@pytest.mark.parametrize("capacity", [4, 64])
+def test_window_matches_a_full_scan(capacity):
+    rng = random.Random(7)
+    window = RollingWindow(3 * HOUR, capacity)
+    samples, timestamp = [], 0
+    for _ in range(300):
+        timestamp += rng.choice((HOUR // 2, HOUR, 2 * HOUR))
+        samples.append((timestamp, round(rng.uniform(-5, 5), 2)))
+        assert window.push(*samples[-1])
+        summary = window.summary()
+        for name, expected in reference(samples, 3 * HOUR, capacity).items():
+            assert summary[name] == pytest.approx(expected), name
+
+
+def test_repeated_and_missing_samples_are_ignored():
+    aggregator = Aggregator({"3h": 3 * HOUR})
+    assert aggregator.update("Sestola", str(HOUR), 2.0)
+    assert not aggregator.update("Sestola", str(HOUR), 2.0)
+    assert not aggregator.update("Sestola", 2 * HOUR, None)
+    assert not aggregator.update("Sestola", 2 * HOUR, float("nan"))
+    assert aggregator.metric("Sestola", "sum_3h") == 2.0
+    assert aggregator.metric("Carpineta", "sum_3h") is None
+    assert aggregator.summary("Sestola")["3h"]["count"] == 1
+    for metric in ("median_3h", "sum_2h", "sum"):
+        with pytest.raises(KeyError):
+            aggregator.parse(metric)
+
+
+def test_derived_queries_alert_on_the_aggregate(make_config, fake_source, fake_gateway):
+    source = fake_source()
+    gateway = fake_gateway()
+    query = {"operator": ">", "name": "warm", "threshold": 25, "metric": "sum_3h"}
+    config = make_config("Sestola", "temp", information={"queries": [query]}, apiGateway={"url": "http://gateway"})
+    scraper = GenericScraper("temp", cache=MemoryScrapeCache(), source=source)
+    sensor = SensorRuntime(config, scraper=scraper, client=gateway.client)
+
+    async def main():
+        # values are the hour of the slot: 10, 11, 12 (and 12 again)
+        for hour in (10, 11, 12, 12):
+            source.clock = hour * HOUR
+            assert await sensor.send_detection() == "sent"
+        await sensor.client.aclose()
+
+    asyncio.run(main())
+    # the repeated read is not counted twice, but the sum is still above the threshold
+    alerts = gateway.bodies("/alerts")
+    assert [alert["value"] for alert in alerts] == [33, 33]
+    assert alerts[0]["query"] == {"name": "warm", "value": 25, "metric": "sum_3h"}
+    assert sensor.aggregator.summary("Sestola")["3h"]["count"] == 3
+    assert len(gateway.bodies("/detections")) == 4
+
+
+def test_unknown_derived_metric_is_rejected(make_config, fake_source):
+    query = {"operator": ">", "name": "warm", "threshold": 25, "metric": "sum_2h"}
+    config = make_config("Sestola", "temp", information={"queries": [query]})
+    with pytest.raises(KeyError):
+        SensorRuntime(config, scraper=GenericScraper("temp", cache=MemoryScrapeCache(), source=fake_source()))
@@ -0,0 +1,42 @@
+import pytest
+
+import sensor.alerts
+from benchmarks.bench_alerts import per_object, synthetic_payload, synthetic_queries, vectorised
+from scrapers.GenericScraper import GenericScraper
+from sensor.alerts import AlertEngine
+from sensor.queries import Query
+
+QUERIES = {
+    "greater": synthetic_queries(),
+    "ties": [Query(">", "first", 5), Query(">", "second", 5), Query(">", "low", 1)],
+    "mixed": [Query("<", "dry", 1), Query(">", "wet", 6), Query("<", "low", 4), Query(">", "high", 9)],
+    "none": [],
+}
+
+
+@pytest.fixture(params=["numpy", "python"])
+def engine_backend(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(sensor.alerts, "np", None)
+    elif sensor.alerts.np is None:
+        pytest.skip("numpy is not installed")
+    return request.param
+
+
+@pytest.mark.parametrize("queries", QUERIES.values(), ids=QUERIES.keys())
+def test_engine_matches_the_per_object_evaluation(engine_backend, queries):
+    scraper = GenericScraper("idro_level")
+    data = synthetic_payload(300)
+    assert vectorised(AlertEngine(queries), data) == per_object(scraper, data, queries)
+
+
+def test_unknown_operator_is_rejected():
+    with pytest.raises(RuntimeError):
+        AlertEngine([Query("=", "hot", 1)])
+
+
+@pytest.mark.parametrize("queries", QUERIES.values(), ids=QUERIES.keys())
+def test_check_matches_check_queries(queries):
+    engine = AlertEngine(queries)
+    for value in [-1, 0, 1, 2.5, 3, 4, 5, 5.5, 6, 9, 9.5, 10, float("nan")]:
+        assert engine.check(value) is Query.checkQueries(value, queries)
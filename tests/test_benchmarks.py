@@ -0,0 +1,67 @@
+import asyncio
+
+import httpx
+
+from benchmarks import bench_micro
+from benchmarks.fakes import HOUR, Recorder, gateway_app, upstream_app
+from benchmarks.loadtest import fleet, histogram_mean, percentile, tick_latencies
+from scrapers.utils.metrics import MetricsRegistry
+from sensor.gateway import detection_url
+
+
+def test_gateway_url_scheme():
+    assert detection_url("gateway.example.com") == "https://gateway.example.com/v0/api/detection"
+    assert detection_url("http://127.0.0.1:3000") == "http://127.0.0.1:3000/v0/api/detection"
+
+
+def test_percentile_and_tick_latency():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 0.5) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 0.99) == 4.0
+    # ticks every 5 seconds of the minute
+    assert tick_latencies([600.25, 607.5, 659.0], 5) == [0.25, 2.5, 4.0]
+
+
+def test_histogram_mean_reads_the_exposition():
+    registry = MetricsRegistry()
+    cycles = registry.histogram("sensor_cycle_seconds", "Cycles", ("sensor",))
+    for sensor, value in (("a", 1.0), ("a", 2.0), ("b", 6.0)):
+        cycles.observe(value, sensor=sensor)
+    assert histogram_mean(registry.render(), "sensor_cycle_seconds") == (3.0, 3)
+    assert histogram_mean(registry.render(), "missing_seconds") == (0.0, 0)
+
+
+def test_fleet_names_are_unique():
+    sensors = fleet(200)
+    assert len(sensors) == 200 and len(set(sensors)) == 200
+
+
+def test_fake_upstream_and_gateway():
+    recorder = Recorder()
+
+    async def main():
+        upstream = httpx.ASGITransport(app=upstream_app(3, ["Sestola"], stale=True))
+        gateway = httpx.ASGITransport(app=gateway_app(recorder))
+        async with httpx.AsyncClient(transport=upstream, base_url="http://upstream") as client:
+            payload = (await client.get("/", params={"variabile": "temp", "time": 10 * HOUR})).json()
+        async with httpx.AsyncClient(transport=gateway, base_url="http://gateway") as client:
+            await client.post("/v0/api/sensor/register", json={"sensorIp": "127.0.0.1", "sensorPort": 12000})
+            await client.post("/v0/api/detection/alerts", json={})
+            await client.post("/v0/api/detection/temp/Sestola/detections", json={})
+        return payload
+
+    payload = asyncio.run(main())
+    assert payload[0] == {"time": str(9 * HOUR)} and len(payload) == 4
+    assert payload[1]["nomestaz"] == "Sestola"
+    assert recorder.registered == {("127.0.0.1", 12000)}
+    assert (len(recorder.alerts), len(recorder.detections)) == (1, 1)
+
+
+def test_micro_benchmark_cases_run():
+    results = bench_micro.run(stations=5, repeat=1)
+    assert set(results) == {
+        "detections_from_scraped_data",
+        "GenericDetection.to_json",
+        "Query.checkQueries",
+        "template rendering",
+    }
@@ -0,0 +1,101 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+
+from scrapers.utils.cache import FileScrapeCache, MemoryScrapeCache
+
+
+def slow_fetch(counter: list, value, delay: float = 0.05):
+    def fetch():
+        counter.append(1)
+        time.sleep(delay)
+        return value
+
+    return fetch
+
+
+def test_memory_cache_hits_and_expiry():
+    cache = MemoryScrapeCache(ttl=0.05)
+    fetches = []
+    assert cache.get_or_fetch("temp", 1, slow_fetch(fetches, [1], 0)) == [1]
+    assert cache.get_or_fetch("temp", 1, slow_fetch(fetches, [2], 0)) == [1]
+    assert (cache.lookups, cache.misses, cache.hits) == (2, 1, 1)
+    time.sleep(0.06)
+    assert cache.get_or_fetch("temp", 1, slow_fetch(fetches, [3], 0)) == [3]
+    assert len(fetches) == 2
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryScrapeCache(max_entries=2)
+    for timestamp in (1, 2, 3):
+        cache.put("temp", timestamp, [timestamp])
+    assert cache.get("temp", 1) is None
+    assert cache.get("temp", 3) == [3]
+
+
+def test_concurrent_threads_share_one_fetch():
+    cache = MemoryScrapeCache()
+    fetches = []
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_fetch("temp", 1, slow_fetch(fetches, [1]))))
+        for _ in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[1]] * 20
+    assert len(fetches) == 1
+    assert cache.lookups == 20 and cache.misses == 1
+
+
+def test_concurrent_tasks_share_one_fetch(tmp_path):
+    cache = FileScrapeCache(tmp_path)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.05)
+        return [1]
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_fetch("temp", 1, fetch) for _ in range(10)))
+
+    assert asyncio.run(main()) == [[1]] * 10
+    assert len(fetches) == 1
+    assert cache.lookups == 10 and cache.misses == 1
+
+
+def _fetch_in_process(directory: str, marker: str) -> None:
+    def fetch():
+        with open(marker, "a") as file:
+            file.write("x")
+        time.sleep(0.2)
+        return [1]
+
+    assert FileScrapeCache(directory).get_or_fetch("temp", 1, fetch) == [1]
+
+
+def test_processes_share_one_fetch(tmp_path):
+    marker = tmp_path / "fetches"
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_fetch_in_process, args=(str(tmp_path / "cache"), str(marker))) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [p.exitcode for p in processes] == [0] * 4
+    assert marker.read_text() == "x"
+
+
+def test_eviction_keeps_lock_files(tmp_path):
+    cache = FileScrapeCache(tmp_path, max_entries=1)
+    cache.get_or_fetch("temp", 1, lambda: [1])
+    cache.get_or_fetch("temp", 2, lambda: [2])
+    assert len(list(tmp_path.glob("*.json"))) == 1
+    assert len(list(tmp_path.glob("*.lock"))) == 1
+    cache.clear()
+    assert not list(tmp_path.glob("*.json"))
+    assert len(list(tmp_path.glob("*.lock"))) == 1
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import yaml
+
+from sensor.config import DEFAULT_BATCH_SIZE, SensorConfig, load_configs
+from sensor.queries import Query
+
+CONFIGURATION = Path(__file__).resolve().parents[1] / "sensor" / "configuration.yaml"
+
+
+def test_configuration_is_flattened():
+    config = SensorConfig.from_yaml(CONFIGURATION)
+    assert (config.name, config.formatted_name, config.type) == ("Diga di Ridracoli", "DigadiRidracoli", "idro_level")
+    assert (config.ip, config.port) == ("0.0.0.0", 11989)
+    assert config.queries == ["soglia1", "soglia2", "soglia3"]
+    assert config.registerPath == "/register" and config.shutdownPath == "/shutdown"
+    assert config.api_gateway_info == {"url": "api-gateway-17633123551.europe-west8.run.app", "port": 3000}
+    assert config.cron_info["day_of_the_week"] == "0-6"
+    assert config.delivery["batch_size"] == DEFAULT_BATCH_SIZE
+    assert config.spool_dir is None and config.registry_bulk_suffix is None
+
+
+def test_query_mappings(make_config):
+    config = make_config(
+        information={
+            "queries": [
+                "soglia1",
+                {"operator": ">", "name": "hot", "threshold": 30},
+                {"operator": ">", "name": "warm day", "threshold": 25, "metric": "mean_24h"},
+            ]
+        }
+    )
+    hot, warm = config.queries[1:]
+    assert isinstance(hot, Query) and hot.metric is None and hot.operator.symbol == ">"
+    assert config.custom_queries == [hot] and config.derived_queries == [warm]
+    assert config.query_names == ["soglia1", "hot", "warm day"]
+
+
+def test_load_configs_from_files_and_directories(tmp_path):
+    with open(CONFIGURATION) as file:
+        content = yaml.safe_load(file)
+    for name in ("b", "a"):
+        content["sensor"]["information"]["name"] = name
+        (tmp_path / f"{name}.yaml").write_text(yaml.safe_dump(content))
+    (tmp_path / "notes.txt").write_text("not a configuration")
+
+    configs = load_configs([str(tmp_path), str(CONFIGURATION)])
+    assert [config.name for config in configs] == ["a", "b", "Diga di Ridracoli"]
@@ -0,0 +1,108 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+import yaml
+
+from sensor.config import SensorConfig
+from sensor.create_template import MANIFEST_FILE, STUB_TEMPLATE, TEMPLATE_FILE, generate, render_sensor
+
+SENSOR_DIR = Path(__file__).resolve().parents[1] / "sensor"
+
+
+def write_config(path: Path, queries: list, name: str | None = None, **cronjob) -> Path:
+    with open(SENSOR_DIR / "configuration.yaml") as file:
+        config = yaml.safe_load(file)
+    config["sensor"]["information"]["queries"] = queries
+    if name is not None:
+        config["sensor"]["information"]["name"] = name
+    config["sensor"]["cronjob"].update(cronjob)
+    path.write_text(yaml.safe_dump(config))
+    return path
+
+
+def load_sensor(path: str):
+    spec = importlib.util.spec_from_file_location(Path(path).stem, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def in_sensor_dir(monkeypatch):
+    monkeypatch.chdir(SENSOR_DIR)
+
+
+def test_default_template_supports_derived_metrics(tmp_path):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1", {"operator": ">", "name": "wet", "threshold": 30, "metric": "sum_3h"}])
+    report = generate([str(config)], output_dir=str(tmp_path))
+    [output] = report["generated"]
+    sensor = load_sensor(output)
+    assert [q.name for q in sensor.config.derived_queries] == ["wet"]
+    assert sensor.config.query_names == ["soglia1", "wet"]
+
+
+def test_stub_launches_the_runtime(tmp_path):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1"])
+    output = render_sensor(str(config), STUB_TEMPLATE, str(tmp_path))
+    assert "from sensor.runtime import main" in Path(output).read_text()
+    assert load_sensor(output).CONFIG_FILE == str(config)
+
+
+def test_stub_refers_to_the_configuration_relative_to_itself(tmp_path):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1"])
+    (tmp_path / "sensors").mkdir()
+    output = render_sensor(str(config), STUB_TEMPLATE, str(tmp_path / "sensors"))
+    assert '"../sensor.yaml"' in Path(output).read_text()
+    assert Path(load_sensor(output).CONFIG_FILE).resolve() == config.resolve()
+
+
+def test_template_embeds_the_configuration(tmp_path):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1"])
+    output = render_sensor(str(config), TEMPLATE_FILE, str(tmp_path))
+    assert str(config) not in Path(output).read_text()
+    assert load_sensor(output).config.values == SensorConfig.from_yaml(config).values
+
+
+@pytest.mark.parametrize("coalesce, expected", [("false", False), (False, False), ("yes", True)])
+def test_template_parses_coalesce_flag(tmp_path, coalesce, expected):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1"], coalesce=coalesce)
+    sensor = load_sensor(render_sensor(str(config), TEMPLATE_FILE, str(tmp_path)))
+    assert sensor.config.cron_info["coalesce"] is expected
+
+
+def test_template_keeps_explicit_zeros(tmp_path):
+    config = write_config(tmp_path / "sensor.yaml", ["soglia1"], misfire_grace_time=0, jitter=0)
+    sensor = load_sensor(render_sensor(str(config), TEMPLATE_FILE, str(tmp_path)))
+    assert (sensor.config.cron_info["misfire_grace_time"], sensor.config.cron_info["jitter"]) == (0, 0)
+
+
+def test_unchanged_configurations_are_skipped(tmp_path):
+    configs = [str(write_config(tmp_path / f"{name}.yaml", ["soglia1"], name)) for name in ("Sestola", "Carpineta")]
+    first = generate(configs, output_dir=str(tmp_path))
+    assert len(first["generated"]) == 2 and first["skipped"] == []
+    assert set(json.loads((tmp_path / MANIFEST_FILE).read_text())) == set(configs)
+
+    second = generate(configs, output_dir=str(tmp_path))
+    assert second["generated"] == [] and second["skipped"] == first["generated"]
+
+    # a changed configuration and a deleted output are generated again
+    write_config(tmp_path / "Sestola.yaml", ["soglia2"], "Sestola")
+    Path(first["generated"][1]).unlink()
+    third = generate(configs, output_dir=str(tmp_path))
+    assert third["generated"] == first["generated"] and third["skipped"] == []
+
+    assert generate(configs, output_dir=str(tmp_path), force=True)["generated"] == first["generated"]
+
+
+def test_process_pool_renders_the_same_sensors(tmp_path):
+    names = ("Sestola", "Carpineta", "Paderno")
+    configs = [str(write_config(tmp_path / f"{name}.yaml", ["soglia1"], name)) for name in names]
+    (tmp_path / "sequential").mkdir()
+    (tmp_path / "pool").mkdir()
+    sequential = generate(configs, output_dir=str(tmp_path / "sequential"))
+    pool = generate(configs, output_dir=str(tmp_path / "pool"), workers=2)
+    assert [Path(p).name for p in pool["generated"]] == [Path(p).name for p in sequential["generated"]]
+    for a, b in zip(sequential["generated"], pool["generated"]):
+        assert Path(a).read_text() == Path(b).read_text()
@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+
+from sensor.delivery import DeliveryQueue
+from sensor.metrics import DELIVERY_DROPPED, DELIVERY_FLUSH_SECONDS, DELIVERY_ITEMS, DELIVERY_QUEUE_DEPTH
+from sensor.spool import Spool
+
+
+class FakeClient:
+    def __init__(self, status: int = 201):
+        self.status = status
+        self.posts: list[tuple[str, object]] = []
+
+    async def post(self, url: str, json, headers: dict | None = None) -> httpx.Response:
+        if self.status == 0:
+            raise httpx.ConnectError("gateway down")
+        self.posts.append((url, json))
+        return httpx.Response(self.status)
+
+
+def test_flush_sends_in_batches_and_updates_metrics():
+    client = FakeClient()
+    queue = DeliveryQueue(client, batch_size=2, name="test-batches")
+    for i in range(5):
+        queue.put("/detections", {"i": i})
+    assert DELIVERY_QUEUE_DEPTH.get(queue="test-batches") == 5
+
+    assert asyncio.run(queue.flush()) == 5
+    assert [body["i"] for _, body in client.posts] == [0, 1, 2, 3, 4]
+    assert queue.flushes == 3
+    assert DELIVERY_QUEUE_DEPTH.get(queue="test-batches") == 0
+    assert DELIVERY_FLUSH_SECONDS.count(queue="test-batches") == 3
+    assert DELIVERY_ITEMS.get(queue="test-batches", result="sent") == 5
+
+
+def test_unreachable_gateway_keeps_the_items():
+    client = FakeClient(status=0)
+    queue = DeliveryQueue(client, name="test-unreachable")
+    queue.put("/detections", {"i": 0})
+    queue.put("/alerts", {"i": 1})
+    assert asyncio.run(queue.flush()) == 0
+    assert queue.depth == 2
+    assert DELIVERY_QUEUE_DEPTH.get(queue="test-unreachable") == 2
+
+    client.status = 201
+    assert asyncio.run(queue.flush()) == 2
+    assert [url for url, _ in client.posts] == ["/detections", "/alerts"]
+
+
+def test_refused_items_are_not_retried():
+    queue = DeliveryQueue(FakeClient(status=400), name="test-refused")
+    queue.put("/detections", {"i": 0})
+    assert asyncio.run(queue.flush()) == 0
+    assert queue.depth == 0 and queue.failed == 1
+    assert DELIVERY_ITEMS.get(queue="test-refused", result="failed") == 1
+
+
+def test_full_queue_drops_the_oldest():
+    queue = DeliveryQueue(FakeClient(), max_queue=3, name="test-dropped")
+    for i in range(5):
+        queue.put("/detections", {"i": i})
+    assert [body["i"] for _, body in queue.items] == [2, 3, 4]
+    assert queue.dropped == 2
+    assert DELIVERY_DROPPED.get(queue="test-dropped") == 2
+
+
+def test_batch_suffix_posts_arrays():
+    client = FakeClient()
+    queue = DeliveryQueue(client, batch_suffix="/batch", name="test-suffix")
+    queue.put("/detections", {"i": 0})
+    queue.put("/detections", {"i": 1})
+    queue.put("/alerts", {"i": 2})
+    asyncio.run(queue.flush())
+    assert client.posts == [("/detections/batch", [{"i": 0}, {"i": 1}]), ("/alerts/batch", [{"i": 2}])]
+
+
+def test_spooled_items_survive_a_restart(tmp_path):
+    client = FakeClient(status=0)
+    queue = DeliveryQueue(client, spool=Spool(tmp_path), name="test-spool")
+    for i in range(3):
+        queue.put("/detections", {"i": i})
+    asyncio.run(queue.stop())
+
+    client.status = 201
+    queue = DeliveryQueue(client, spool=Spool(tmp_path), name="test-spool")
+    assert queue.depth == 3
+    assert asyncio.run(queue.flush()) == 3
+    assert queue.depth == 0
+    assert DELIVERY_QUEUE_DEPTH.get(queue="test-spool") == 0
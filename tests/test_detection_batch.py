@@ -0,0 +1,49 @@
+import json
+import math
+
+from scrapers.DetectionBatch import DetectionBatch
+from scrapers.GenericScraper import GenericScraper
+
+
+def payload() -> dict:
+    return {
+        "timestamp": "1734688800000",
+        "sensor_type": "idro_level",
+        "unit": "m",
+        "data": [
+            {"idstazione": "a", "nomestaz": "Alfa", "lon": "1100000", "lat": "4400000", "value": 5, "soglia1": 2, "soglia3": 4.0},
+            {"idstazione": "b", "nomestaz": "Beta", "lon": "1100001", "lat": "4400001", "value": None},
+            {"idstazione": "c", "nomestaz": "Gamma", "lon": "", "lat": "4400002", "value": "4.5"},
+            {"idstazione": "d", "nomestaz": "Delta", "lon": 1100003, "lat": 4400003, "value": 3.0, "soglia2": 3},
+        ],
+    }
+
+
+def test_columns_from_scraped_data():
+    batch = DetectionBatch.from_scraped_data(payload())
+    assert len(batch) == 4
+    assert batch.names == ["Alfa", "Beta", "Gamma", "Delta"]
+    assert batch.value(0) == 5 and batch.value(1) is None and batch.value(2) == 4.5
+    assert batch.raw_values == [5, None, "4.5", 3.0]
+    assert math.isnan(batch.thresholds[0][1]) and batch.thresholds[2][0] == 4
+    assert batch.longitudes[2] == "" and batch.timestamp == "1734688800000"
+    assert batch.queries(0) == [("soglia1", 2), ("soglia3", 4.0)]
+    assert batch.queries(1) == []
+    assert batch.queries(3) == [("soglia2", 3)]
+    assert batch.index_of("Gamma") == 2 and batch.index_of("Omega") == -1
+
+
+def test_writers_match_the_detection_json():
+    scraper = GenericScraper("idro_level")
+    data = payload()
+    batch = scraper.batch_from_scraped_data(data)
+    detections = scraper.detections_from_scraped_data(data)
+    for i, detection in enumerate(detections):
+        assert batch.detection_json(i) == json.dumps(detection.to_json_detection())
+        assert scraper.detection_from_batch(batch, i).to_json() == detection.to_json()
+        # every threshold of the payload is met, one alert each
+        for name, threshold in detection.queries:
+            detection.queries = [(name, threshold)]
+            assert batch.alert_json(i, name, threshold) == json.dumps(detection.to_json()["detection"])
+    assert json.loads(batch.detections_json([3, 0])) == [d.to_json_detection() for d in (detections[3], detections[0])]
+    assert batch.detections_json() == json.dumps([d.to_json_detection() for d in detections])
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+
+from scrapers.utils import fastjson
+
+PAYLOAD = [
+    {"time": "1734688800000"},
+    {"idstazione": "-/1100000,4400000/spdsra", "nomestaz": "Forlì", "value": 12.75, "soglia1": 3, "missing": None},
+]
+
+
+@pytest.fixture(params=["orjson", "msgspec", "json"])
+def backend(request):
+    if request.param not in fastjson.BACKENDS:
+        pytest.skip(f"{request.param} is not installed")
+    return fastjson.BACKENDS[request.param]
+
+
+def test_backends_agree_with_the_standard_library(backend):
+    loads, dumps = backend
+    encoded = dumps(PAYLOAD)
+    assert isinstance(encoded, bytes)
+    assert loads(encoded) == fastjson.stdlib_loads(fastjson.stdlib_dumps(PAYLOAD)) == PAYLOAD
+    assert loads(encoded.decode()) == PAYLOAD
+    assert json.loads(encoded) == PAYLOAD
+
+
+def test_invalid_payloads_raise_value_error(backend):
+    loads, _ = backend
+    with pytest.raises(ValueError):
+        loads(b'[{"time": "17346')
+
+
+def test_preferred_backend_is_used():
+    assert (fastjson.loads, fastjson.dumps) == fastjson.BACKENDS[fastjson.BACKEND]
+
+
+def test_gateway_bodies_are_json(fake_gateway):
+    gateway = fake_gateway()
+
+    async def main():
+        await gateway.client.post("http://gateway/v0/api/detection/alerts", json={"detection": PAYLOAD[1]})
+        await gateway.client.aclose()
+
+    asyncio.run(main())
+    [request] = gateway.requests
+    assert request.headers["Content-Type"] == fastjson.CONTENT_TYPE
+    assert json.loads(request.content) == {"detection": PAYLOAD[1]}
@@ -0,0 +1,43 @@
+from scrapers.GenericScraper import GenericScraper, PayloadIndex
+from scrapers.utils.cache import MemoryScrapeCache
+
+HOUR = 3_600_000
+
+
+def make_scraper(source) -> GenericScraper:
+    return GenericScraper("temp", cache=MemoryScrapeCache(), source=source)
+
+
+def test_index_keeps_the_first_record():
+    first = {"idstazione": "1", "nomestaz": "Sestola", "value": 1}
+    duplicate = {"idstazione": "1", "nomestaz": "Sestola", "value": 2}
+    index = PayloadIndex({"data": [first, duplicate]})
+    assert index.by_name["Sestola"] is first
+    assert index.by_id["1"] is first
+
+
+def test_detections_match_the_linear_scan(fake_source):
+    scraper = make_scraper(fake_source(missing=()))
+    data = scraper.scrape()
+    expected = {d.sensorName: d.to_json() for d in scraper.detections_from_scraped_data(data)}
+    found = scraper.get_detections_for_sensors(["Sestola", "Carpineta", "Nowhere"])
+    assert found.pop("Nowhere") is None
+    assert {name: d.to_json() for name, d in found.items()} == expected
+
+
+def test_lookup_by_station_id(fake_source):
+    scraper = make_scraper(fake_source(missing=()))
+    assert scraper.get_detection_for_station_id("id-Carpineta").sensorName == "Carpineta"
+    assert scraper.get_detection_for_station_id("id-Nowhere") is None
+
+
+def test_index_is_built_once_per_payload(fake_source):
+    source = fake_source()
+    scraper = make_scraper(source)
+    index = scraper.scrape_index()
+    assert scraper.scrape_index() is index
+    assert len(source.requests) == 1
+
+    source.clock += HOUR
+    assert scraper.scrape_index() is not index
+    assert len(source.requests) == 2
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from scrapers.utils.history import MANIFEST, HistoryStore
+
+HOUR = 3_600_000
+DAY = 24 * HOUR
+START = int(datetime(2024, 3, 1).timestamp() * 1000)
+
+
+def record(timestamp: int) -> dict:
+    return {"timestamp": str(timestamp), "data": [{"nomestaz": "Sestola", "value": timestamp // HOUR}]}
+
+
+def test_append_once_and_reload(tmp_path):
+    store = HistoryStore(tmp_path)
+    assert store.append("temp", START, record(START))
+    assert not store.append("temp", START, record(START))
+    assert store.missing("temp", [START, START + HOUR]) == [START + HOUR]
+
+    reopened = HistoryStore(tmp_path)
+    assert reopened.has("temp", START)
+    assert reopened.fetched("temp") == {START}
+    assert reopened.get("temp", START) == {"requested": START, **record(START)}
+    assert reopened.get("temp", START + HOUR) is None
+
+
+def test_read_by_range_across_days(tmp_path):
+    store = HistoryStore(tmp_path)
+    timestamps = [START + i * 12 * HOUR for i in range(6)]
+    for timestamp in timestamps:
+        store.append("rain", timestamp, record(timestamp))
+    store.append("temp", START, record(START))
+
+    assert len(list((tmp_path / "rain").glob("*.ndjson"))) == 3
+    assert [r["requested"] for r in store.read("rain")] == timestamps
+    assert [r["requested"] for r in store.read("rain", START + 12 * HOUR, START + 2 * DAY)] == timestamps[1:5]
+    assert list(store.read("wind")) == []
+    assert store.variables() == ["rain", "temp"]
+
+
+def test_truncated_line_is_skipped(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.append("temp", START, record(START))
+    partition = tmp_path / "temp" / f"{HistoryStore.partition(START)}.ndjson"
+    # an interrupted run: data written, manifest not
+    with open(partition, "a") as w:
+        w.write('{"requested": %d, "timest' % (START + HOUR))
+
+    reopened = HistoryStore(tmp_path)
+    assert [r["requested"] for r in reopened.read("temp")] == [START]
+    assert reopened.missing("temp", [START + HOUR]) == [START + HOUR]
+    assert (tmp_path / "temp" / MANIFEST).read_text() == f"{START}\n"
+
+
+def test_scraper_appends_every_slot_once(tmp_path, fake_source):
+    store = HistoryStore(tmp_path)
+    source = fake_source(now=START)
+    scraper = GenericScraper("temp", cache=MemoryScrapeCache(), history=store, source=source)
+    scraper.scrape()
+    scraper.scrape()
+    source.clock += HOUR
+    scraper.scrape()
+
+    records = list(store.read("temp"))
+    assert [r["requested"] for r in records] == [START, START + HOUR]
+    assert records[0]["data"][0]["nomestaz"] == "Sestola"
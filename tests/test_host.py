@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+
+from scrapers.utils.cache import MemoryScrapeCache
+from sensor.host import PortDispatcher, SensorHost
+
+
+def make_host(make_config, source) -> SensorHost:
+    host = SensorHost(
+        [
+            make_config("Sestola", "temp", 12001),
+            make_config("Carpineta", "temp", 12002),
+            make_config("Paderno", "rain", 12003),
+        ]
+    )
+    cache = MemoryScrapeCache()
+    host.multi.source = source
+    for scraper in host.multi.scrapers.values():
+        scraper.source, scraper.cache = source, cache
+    return host
+
+
+def test_sensors_share_scrapers_queue_and_registry(make_config, fake_source):
+    host = make_host(make_config, fake_source())
+    sestola, carpineta, paderno = host.sensors
+    assert len(host.multi.scrapers) == 2
+    assert sestola.scraper is carpineta.scraper is not paderno.scraper
+    assert sestola.delivery is paderno.delivery is host.delivery
+    assert sestola.registry is paderno.registry and len(host.registries) == 1
+    assert [registry for registry, _ in host.by_registry()] == [sestola.registry]
+
+
+def test_one_upstream_round_for_every_sensor(make_config, fake_source):
+    source = fake_source(stations=("Sestola", "Carpineta", "Paderno"), missing=())
+    host = make_host(make_config, source)
+
+    async def main():
+        try:
+            return [await sensor.send_detection() for sensor in host.sensors]
+        finally:
+            await host.client.aclose()
+
+    assert asyncio.run(main()) == ["sent", "sent", "sent"]
+    assert len(source.requests) == 2
+    urls = [url for url, _ in host.delivery.items]
+    assert [url.rsplit("/", 3)[1:] for url in urls] == [
+        ["temp", "Sestola", "detections"],
+        ["temp", "Carpineta", "detections"],
+        ["rain", "Paderno", "detections"],
+    ]
+
+
+def test_routes_by_port_and_by_prefix(make_config, fake_source):
+    host = make_host(make_config, fake_source())
+    dispatcher = PortDispatcher(host.app, {s.config.port: s.prefix for s in host.sensors})
+
+    async def get(base_url: str, path: str) -> httpx.Response:
+        transport = httpx.ASGITransport(app=dispatcher)
+        async with httpx.AsyncClient(transport=transport, base_url=base_url) as client:
+            return await client.get(path)
+
+    async def main():
+        by_port = await get("http://127.0.0.1:12003", "/info")
+        by_prefix = await get("http://127.0.0.1:8000", "/temp/Carpineta/info")
+        sensors = await get("http://127.0.0.1:8000", "/sensors")
+        host_paths = [await get("http://127.0.0.1:12001", path) for path in ("/metrics", "/delivery", "/sensors")]
+        await host.client.aclose()
+        return by_port, by_prefix, sensors, host_paths
+
+    by_port, by_prefix, sensors, host_paths = asyncio.run(main())
+    assert [r.status_code for r in host_paths] == [200, 200, 200]
+    assert host_paths[0].headers["content-type"].startswith("text/plain")
+    assert by_port.json()["General Sensor Information"][0] == {"Sensor Name": "Paderno"}
+    assert by_prefix.json()["General Sensor Information"][0] == {"Sensor Name": "Carpineta"}
+    assert [s["prefix"] for s in sensors.json()] == ["/temp/Sestola", "/temp/Carpineta", "/rain/Paderno"]
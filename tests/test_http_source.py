@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from scrapers.utils.sources import ACCEPT_ENCODING, HttpSource
+from scrapers.utils.variables import sensor_ids
+
+HOUR = 3_600_000
+TEMP = sensor_ids["TEMP"]
+
+
+class Upstream:
+    # Publishes `published` as the latest slot, with an ETag per slot
+    def __init__(self, published: int):
+        self.published = published
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        etag = f'"{self.published}"'
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304)
+        body = gzip.compress(json.dumps([{"time": str(self.published)}, {"nomestaz": "Sestola", "value": 1}]).encode())
+        return httpx.Response(200, content=body, headers={"ETag": etag, "Content-Encoding": "gzip"})
+
+
+def fetch_all(upstream: Upstream, source: HttpSource, timestamps: list[int]) -> list:
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(upstream.handle)) as client:
+            return [await source.fetch_async(client, TEMP, timestamp) for timestamp in timestamps]
+
+    return asyncio.run(main())
+
+
+def test_complete_slot_is_not_requested_again():
+    upstream = Upstream(published=10 * HOUR)
+    source = HttpSource("http://upstream/data")
+    first, second = fetch_all(upstream, source, [10 * HOUR, 10 * HOUR])
+    assert first is second and first[0]["time"] == str(10 * HOUR)
+    assert len(upstream.requests) == 1
+    assert upstream.requests[0].headers["Accept-Encoding"] == ACCEPT_ENCODING
+    assert dict(upstream.requests[0].url.params) == {"variabile": TEMP, "time": str(10 * HOUR)}
+    assert source.stats()["avoidedRequests"] == 1 and source.stats()["avoidedBytes"] > 0
+
+
+def test_incomplete_slot_is_revalidated():
+    # the upstream has not published the requested slot yet
+    upstream = Upstream(published=9 * HOUR)
+    source = HttpSource("http://upstream/data")
+    first, second = fetch_all(upstream, source, [10 * HOUR, 10 * HOUR])
+    assert second is first
+    assert "If-None-Match" not in upstream.requests[0].headers
+    assert upstream.requests[1].headers["If-None-Match"] == f'"{9 * HOUR}"'
+    assert source.stats() == {"requests": 2, "avoidedRequests": 0, "avoidedBytes": source.fetched[TEMP].size}
+
+    upstream.published = 10 * HOUR
+    [third] = fetch_all(upstream, source, [10 * HOUR])
+    assert third[0]["time"] == str(10 * HOUR)
+
+
+def test_new_slot_is_not_conditional():
+    upstream = Upstream(published=10 * HOUR)
+    source = HttpSource("http://upstream/data")
+    fetch_all(upstream, source, [10 * HOUR, 11 * HOUR])
+    assert len(upstream.requests) == 2
+    assert "If-None-Match" not in upstream.requests[1].headers
+
+
+def test_errors_are_raised():
+    source = HttpSource("http://upstream/data")
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500))) as client:
+            await source.fetch_async(client, TEMP, 10 * HOUR)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(main())
+    assert source.fetched == {}
+
+
+def test_async_fetch_uses_the_source_timeout():
+    upstream = Upstream(published=10 * HOUR)
+    fetch_all(upstream, HttpSource("http://upstream/data", timeout=7), [10 * HOUR])
+    assert upstream.requests[0].extensions["timeout"] == {"connect": 7, "read": 7, "write": 7, "pool": 7}
+
+
+class Session:
+    # Blocking session answering from Upstream, like requests.Session.get
+    def __init__(self, upstream: Upstream):
+        self.upstream = upstream
+
+    def get(self, url, params, headers, timeout):
+        request = httpx.Request("GET", url, params=params, headers=headers)
+        response = self.upstream.handle(request)
+        response.request = request
+        response.read()
+        return response
+
+
+def test_counters_from_worker_threads():
+    upstream = Upstream(published=10 * HOUR)
+    source = HttpSource("http://upstream/data", session=Session(upstream))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: source.fetch(TEMP, (i % 2 + 9) * HOUR), range(400)))
+    stats = source.stats()
+    assert stats["requests"] == len(upstream.requests)
+    assert stats["requests"] + stats["avoidedRequests"] == 400
@@ -0,0 +1,88 @@
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from sensor.logs import JsonFormatter, SamplingFilter, configure_logging, sensor_logger, stop_logging
+
+
+@pytest.fixture
+def root_logger():
+    # configure_logging replaces the root handlers, put pytest's back afterwards
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def record(message: str = "hello %s", *args, **extra) -> logging.LogRecord:
+    entry = logging.LogRecord("sensor", logging.INFO, __file__, 1, message, args or ("world",), None)
+    entry.__dict__.update(extra)
+    return entry
+
+
+def test_json_lines_carry_the_context():
+    line = json.loads(JsonFormatter().format(record(sensor="temp_Sestola", alerts=2)))
+    assert line["message"] == "hello world" and line["level"] == "INFO" and line["logger"] == "sensor"
+    assert (line["sensor"], line["alerts"]) == ("temp_Sestola", 2)
+    assert "args" not in line and "msg" not in line
+
+
+def test_sampling_keeps_one_record_out_of_n():
+    sampling = SamplingFilter({"health": 3})
+    kept = [sampling.filter(record(event="health")) for _ in range(7)]
+    assert kept == [True, False, False, True, False, False, True]
+    assert all(sampling.filter(record(event="cycle")) for _ in range(3))
+    assert all(sampling.filter(record()) for _ in range(3))
+
+
+def test_records_are_written_by_the_listener(root_logger):
+    stream = io.StringIO()
+    configure_logging("info", "json", {"health": 2}, stream=stream)
+    logger = sensor_logger("temp_Sestola", "temp")
+    for _ in range(4):
+        logger.info("Server pinged", extra={"event": "health"})
+    logger.debug("not written")
+    logger.info("Data sent (%d alerts)", 1, extra={"alerts": 1})
+    stop_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == ["Server pinged", "Server pinged", "Data sent (1 alerts)"]
+    assert all(line["sensor"] == "temp_Sestola" and line["type"] == "temp" for line in lines)
+    assert lines[-1]["alerts"] == 1
+
+
+def test_text_format(root_logger):
+    stream = io.StringIO()
+    configure_logging(format="text", stream=stream)
+    sensor_logger("temp_Sestola", "temp").warning("late by %ds", 3)
+    stop_logging()
+    assert stream.getvalue().rstrip().endswith("WARNING sensor: late by 3s sensor=temp_Sestola type=temp")
+
+
+def test_records_are_formatted_by_the_listener(root_logger, monkeypatch):
+    threads = []
+    format_record = JsonFormatter.format
+
+    def format(self, record):
+        threads.append(threading.current_thread())
+        return format_record(self, record)
+
+    monkeypatch.setattr(JsonFormatter, "format", format)
+    stream = io.StringIO()
+    configure_logging(stream=stream)
+    logger = sensor_logger("temp_Sestola", "temp")
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception("Tick failed for %s", "Sestola")
+    stop_logging()
+
+    [line] = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert line["message"] == "Tick failed for Sestola"
+    assert "ZeroDivisionError" in line["exception"]
+    assert threads and threading.main_thread() not in threads
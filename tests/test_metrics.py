@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from scrapers.utils.metrics import CONTENT_TYPE, MetricsRegistry
+from sensor.metrics import CYCLES, GATEWAY_RESPONSES
+from sensor.runtime import SensorRuntime, build_app
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("method", "path"))
+    depth = registry.gauge("depth", "Queue depth")
+    latency = registry.histogram("latency_seconds", "Latency", ("method",), buckets=(1.0, 0.1))
+    assert registry.counter("requests_total", "Registered twice") is requests
+
+    requests.inc(method="GET", path='/a"b')
+    requests.inc(2, method="GET", path='/a"b')
+    depth.set(0.5)
+    for value in (0.05, 0.5, 0.5, 3):
+        latency.observe(value, method="GET")
+
+    assert requests.get(method="GET", path='/a"b') == 3 and latency.count(method="GET") == 4
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{method="GET",path="/a\\"b"} 3',
+        "# HELP depth Queue depth",
+        "# TYPE depth gauge",
+        "depth 0.5",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{method="GET",le="0.1"} 1',
+        'latency_seconds_bucket{method="GET",le="1"} 3',
+        'latency_seconds_bucket{method="GET",le="+Inf"} 4',
+        'latency_seconds_sum{method="GET"} 4.05',
+        'latency_seconds_count{method="GET"} 4',
+    ]
+
+
+def test_sensor_serves_its_metrics(make_config, fake_source, fake_gateway):
+    gateway = fake_gateway(lambda request: 503)
+    scraper = GenericScraper("temp", cache=MemoryScrapeCache(), source=fake_source())
+    sensor = SensorRuntime(make_config("Sestola", "temp"), scraper=scraper, client=gateway.client)
+    refused = GATEWAY_RESPONSES.get(method="POST", status=503)
+    cycles = CYCLES.get(sensor=sensor.job_id, result="sent")
+
+    async def main():
+        await sensor.send_data_to_endpoint()
+        transport = httpx.ASGITransport(app=build_app(sensor))
+        async with httpx.AsyncClient(transport=transport, base_url="http://sensor") as client:
+            response = await client.get("/metrics")
+        await sensor.client.aclose()
+        return response
+
+    response = asyncio.run(main())
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert GATEWAY_RESPONSES.get(method="POST", status=503) == refused + 1
+    assert CYCLES.get(sensor=sensor.job_id, result="sent") == cycles + 1
+    assert 'gateway_responses_total{method="POST",status="503"}' in response.text
+    assert f'sensor_cycles_total{{sensor="{sensor.job_id}",result="sent"}}' in response.text
@@ -0,0 +1,58 @@
+import asyncio
+
+import httpx
+
+from scrapers.MultiScraper import MultiScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from scrapers.utils.variables import sensor_ids, sensors_units
+from sensor.runtime import SensorRuntime
+
+HOUR = 3_600_000
+
+
+def test_no_scrapers(fake_source):
+    multi = MultiScraper([], source=fake_source())
+    assert multi.scrape_indexes() == {}
+    assert asyncio.run(multi.scrape_indexes_async(None)) == {}
+
+
+def test_combined_view_keyed_by_station(fake_source):
+    source = fake_source()
+    multi = MultiScraper(["temp", "humidity", "TEMP"], cache=MemoryScrapeCache(), source=source)
+    view = multi.scrape()
+    assert view["timestamp"] == source.now()
+    assert view["units"] == {"temp": sensors_units[sensor_ids["TEMP"]], "humidity": sensors_units[sensor_ids["HUMIDITY"]]}
+    assert view["stations"]["Sestola"]["values"] == {"temp": 10, "humidity": 10}
+    assert view["stations"]["Carpineta"]["values"] == {"temp": None, "humidity": None}
+    assert len(source.requests) == 2
+
+
+def test_failed_variable_is_left_out(fake_source):
+    source = fake_source(failing=("HUMIDITY",))
+    multi = MultiScraper(["temp", "humidity"], cache=MemoryScrapeCache(), source=source)
+    indexes = asyncio.run(multi.scrape_indexes_async(None))
+    assert list(indexes) == ["TEMP"]
+
+
+def test_sensor_reads_the_slot_of_the_round(make_config, fake_source):
+    source = fake_source(now=10 * HOUR + HOUR - 1)
+    multi = MultiScraper(["temp", "humidity"], cache=MemoryScrapeCache(), source=source)
+    sensor = SensorRuntime(make_config("Sestola", "temp"), scraper=multi.scraper("temp"))
+
+    async def fetch_round(client: httpx.AsyncClient, now: int):
+        indexes = await multi.scrape_indexes_async(client, now)
+        # the hour changes between the round and the sensor's own read
+        source.clock += 1
+        return indexes
+
+    sensor.fetch_round = fetch_round
+
+    async def main():
+        try:
+            return await sensor.sense_data()
+        finally:
+            await sensor.client.aclose()
+
+    detection = asyncio.run(main())
+    assert detection.value == 10
+    assert {timestamp for _, timestamp in source.requests} == {10 * HOUR}
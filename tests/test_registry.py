@@ -0,0 +1,119 @@
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+
+from sensor.registry import CACHED, DEREGISTERED, ERROR, REGISTERED, REJECTED, RegistrationState, RegistryClient
+from sensor.startup import backoff_delays
+
+URL = "http://registry/v0/api/sensor"
+
+
+def body(port: int) -> dict:
+    return {"sensorIp": "127.0.0.1", "sensorName": f"s{port}", "sensorPort": port, "sensorType": "temp", "sensorQueries": []}
+
+
+SENSORS = {"temp_a": body(12001), "temp_b": body(12002), "temp_c": body(12003)}
+
+
+def make_client(gateway, **options) -> RegistryClient:
+    return RegistryClient(gateway.client, URL, "secretKey", "/register", "/shutdown", **options)
+
+
+def run(gateway, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await gateway.client.aclose()
+
+    return asyncio.run(main())
+
+
+def port(request: httpx.Request) -> int:
+    return json.loads(request.content)["sensorPort"]
+
+
+def test_only_failed_registrations_are_retried(fake_gateway):
+    answers = {12001: [503, 201], 12002: [400], 12003: [201]}
+    gateway = fake_gateway(lambda request: answers[port(request)].pop(0))
+    outcomes = run(gateway, make_client(gateway).register_many(SENSORS, base_delay=0))
+
+    assert outcomes == {"temp_a": REGISTERED, "temp_b": REJECTED, "temp_c": REGISTERED}
+    assert Counter(port(r) for r in gateway.requests) == {12001: 2, 12002: 1, 12003: 1}
+    assert all(r.headers["x-api-key"] == "secretKey" for r in gateway.requests)
+
+
+def test_attempts_are_exhausted(fake_gateway):
+    gateway = fake_gateway(lambda request: 429)
+    client = make_client(gateway)
+    assert run(gateway, client.register_many({"temp_a": body(12001)}, attempts=3, base_delay=0)) == {"temp_a": ERROR}
+    assert len(gateway.requests) == 3
+    assert client.stats() == {"temp_a": ERROR}
+
+
+def test_remembered_registrations_are_skipped(fake_gateway, tmp_path):
+    gateway = fake_gateway()
+    state = RegistrationState(tmp_path)
+
+    async def main():
+        first = await make_client(gateway, state=state).register_many(SENSORS, base_delay=0)
+        # a restarted sensor, and one whose registration changed
+        second = await make_client(gateway, state=state).register_many(
+            {"temp_a": SENSORS["temp_a"], "temp_b": {**SENSORS["temp_b"], "sensorQueries": ["soglia1"]}}
+        )
+        deregistered = await make_client(gateway, state=state).deregister_many({"temp_a": SENSORS["temp_a"]})
+        third = await make_client(gateway, state=state).register_many({"temp_a": SENSORS["temp_a"]})
+        return first, second, deregistered, third
+
+    first, second, deregistered, third = run(gateway, main())
+    assert set(first.values()) == {REGISTERED}
+    assert second == {"temp_a": CACHED, "temp_b": REGISTERED}
+    assert deregistered == {"temp_a": DEREGISTERED}
+    assert third == {"temp_a": REGISTERED}
+    assert [r.method for r in gateway.requests] == ["POST"] * 4 + ["DELETE", "POST"]
+    assert dict(gateway.requests[4].url.params) == {"sensorIp": "127.0.0.1", "sensorPort": "12001"}
+
+    assert not RegistrationState(tmp_path, ttl=0).fresh("temp_b", URL, SENSORS["temp_b"] | {"sensorQueries": ["soglia1"]})
+    assert RegistrationState(tmp_path).fresh("temp_b", URL, SENSORS["temp_b"] | {"sensorQueries": ["soglia1"]})
+
+
+def test_bulk_registration(fake_gateway):
+    gateway = fake_gateway()
+    client = make_client(gateway, bulk_suffix="/bulk")
+    assert set(run(gateway, client.register_many(SENSORS)).values()) == {REGISTERED}
+    [request] = gateway.requests
+    assert request.url.path == "/v0/api/sensor/register/bulk"
+    assert json.loads(request.content) == list(SENSORS.values())
+
+
+def test_missing_bulk_endpoint_falls_back_to_single_requests(fake_gateway):
+    gateway = fake_gateway(lambda request: 404 if request.url.path.endswith("/bulk") else 201)
+    client = make_client(gateway, bulk_suffix="/bulk")
+
+    async def main():
+        registered = await client.register_many(SENSORS)
+        deregistered = await client.deregister_many(SENSORS)
+        return registered, deregistered
+
+    registered, deregistered = run(gateway, main())
+    assert set(registered.values()) == {REGISTERED} and set(deregistered.values()) == {DEREGISTERED}
+    assert client.bulk_suffix is None
+    assert [r.url.path for r in gateway.requests].count("/v0/api/sensor/register/bulk") == 1
+    assert len(gateway.requests) == 1 + 3 + 3
+    assert client.stats() == {}
+
+
+def test_unreachable_registry_on_shutdown(fake_gateway):
+    def down(request):
+        raise httpx.ConnectError("registry down", request=request)
+
+    gateway = fake_gateway(down)
+    assert run(gateway, make_client(gateway).deregister_many(SENSORS)) == dict.fromkeys(SENSORS, ERROR)
+
+
+def test_backoff_delays_are_bounded():
+    delays = list(backoff_delays(8, base_delay=1, max_delay=10))
+    assert len(delays) == 8
+    assert all(0 <= d <= min(10, 2**i) for i, d in enumerate(delays))
@@ -0,0 +1,80 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from scrapers.utils.history import HistoryStore
+from scrapers.utils.sources import ReplaySource, source_from_env
+from scrapers.utils.variables import sensor_ids
+
+HOUR = 3_600_000
+START = int(datetime(2024, 3, 1).timestamp() * 1000)
+
+
+def stations(value: float) -> list:
+    return [{"idstazione": "id-Sestola", "nomestaz": "Sestola", "lon": "1100000", "lat": "4400000", "value": value}]
+
+
+def write(path, content: dict) -> str:
+    path.write_text(json.dumps(content))
+    return str(path)
+
+
+def test_recordings_of_every_kind(tmp_path):
+    dump = write(tmp_path / "temp_data.json", {"timestamp": str(START), "sensor_type": "temp", "unit": "K", "data": stations(1)})
+    weekly = write(
+        tmp_path / "rain_sensor_weekly_data.json",
+        {
+            "sensor_id": "",
+            "sensor_name": "rain_sensor",
+            "unit": "mm",
+            "weekly_data": [{"timestamp": str(START + HOUR * i), "data": stations(i)} for i in (2, 0)],
+        },
+    )
+    store = HistoryStore(tmp_path / "history")
+    store.append("wind", START + HOUR, {"timestamp": str(START + HOUR), "data": stations(5)})
+
+    source = ReplaySource.from_paths([dump, weekly, str(tmp_path / "history")])
+    assert source.fetch(sensor_ids["TEMP"], START + 5 * HOUR) == [{"time": str(START)}, *stations(1)]
+    # the latest recording at or before the timestamp, or the first one
+    assert source.fetch(sensor_ids["RAIN"], START + HOUR)[1]["value"] == 0
+    assert source.fetch(sensor_ids["RAIN"], START - HOUR)[1]["value"] == 0
+    assert source.fetch(sensor_ids["RAIN"], START + 2 * HOUR)[1]["value"] == 2
+    assert source.fetch(sensor_ids["WIND"], START + HOUR)[1]["value"] == 5
+    assert source.requests == 5
+    with pytest.raises(KeyError):
+        source.fetch(sensor_ids["HUMIDITY"], START)
+
+
+def test_clock_speed_and_loop():
+    frames = {sensor_ids["TEMP"]: [(START + HOUR * i, [{"time": str(START + HOUR * i)}]) for i in range(3)]}
+    source = ReplaySource(frames, speed=3600)
+    assert source.now() == START
+
+    source.clock.started_at -= 2.5
+    assert source.now() == START + 2 * HOUR
+    source.clock.started_at -= 1
+    assert source.now() == START
+
+    source.loop = False
+    assert source.now() == START + 3 * HOUR
+
+
+def test_nothing_to_replay(tmp_path):
+    with pytest.raises(ValueError):
+        ReplaySource({})
+    with pytest.raises(ValueError):
+        ReplaySource.from_paths([str(tmp_path)])
+
+
+def test_scraper_reads_the_replay_from_env(tmp_path, monkeypatch):
+    dump = write(tmp_path / "temp_data.json", {"timestamp": str(START), "sensor_type": "temp", "unit": "K", "data": stations(3)})
+    monkeypatch.setenv("SCRAPER_REPLAY", dump)
+    monkeypatch.setenv("SCRAPER_REPLAY_SPEED", "60")
+    source = source_from_env()
+    assert isinstance(source, ReplaySource) and source.clock.speed == 60
+
+    scraper = GenericScraper("temp", cache=MemoryScrapeCache(), source=source)
+    assert scraper.get_detection_for_sensor("Sestola").value == 3
@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from scrapers.GenericScraper import GenericScraper
+from scrapers.utils.cache import MemoryScrapeCache
+from sensor.runtime import SensorRuntime
+
+CUSTOM_QUERY = {"operator": ">", "name": "hot", "threshold": 8}
+
+
+def make_sensor(make_config, source, gateway, name: str = "Sestola", queries=("soglia1", CUSTOM_QUERY)) -> SensorRuntime:
+    config = make_config(name, "temp", information={"queries": list(queries)}, apiGateway={"url": "http://gateway"})
+    scraper = GenericScraper("temp", cache=MemoryScrapeCache(), source=source)
+    return SensorRuntime(config, scraper=scraper, client=gateway.client)
+
+
+def send(sensor: SensorRuntime) -> str:
+    async def main():
+        try:
+            return await sensor.send_detection()
+        finally:
+            await sensor.client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_detection_and_alerts_are_posted(make_config, fake_source, fake_gateway):
+    gateway = fake_gateway()
+    sensor = make_sensor(make_config, fake_source(thresholds={"Sestola": {"soglia1": 5}}), gateway)
+    assert send(sensor) == "sent"
+
+    paths = sorted(r.url.path for r in gateway.requests)
+    assert paths == ["/v0/api/detection/alerts", "/v0/api/detection/alerts", "/v0/api/detection/temp/Sestola/detections"]
+    [detection] = gateway.bodies("/detections")
+    assert detection["sensorName"] == "Sestola" and detection["value"] == 10
+    alerts = sorted(gateway.bodies("/alerts"), key=lambda a: a["query"]["name"])
+    assert [a["query"] for a in alerts] == [{"name": "hot", "value": 8}, {"name": "soglia1", "value": 5}]
+    assert all(a["type"] == "temp" for a in alerts)
+
+
+def test_no_alert_below_the_thresholds(make_config, fake_source, fake_gateway):
+    gateway = fake_gateway()
+    sensor = make_sensor(make_config, fake_source(thresholds={"Sestola": {"soglia1": 50}}), gateway, queries=())
+    assert send(sensor) == "sent"
+    assert [r.url.path for r in gateway.requests] == ["/v0/api/detection/temp/Sestola/detections"]
+
+
+def test_unknown_station_sends_nothing(make_config, fake_source, fake_gateway):
+    gateway = fake_gateway()
+    sensor = make_sensor(make_config, fake_source(), gateway, name="Nowhere")
+    assert send(sensor) == "empty"
+    assert gateway.requests == []
+
+
+def test_unreachable_gateway(make_config, fake_source, fake_gateway):
+    def down(request):
+        raise httpx.ConnectError("gateway down", request=request)
+
+    sensor = make_sensor(make_config, fake_source(), fake_gateway(down))
+    assert send(sensor) == "error"
+
+
+def test_routes_update_the_schedule(make_config, fake_source, fake_gateway):
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    sensor = make_sensor(make_config, fake_source(), fake_gateway())
+    scheduler = BackgroundScheduler()
+    scheduler.start(paused=True)
+    sensor.schedule(scheduler)
+    app = FastAPI()
+    app.include_router(sensor.router)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://sensor") as client:
+            responses = [
+                await client.put("/sensor/configuration/cron/days", json={"sensorCronJobDays": "1-5"}),
+                await client.put("/sensor/configuration/cron/days", json={"sensorCronJobDays": "5-1"}),
+                await client.put("/sensor/configuration/cron/time", json={"sensorCronJobTimeHour": 7, "sensorCronJobTimeMinute": 30}),
+                await client.put("/sensor/configuration/cron/time", json={"sensorCronJobTimeHour": 24, "sensorCronJobTimeMinute": 0}),
+                await client.put("/sensor/update/name", json={"sensorName": "Sestola Alta"}),
+            ]
+            info = await client.get("/info")
+        await sensor.client.aclose()
+        return [r.status_code for r in responses], info.json()["General Sensor Information"]
+
+    codes, info = asyncio.run(main())
+    assert codes == [200, 406, 200, 406, 200]
+    assert info[0] == {"Sensor Name": "SestolaAlta"}
+    assert {k: info[3]["Cronjob Information"][k] for k in ("day_of_the_week", "hour", "minute")} == {
+        "day_of_the_week": "1-5",
+        "hour": "7",
+        "minute": "30",
+    }
+    fields = {f.name: str(f) for f in scheduler.get_job(sensor.job_id).trigger.fields}
+    assert (fields["day_of_week"], fields["hour"], fields["minute"]) == ("1-5", "7", "30")
+
+    sensor.unschedule()
+    assert scheduler.get_job(sensor.job_id) is None
+    scheduler.shutdown(wait=False)
+
+
+def test_station_without_a_value_sends_nothing(make_config, fake_source, fake_gateway):
+    gateway = fake_gateway()
+    sensor = make_sensor(make_config, fake_source(), gateway, name="Carpineta")
+    assert send(sensor) == "empty"
+    assert gateway.requests == []
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pytest
+import yaml
+
+from sensor.config import SensorConfig
+from sensor.schedule import WINDOW, cron_job_options, name_offset, parse_flag, peak_load, plan_offsets
+
+
+CONFIGURATION = Path(__file__).resolve().parents[1] / "sensor" / "configuration.yaml"
+
+
+def config(**cronjob) -> SensorConfig:
+    with open(CONFIGURATION) as file:
+        content = yaml.safe_load(file)
+    content["sensor"]["cronjob"].update(cronjob)
+    return SensorConfig.from_dict(content)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(True, True), (False, False), ("true", True), ("False", False), ("0", False), ("1", True), ("yes", True), (0, False)],
+)
+def test_parse_flag(value, expected):
+    assert parse_flag(value) is expected
+
+
+def test_quoted_false_disables_coalescing():
+    assert config(coalesce="false").cron_info["coalesce"] is False
+    assert config(coalesce=False).cron_info["coalesce"] is False
+    assert config().cron_info["coalesce"] is True
+
+
+def test_explicit_zero_is_not_replaced_by_the_default():
+    cron_info = config(misfire_grace_time=0, jitter=0).cron_info
+    assert cron_info["misfire_grace_time"] == 0
+    options = cron_job_options(cron_info, "temp_Sestola")
+    assert options["misfire_grace_time"] == 0 and options["jitter"] is None
+    assert cron_job_options(config().cron_info, "temp_Sestola")["misfire_grace_time"] == 30
+
+
+def test_name_offset_is_stable_and_in_window():
+    assert name_offset("temp_Sestola") == name_offset("temp_Sestola")
+    assert all(0 <= name_offset(f"temp_{i}") < WINDOW for i in range(100))
+
+
+def test_cron_job_options():
+    options = cron_job_options(
+        {"day_of_the_week": "0-6", "hour": "*", "minute": "*", "second": "auto", "jitter": 0, "coalesce": "false"},
+        "temp_Sestola",
+    )
+    assert options["second"] == str(name_offset("temp_Sestola"))
+    assert options["jitter"] is None
+    assert options["coalesce"] is False
+    assert cron_job_options({"day_of_the_week": "0-6", "hour": "*", "minute": "*", "second": 7, "jitter": 3}, "x")[
+        "second"
+    ] == "7"
+
+
+def test_plan_offsets_spread_the_fleet():
+    names = [f"sensor_{i}" for i in range(30)]
+    offsets = plan_offsets(names)
+    assert sorted(offsets) == sorted(names)
+    assert sorted(offsets.values()) == list(range(0, WINDOW, 2))
+    assert peak_load(list(offsets.values()), 2)["peakRequestsPerSecond"] == 2
+
+
+def test_peak_load_with_jitter():
+    report = peak_load([0, 0], 2, jitter=1)
+    assert report["peakRequestsPerSecond"] == 2
+    assert report["unspreadPeakRequestsPerSecond"] == 4
+    assert report["meanRequestsPerSecond"] == round(4 / WINDOW, 2)
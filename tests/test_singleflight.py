@@ -0,0 +1,85 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scrapers.utils.singleflight import SingleFlight
+
+
+def test_threads_and_tasks_share_one_call():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append("thread")
+        started.set()
+        release.wait(5)
+        return "payload"
+
+    async def fetch_async():
+        calls.append("task")
+        return "other"
+
+    async def tasks():
+        return await asyncio.gather(*(flight.ado("slot", fetch_async) for _ in range(3)))
+
+    with ThreadPoolExecutor(4) as executor:
+        leader = executor.submit(flight.do, "slot", fetch)
+        started.wait(5)
+        waiters = [executor.submit(flight.do, "slot", fetch) for _ in range(2)]
+        coalesced = executor.submit(asyncio.run, tasks())
+        while flight.coalesced < 5:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result(), *(w.result() for w in waiters), *coalesced.result()]
+
+    assert results == ["payload"] * 6
+    assert calls == ["thread"]
+    assert flight.stats() == {"calls": 6, "coalesced": 5, "inFlight": 0}
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def failing():
+        await release.wait()
+        raise RuntimeError("upstream down")
+
+    async def main():
+        calls = [asyncio.create_task(flight.ado("slot", failing)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        errors = await asyncio.gather(*calls, return_exceptions=True)
+        return errors, await flight.ado("slot", lambda: asyncio.sleep(0, "recovered"))
+
+    errors, recovered = asyncio.run(main())
+    assert [str(e) for e in errors] == ["upstream down"] * 3
+    assert recovered == "recovered"
+
+
+def test_cancelled_leader_hands_over_to_a_waiter():
+    flight = SingleFlight("test")
+    runs = []
+
+    async def fetch():
+        runs.append(len(runs))
+        await asyncio.sleep(0.01)
+        return f"run {len(runs)}"
+
+    async def main():
+        leader = asyncio.create_task(flight.ado("slot", fetch))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(flight.ado("slot", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(main()) == ["run 2", "run 2"]
+    assert runs == [0, 1]
+    assert flight.in_flight() == 0
@@ -0,0 +1,80 @@
+from sensor.spool import Spool
+
+
+def fill(directory, count, **kwargs):
+    spool = Spool(directory, **kwargs)
+    for i in range(count):
+        spool.append("/detections", {"i": i})
+    spool.close()
+
+
+def test_read_ack_and_reopen(tmp_path):
+    fill(tmp_path, 5)
+    spool = Spool(tmp_path)
+    assert spool.pending == 5
+    records, position = spool.read(3)
+    assert [body["i"] for _, body in records] == [0, 1, 2]
+    spool.ack(position, len(records))
+    spool.close()
+
+    spool = Spool(tmp_path)
+    assert spool.pending == 2
+    records, _ = spool.read(10)
+    assert [body["i"] for _, body in records] == [3, 4]
+
+
+def test_torn_tail_loses_only_the_torn_record(tmp_path):
+    fill(tmp_path, 3)
+    [segment] = tmp_path.glob("*.log")
+    with open(segment, "ab") as file:
+        file.write(b'{"url": "/detections", "body": {"i"')
+
+    spool = Spool(tmp_path)
+    assert spool.pending == 3
+    spool.append("/detections", {"i": 3})
+    records, _ = spool.read(10)
+    assert [body["i"] for _, body in records] == [0, 1, 2, 3]
+    assert spool.pending == 4
+
+
+def test_torn_first_record(tmp_path):
+    Spool(tmp_path).close()
+    [segment] = tmp_path.glob("*.log")
+    segment.write_bytes(b'{"url": "/alerts"')
+
+    spool = Spool(tmp_path)
+    assert spool.pending == 0
+    spool.append("/alerts", {"i": 0})
+    records, _ = spool.read(10)
+    assert records == [("/alerts", {"i": 0})]
+
+
+def test_rotation_and_compaction(tmp_path):
+    fill(tmp_path, 20, segment_bytes=100)
+    spool = Spool(tmp_path, segment_bytes=100)
+    assert len(spool.segments()) > 1
+    records, position = spool.read(20)
+    assert [body["i"] for _, body in records] == list(range(20))
+    spool.ack(position, len(records))
+    assert spool.pending == 0
+    assert spool.segments() == [spool.segment]
+
+
+def test_unreadable_last_line_drains(tmp_path):
+    fill(tmp_path, 2)
+    [segment] = tmp_path.glob("*.log")
+    with open(segment, "ab") as file:
+        file.write(b'{"url": "/detections", "bo\n')
+
+    spool = Spool(tmp_path)
+    assert spool.pending == 3
+    records, position = spool.read(10)
+    assert [body["i"] for _, body in records] == [0, 1]
+    spool.ack(position, len(records))
+    assert spool.read(10)[0] == []
+    assert spool.pending == 0
+    spool.append("/detections", {"i": 2})
+    records, _ = spool.read(10)
+    assert [body["i"] for _, body in records] == [2]
+    spool.close()
+    assert Spool(tmp_path).pending == 1
@@ -0,0 +1,52 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from sensor.create_template import TEMPLATE_FILE, render_sensor
+from sensor.startup import PHASES, StartupTimer, backoff_delays
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_backoff_delays_are_capped():
+    delays = list(backoff_delays(8, base_delay=1.0, max_delay=5.0))
+    assert len(delays) == 8
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(5.0, 2**attempt)
+
+
+def test_timer_reports_every_phase():
+    timer = StartupTimer(started_at=0.0)
+    timer.mark("import")
+    with timer.phase("config"):
+        pass
+    report = timer.report()
+    assert list(report) == list(PHASES)
+    assert report["import"] > 0 and report["config"] >= 0
+    assert report["register"] is None
+
+
+HEAVY = "('fastapi', 'httpx', 'uvicorn', 'apscheduler', 'scrapers.GenericScraper')"
+
+
+def test_reading_a_configuration_imports_no_server_or_client():
+    code = (
+        "import sys\n"
+        "from sensor.config import SensorConfig\n"
+        "SensorConfig.from_yaml('sensor/configuration.yaml')\n"
+        f"heavy = [m for m in {HEAVY} if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
+
+
+def test_importing_a_generated_sensor_imports_no_server_or_client(tmp_path):
+    output = render_sensor(str(ROOT / "sensor" / "configuration.yaml"), str(ROOT / "sensor" / TEMPLATE_FILE), str(tmp_path))
+    code = (
+        "import importlib.util, sys\n"
+        f"spec = importlib.util.spec_from_file_location('generated', {output!r})\n"
+        "spec.loader.exec_module(importlib.util.module_from_spec(spec))\n"
+        f"heavy = [m for m in {HEAVY} if m in sys.modules]\n"
+        "assert not heavy, heavy\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True)
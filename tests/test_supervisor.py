@@ -0,0 +1,129 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+import yaml
+
+from scrapers.utils.metrics import MetricsRegistry
+from sensor.supervisor import (
+    DEFAULT_STABLE_AFTER,
+    Supervised,
+    Supervisor,
+    format_status,
+    gauge_total,
+    histogram_mean,
+    restart_delay,
+)
+
+CONFIGURATION = Path(__file__).resolve().parents[1] / "sensor" / "configuration.yaml"
+
+
+class FakeProcess:
+    def __init__(self, returncode: int | None = None):
+        self.pid = 4242
+        self.returncode = returncode
+
+    def terminate(self) -> None:
+        self.returncode = -15
+
+    async def wait(self) -> int:
+        return self.returncode
+
+
+@pytest.fixture
+def supervised(tmp_path):
+    with open(CONFIGURATION) as file:
+        content = yaml.safe_load(file)
+    content["sensor"]["information"].update({"name": "Sestola Alta", "type": "temp"})
+    path = tmp_path / "sensor.yaml"
+    path.write_text(yaml.safe_dump(content))
+    sensor = Supervised(str(path))
+    sensor.process = FakeProcess()
+    sensor.state = "starting"
+    sensor.started_at = time.monotonic()
+    return sensor
+
+
+def supervise(sensor: Supervised, respond, checks: int = 1, **options) -> list[str]:
+    async def main():
+        supervisor = Supervisor([sensor], status_file=None, **options)
+        await supervisor.client.aclose()
+        supervisor.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+        states = []
+        for _ in range(checks):
+            await supervisor.check(sensor)
+            states.append(sensor.state)
+        await supervisor.client.aclose()
+        if isinstance(sensor.process, asyncio.subprocess.Process):
+            await sensor.process.wait()
+        return states
+
+    return asyncio.run(main())
+
+
+def metrics_text() -> str:
+    registry = MetricsRegistry()
+    registry.histogram("sensor_cycle_seconds", "", ("sensor",)).observe(0.5, sensor="temp_SestolaAlta")
+    registry.histogram("sensor_cron_lag_seconds", "", ("job",)).observe(0.25, job="temp_SestolaAlta")
+    depth = registry.gauge("delivery_queue_depth", "", ("queue",))
+    depth.set(3, queue="temp_SestolaAlta")
+    depth.set(4, queue="host")
+    return registry.render()
+
+
+def test_restart_delay_is_jittered_and_capped():
+    for restarts, delay in ((0, 1.0), (3, 8.0), (10, 60.0)):
+        delays = [restart_delay(restarts) for _ in range(50)]
+        assert all(delay / 2 <= d <= delay for d in delays)
+
+
+def test_prometheus_readers():
+    metrics = metrics_text()
+    assert histogram_mean(metrics, "sensor_cycle_seconds") == 0.5
+    assert histogram_mean(metrics, "missing_seconds") is None
+    assert gauge_total(metrics, "delivery_queue_depth") == 7
+    assert gauge_total(metrics, "missing_depth") is None
+
+
+def test_healthy_sensor_reports_its_metrics(supervised):
+    def respond(request):
+        return httpx.Response(200, text=metrics_text() if request.url.path == "/metrics" else "Everything is OK.")
+
+    assert supervise(supervised, respond) == ["healthy"]
+    assert (supervised.cycle, supervised.cron_lag, supervised.queue_depth) == (0.5, 0.25, 7)
+
+
+def test_failed_checks_restart_after_the_grace_period(supervised):
+    down = lambda request: httpx.Response(503)
+    assert supervise(supervised, down, checks=2) == ["starting", "starting"]
+
+    supervised.started_at -= 60
+    assert supervise(supervised, down, checks=3, grace=30) == ["unhealthy", "unhealthy", "backoff"]
+    assert supervised.process.returncode == -15
+    assert (supervised.restarts, supervised.attempt) == (1, 1)
+
+
+def test_backoff_resets_once_stable(supervised):
+    supervised.process.returncode = 1
+    supervised.attempt = 5
+    supervised.started_at -= DEFAULT_STABLE_AFTER
+    assert supervise(supervised, lambda request: httpx.Response(200)) == ["backoff"]
+    assert (supervised.exit_code, supervised.restarts, supervised.attempt) == (1, 1, 1)
+    assert supervised.restart_at - time.monotonic() <= 1.0
+
+    # restarted once the delay is over
+    supervised.restart_at = time.monotonic()
+    supervised.command = [sys.executable, "-c", "pass"]
+    assert supervise(supervised, lambda request: httpx.Response(200)) == ["starting"]
+    assert supervised.failures == 0 and supervised.restart_at is None
+
+
+def test_status_table(supervised):
+    supervised.cycle, supervised.queue_depth = 0.0125, 3
+    header, row, total = format_status([supervised.status(time.monotonic())]).splitlines()
+    assert header.split()[-1] == "QUEUE"
+    assert row.split()[0] == "temp_SestolaAlta" and row.split()[-2:] == ["12.5", "3"]
+    assert total == "0/1 healthy"
@@ -0,0 +1,87 @@
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from scrapers.utils.history import HistoryStore
+from scrapers.utils.timestamp import TimestampUtils
+from scrapers.utils.variables import sensor_ids
+
+HOUR = 3_600_000
+
+
+class SlowSource:
+    # Answers after a short delay, tracking how many requests are in flight at once
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.requests: list[tuple[str, int]] = []
+
+    def fetch(self, variable: str, timestamp: int) -> list:
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            self.requests.append((variable, timestamp))
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return [{"time": str(timestamp)}, {"nomestaz": "Sestola", "variable": variable, "value": timestamp // HOUR}]
+
+
+@pytest.fixture
+def weekly_scraper(monkeypatch, tmp_path):
+    # WeeklyScraper is run from scrapers/ and imports `utils` as a top-level package
+    monkeypatch.syspath_prepend(str(Path(__file__).resolve().parents[1] / "scrapers"))
+    for name in ("RAIN", "IDRO_LEVEL", "TEMP", "WIND", "HUMIDITY"):
+        monkeypatch.setenv(f"{name}_VARIABLE_ID", sensor_ids[name])
+    monkeypatch.chdir(tmp_path)
+    from weekly_data_scraping.WeeklyScraper import WeeklyScraper
+
+    yield WeeklyScraper
+    for module in [m for m in sys.modules if m == "utils" or m.startswith(("utils.", "weekly_data_scraping"))]:
+        del sys.modules[module]
+
+
+def test_results_keep_the_submission_order(weekly_scraper):
+    source = SlowSource()
+    scraper = weekly_scraper(concurrency=4, source=source)
+    timestamps = [12 * HOUR, 11 * HOUR, 10 * HOUR]
+    data = scraper.scrape_all(timestamps=timestamps)
+
+    assert [sensor["sensor_id"] for sensor in data] == scraper.sensors_ids
+    for sensor in data:
+        assert [day["timestamp"] for day in sensor["weekly_data"]] == [str(t) for t in timestamps]
+        assert {day["data"][0]["variable"] for day in sensor["weekly_data"]} == {sensor["sensor_id"]}
+    assert len(source.requests) == len(scraper.sensors_ids) * len(timestamps)
+    assert 1 < source.peak <= 4
+
+
+def test_concurrency_of_one_is_sequential(weekly_scraper):
+    source = SlowSource(delay=0)
+    weekly_scraper(concurrency=0, source=source).scrape_all(timestamps=[HOUR])
+    assert source.peak == 1
+
+
+def test_range_timestamps():
+    utils = TimestampUtils()
+    timestamps = utils.get_range_timestamps(datetime(2024, 1, 1, 0, 30), datetime(2024, 1, 1, 6, 10), step_hours=2)
+    assert timestamps == [utils.get_compliant_timestamp(datetime(2024, 1, 1, hour)) for hour in (6, 4, 2)]
+    assert [b - a for a, b in zip(timestamps[1:], timestamps)] == [2 * HOUR, 2 * HOUR]
+    with pytest.raises(ValueError):
+        utils.get_range_timestamps(datetime(2024, 1, 1), datetime(2024, 1, 2), step_hours=0)
+
+
+def test_stored_pairs_are_not_fetched_again(weekly_scraper, tmp_path):
+    store = HistoryStore(tmp_path / "history")
+    timestamps = [11 * HOUR, 10 * HOUR]
+    first = weekly_scraper(source=SlowSource(delay=0)).scrape_all(timestamps=timestamps[1:], store=store)
+
+    source = SlowSource(delay=0)
+    data = weekly_scraper(source=source).scrape_all(timestamps=timestamps, store=store)
+    assert {timestamp for _, timestamp in source.requests} == {11 * HOUR}
+    assert [sensor["weekly_data"][1:] for sensor in data] == [sensor["weekly_data"] for sensor in first]